@@ -0,0 +1,451 @@
+"""
+Caches, SQL statement classification and history compaction shared by the
+ag-ui agents (fastapi.py and streamlit.py). Configuration stays in the
+scripts, which build the instances from their environment variables.
+"""
+
+import hashlib
+import json
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+
+import duckdb
+import litellm
+from rich.console import Console
+
+console = Console()
+
+
+# ============================================================
+# Schema catalog cache and SQL statement classification
+# ============================================================
+DDL_STATEMENT_TYPES = {
+    duckdb.StatementType.CREATE,
+    duckdb.StatementType.DROP,
+    duckdb.StatementType.ALTER,
+    duckdb.StatementType.ATTACH,
+    duckdb.StatementType.DETACH,
+    duckdb.StatementType.COPY_DATABASE,
+}
+
+
+def is_ddl(sql_query: str) -> bool:
+    """Whether the SQL may change the schema (unparsable SQL counts)."""
+    try:
+        statements = duckdb.extract_statements(sql_query)
+    except Exception:
+        return True
+    return any(s.type in DDL_STATEMENT_TYPES for s in statements)
+
+
+class SchemaCatalog:
+    """
+    Table names and column types, cached until the next DDL statement.
+
+    Thread-safe, so one instance can serve concurrent tool calls or every
+    Streamlit session of the process.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._tables: Optional[List[str]] = None
+        self._columns: Dict[str, List[Tuple[str, str]]] = {}
+        self._complete = False
+
+    def invalidate(self) -> None:
+        with self._lock:
+            self._tables = None
+            self._columns = {}
+            self._complete = False
+
+    def tables(self, con: duckdb.DuckDBPyConnection) -> List[str]:
+        with self._lock:
+            if self._tables is None:
+                rows = con.execute("SHOW TABLES").fetchall()
+                self._tables = [r[0] for r in rows]
+            return list(self._tables)
+
+    def columns(
+        self, con: duckdb.DuckDBPyConnection, table_name: str
+    ) -> List[Tuple[str, str]]:
+        key = table_name.lower()
+        with self._lock:
+            if key not in self._columns:
+                schema = con.execute(f"DESCRIBE {table_name}").fetchall()
+                self._columns[key] = [(col[0], col[1]) for col in schema]
+            return self._columns[key]
+
+    def describe_all(
+        self, con: duckdb.DuckDBPyConnection
+    ) -> Dict[str, List[Tuple[str, str]]]:
+        with self._lock:
+            if not self._complete:
+                rows = con.execute(
+                    "SELECT table_name, column_name, data_type"
+                    " FROM information_schema.columns"
+                    " WHERE table_schema = current_schema()"
+                    " ORDER BY table_name, ordinal_position"
+                ).fetchall()
+                catalog: Dict[str, List[Tuple[str, str]]] = {}
+                for table_name, column_name, data_type in rows:
+                    catalog.setdefault(table_name, []).append(
+                        (column_name, data_type)
+                    )
+                self._tables = list(catalog)
+                self._columns = {
+                    name.lower(): columns for name, columns in catalog.items()
+                }
+                self._complete = True
+            return {name: self._columns[name.lower()] for name in self._tables}
+
+
+READ_ONLY_STATEMENT_TYPES = {
+    duckdb.StatementType.SELECT,
+    duckdb.StatementType.EXPLAIN,
+}
+
+
+def is_read_only_sql(sql_query: str) -> bool:
+    """Whether every statement is a SELECT/EXPLAIN (unparsable SQL is not)."""
+    try:
+        statements = duckdb.extract_statements(sql_query)
+    except Exception:
+        return False
+    return bool(statements) and all(
+        s.type in READ_ONLY_STATEMENT_TYPES for s in statements
+    )
+
+
+# ============================================================
+# Query result cache
+# ============================================================
+SQL_LITERAL_PATTERN = re.compile(r"('(?:[^']|'')*')")
+
+
+def normalize_sql(sql_query: str) -> str:
+    """
+    Collapse whitespace, drop trailing semicolons and lowercase everything
+    but string literals, so trivially different spellings share an entry.
+    """
+    parts = SQL_LITERAL_PATTERN.split(sql_query.strip().rstrip(";"))
+    return "".join(
+        part if i % 2 else re.sub(r"\s+", " ", part).lower()
+        for i, part in enumerate(parts)
+    ).strip()
+
+
+class QueryResultCache:
+    """
+    Test query results keyed by normalized SQL and the write version.
+
+    ``bump()`` must follow every statement that may write: it moves to a new
+    version and drops all entries. A result is only stored if no write
+    happened since its lookup, so a query racing a write is never cached.
+    Entries are evicted LRU beyond ``max_entries``/``max_bytes`` and after
+    ``ttl`` seconds (which also bounds staleness from other processes).
+    """
+
+    def __init__(self, max_entries: int, max_bytes: int, ttl: float):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.version = 0
+        self.hits = 0
+        self.misses = 0
+        self._entries: "OrderedDict[str, Tuple[Any, int, float]]" = (
+            OrderedDict()
+        )
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+    def get(self, sql_query: str) -> Tuple[Optional[Any], int]:
+        """The cached result (None on a miss) and the current version."""
+        key = normalize_sql(sql_query)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[2] < time.monotonic() - self.ttl:
+                self._evict(key)
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None, self.version
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0], self.version
+
+    def put(
+        self, sql_query: str, version: int, result: Any, size: int
+    ) -> None:
+        if size > self.max_bytes or self.max_entries <= 0:
+            return
+        key = normalize_sql(sql_query)
+        with self._lock:
+            if version != self.version:
+                return
+            if key in self._entries:
+                self._evict(key)
+            self._entries[key] = (result, size, time.monotonic())
+            self._bytes += size
+            while (
+                len(self._entries) > self.max_entries
+                or self._bytes > self.max_bytes
+            ):
+                self._evict(next(iter(self._entries)))
+
+    def bump(self) -> None:
+        with self._lock:
+            self.version += 1
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self) -> str:
+        return (
+            f"hits={self.hits} misses={self.misses}"
+            f" entries={len(self._entries)} bytes={self._bytes}"
+            f" version={self.version}"
+        )
+
+    def _evict(self, key: str) -> None:
+        _, size, _ = self._entries.pop(key)
+        self._bytes -= size
+
+
+# ============================================================
+# LLM completion cache (SQLite)
+# ============================================================
+class CompletionCacheMiss(Exception):
+    pass
+
+
+class CompletionCache:
+    """
+    Completions stored in SQLite under a canonical hash of the request
+    (model, messages, tools, response_format, temperature).
+
+    ``mode`` is "on" (read-through) or "replay" (serve only from the cache
+    and raise on a miss, for deterministic runs without network access).
+    The least recently used entries are deleted beyond ``max_bytes``.
+    """
+
+    def __init__(self, path: str, max_bytes: int, mode: str = "on"):
+        self.mode = mode
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS completions ("
+            " key TEXT PRIMARY KEY,"
+            " response TEXT NOT NULL,"
+            " size INTEGER NOT NULL,"
+            " last_used REAL NOT NULL)"
+        )
+        self._db.commit()
+
+    @staticmethod
+    def key(
+        model: str,
+        messages: List[Dict[str, Any]],
+        tools: Optional[List[Dict[str, Any]]] = None,
+        response_format: Any = None,
+        temperature: Optional[float] = None,
+    ) -> str:
+        canonical = json.dumps(
+            {
+                "model": model,
+                "messages": messages,
+                "tools": tools,
+                "response_format": response_format,
+                "temperature": temperature,
+            },
+            sort_keys=True,
+            separators=(",", ":"),
+            ensure_ascii=False,
+            default=str,
+        )
+        return hashlib.sha256(canonical.encode()).hexdigest()
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            row = self._db.execute(
+                "SELECT response FROM completions WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                if self.mode == "replay":
+                    raise CompletionCacheMiss(
+                        f"No cached completion for request {key[:12]}"
+                        " (LLM_CACHE=replay)"
+                    )
+                return None
+            self._db.execute(
+                "UPDATE completions SET last_used = ? WHERE key = ?",
+                (time.time(), key),
+            )
+            self._db.commit()
+        return json.loads(row[0])
+
+    def put(self, key: str, response: Dict[str, Any]) -> None:
+        payload = json.dumps(response, ensure_ascii=False, default=str)
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO completions"
+                " (key, response, size, last_used) VALUES (?, ?, ?, ?)",
+                (key, payload, len(payload.encode()), time.time()),
+            )
+            # Keep the most recently used entries that fit in max_bytes
+            self._db.execute(
+                "DELETE FROM completions WHERE key IN ("
+                " SELECT key FROM ("
+                "  SELECT key, SUM(size) OVER (ORDER BY last_used DESC)"
+                "  AS running FROM completions)"
+                " WHERE running > ?)",
+                (self.max_bytes,),
+            )
+            self._db.commit()
+
+
+# ============================================================
+# History compaction (token budget)
+# ============================================================
+TOOL_SUMMARY_CHARS = 200
+TOKEN_COUNT_CACHE_SIZE = 4096
+SCHEMA_TOOLS = {"list_tables", "describe_table", "describe_all"}
+
+
+def summarize_tool_result(tool_name: str, content: str) -> str:
+    snippet = " ".join(content.split())
+    if len(snippet) > TOOL_SUMMARY_CHARS:
+        snippet = snippet[:TOOL_SUMMARY_CHARS] + "..."
+    return f"[{tool_name} result compacted, {len(content)} chars] {snippet}"
+
+
+class HistoryCompactor:
+    """
+    Fits the messages sent to the LLM into a token budget.
+
+    ``compact`` works on a copy, so the full history is kept:
+
+    1. Schema lookups superseded by a later lookup of the same thing (or a
+       later describe_all) are replaced by a stub.
+    2. While over budget, tool results older than the last ``keep_recent``
+       messages are collapsed into short summaries, oldest first.
+    3. While still over budget, the oldest assistant turns are dropped
+       together with their tool results, so tool calls stay paired.
+       System and user messages are always kept.
+    """
+
+    def __init__(self, budget: int, keep_recent: int):
+        self.budget = budget
+        self.keep_recent = keep_recent
+        self._token_counts: Dict[Tuple[str, ...], int] = {}
+
+    def count_tokens(self, message: Dict[str, Any], model: str) -> int:
+        tool_calls = message.get("tool_calls")
+        key = (
+            model,
+            message.get("role") or "",
+            str(message.get("content") or ""),
+            json.dumps(tool_calls, default=str) if tool_calls else "",
+        )
+        count = self._token_counts.get(key)
+        if count is None:
+            if len(self._token_counts) >= TOKEN_COUNT_CACHE_SIZE:
+                self._token_counts.clear()
+            count = self._token_counts[key] = litellm.token_counter(
+                model=model, messages=[message]
+            )
+        return count
+
+    def compact(
+        self, messages: List[Dict[str, Any]], model: str
+    ) -> List[Dict[str, Any]]:
+        before = sum(self.count_tokens(msg, model) for msg in messages)
+        messages = list(messages)
+        tool_calls = self._tool_calls_by_id(messages)
+        self._drop_superseded_lookups(messages, tool_calls)
+
+        counts = [self.count_tokens(msg, model) for msg in messages]
+        total = sum(counts)
+        recent_start = max(len(messages) - self.keep_recent, 0)
+
+        for i in range(recent_start):
+            if total <= self.budget:
+                break
+            msg = messages[i]
+            if msg.get("role") != "tool":
+                continue
+            tool_name, _ = tool_calls.get(
+                msg.get("tool_call_id"), ("tool", {})
+            )
+            summary = {
+                **msg,
+                "content": summarize_tool_result(
+                    tool_name, str(msg.get("content") or "")
+                ),
+            }
+            count = self.count_tokens(summary, model)
+            if count < counts[i]:
+                total -= counts[i] - count
+                messages[i], counts[i] = summary, count
+
+        i = 0
+        while total > self.budget and i < recent_start:
+            if messages[i].get("role") in ("system", "user"):
+                i += 1
+                continue
+            end = i + 1
+            while end < len(messages) and messages[end].get("role") == "tool":
+                end += 1
+            if end > recent_start:
+                break
+            total -= sum(counts[i:end])
+            del messages[i:end]
+            del counts[i:end]
+            recent_start -= end - i
+
+        if total != before:
+            console.log(
+                f"[yellow]History compacted[/yellow] - {before} -> {total}"
+                f" tokens (budget {self.budget})"
+            )
+        return messages
+
+    @staticmethod
+    def _tool_calls_by_id(
+        messages: List[Dict[str, Any]],
+    ) -> Dict[str, Tuple[str, Dict[str, Any]]]:
+        tool_calls = {}
+        for msg in messages:
+            for tc in msg.get("tool_calls") or []:
+                function = tc.get("function") or {}
+                try:
+                    args = json.loads(function.get("arguments") or "{}")
+                except (TypeError, ValueError):
+                    args = {}
+                tool_calls[tc.get("id")] = (function.get("name") or "", args)
+        return tool_calls
+
+    @staticmethod
+    def _drop_superseded_lookups(
+        messages: List[Dict[str, Any]],
+        tool_calls: Dict[str, Tuple[str, Dict[str, Any]]],
+    ) -> None:
+        seen = set()
+        for i in range(len(messages) - 1, -1, -1):
+            msg = messages[i]
+            if msg.get("role") != "tool":
+                continue
+            tool_name, args = tool_calls.get(msg.get("tool_call_id"), ("", {}))
+            if tool_name not in SCHEMA_TOOLS:
+                continue
+            lookup = (tool_name, str(args.get("table_name", "")).lower())
+            if lookup in seen or ("describe_all", "") in seen:
+                messages[i] = {
+                    **msg,
+                    "content": f"[{tool_name} result superseded by a later"
+                    " schema lookup]",
+                }
+            seen.add(lookup)
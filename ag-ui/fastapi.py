@@ -4,6 +4,7 @@
 #     "fastapi==0.115.0",
 #     "uvicorn==0.32.0",
 #     "duckdb==1.4.1",
+#     "pyarrow==21.0.0",
 #     "litellm==1.78.5",
 #     "python-dotenv==1.1.1",
 #     "pydantic==2.12.3",
@@ -12,37 +13,191 @@
 # ///
 
 import asyncio
+import csv
+import io
+import itertools
 import json
 import os
+import sys
+import threading
 import time
 import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import aclosing, contextmanager
+from dataclasses import dataclass, field
 from enum import Enum
-from typing import Any, AsyncIterable, Dict, List, Optional
+from functools import partial
+from types import SimpleNamespace
+from typing import (
+    Any,
+    AsyncIterable,
+    AsyncIterator,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    Literal,
+    Optional,
+    Tuple,
+)
 
 import duckdb
 import litellm
+import pyarrow as pa
 from dotenv import load_dotenv
-from fastapi import FastAPI, Request
+from fastapi import FastAPI, HTTPException, Request
 from fastapi.responses import HTMLResponse, StreamingResponse
 from rich.console import Console
 from rich.panel import Panel
+from starlette.background import BackgroundTask
+
+from agent_support import (
+    CompletionCache,
+    HistoryCompactor,
+    QueryResultCache,
+    SchemaCatalog,
+    is_ddl,
+    is_read_only_sql,
+)
+
+try:
+    import orjson
+except ImportError:  # optional fast path, json is used otherwise
+    orjson = None
 
 load_dotenv()
 
 # ----------------------------
-# Persistent DuckDB connection
+# DuckDB connection manager
 # ----------------------------
 DB_PATH = "data.duckdb"
-os.makedirs(os.path.dirname(DB_PATH) or ".", exist_ok=True)
-con = duckdb.connect(DB_PATH)
+DB_READ_ONLY = os.getenv("DB_READ_ONLY", "false").lower() == "true"
+DB_THREADS = int(os.getenv("DB_THREADS", "0"))
+DB_MEMORY_LIMIT = os.getenv("DB_MEMORY_LIMIT", "")
+QUERY_TIMEOUT_SECONDS = float(os.getenv("QUERY_TIMEOUT_SECONDS", "30"))
+
+# Statements a test query may run; everything else either escapes the
+# rolled back transaction (ATTACH, COPY, SET, ...) or controls it
+SANDBOX_STATEMENT_TYPES = {
+    duckdb.StatementType.SELECT,
+    duckdb.StatementType.EXPLAIN,
+    duckdb.StatementType.CREATE,
+    duckdb.StatementType.INSERT,
+    duckdb.StatementType.UPDATE,
+    duckdb.StatementType.DELETE,
+    duckdb.StatementType.ALTER,
+    duckdb.StatementType.DROP,
+}
+
+
+class QueryTimeout(Exception):
+    pass
+
+
+class ConnectionManager:
+    """
+    Owns the single DuckDB database instance of the server.
+
+    Every tool call queries through its own cursor off that instance, so
+    concurrent runs never interleave statements on a shared connection.
+    ``threads`` and ``memory_limit`` are set on the instance (DuckDB scopes
+    them globally), and statements running longer than ``query_timeout``
+    seconds are interrupted.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        read_only: bool = False,
+        threads: int = 0,
+        memory_limit: str = "",
+        query_timeout: float = 0,
+    ):
+        config: Dict[str, Any] = {}
+        if threads:
+            config["threads"] = threads
+        if memory_limit:
+            config["memory_limit"] = memory_limit
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        # read_only lets several server processes open the same file
+        self.database = duckdb.connect(
+            path, read_only=read_only, config=config
+        )
+        self.query_timeout = query_timeout
+
+    @contextmanager
+    def cursor(self) -> Iterator[duckdb.DuckDBPyConnection]:
+        cursor = self.database.cursor()
+        try:
+            yield cursor
+        finally:
+            cursor.close()
+
+    @contextmanager
+    def sandbox(self) -> Iterator[duckdb.DuckDBPyConnection]:
+        """A cursor inside a transaction that is always rolled back."""
+        with self.cursor() as cursor:
+            cursor.begin()
+            try:
+                yield cursor
+            finally:
+                cursor.rollback()
+
+    def execute(
+        self, cursor: duckdb.DuckDBPyConnection, sql_query: str
+    ) -> duckdb.DuckDBPyConnection:
+        if self.query_timeout <= 0:
+            return cursor.execute(sql_query)
+        timer = threading.Timer(self.query_timeout, cursor.interrupt)
+        timer.daemon = True
+        timer.start()
+        try:
+            return cursor.execute(sql_query)
+        except duckdb.InterruptException as e:
+            raise QueryTimeout(
+                f"Query interrupted after {self.query_timeout:g}s"
+                " (QUERY_TIMEOUT_SECONDS)"
+            ) from e
+        finally:
+            timer.cancel()
+
+
+def check_sandboxed(sql_query: str) -> None:
+    for statement in duckdb.extract_statements(sql_query):
+        if statement.type not in SANDBOX_STATEMENT_TYPES:
+            raise ValueError(
+                f"{statement.type.name} statements are not allowed in test"
+                " queries"
+            )
+
+
+db = ConnectionManager(
+    DB_PATH,
+    read_only=DB_READ_ONLY,
+    threads=DB_THREADS,
+    memory_limit=DB_MEMORY_LIMIT,
+    query_timeout=QUERY_TIMEOUT_SECONDS,
+)
+
+# DuckDB work runs off the event loop on a bounded pool
+DB_WORKERS = int(os.getenv("DB_WORKERS", "4"))
+db_executor = ThreadPoolExecutor(
+    max_workers=DB_WORKERS, thread_name_prefix="duckdb"
+)
+
+
+async def run_in_db_executor(func, *args) -> Any:
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(db_executor, partial(func, *args))
+
 
 console = Console()
 
 # ----------------------------
-# FastAPI app & confirmation store
+# FastAPI app
 # ----------------------------
 app = FastAPI(title="AG-UI DuckDB Agent (Full AGEventType)")
-confirmation_futures: Dict[str, asyncio.Future] = {}
 
 
 # ============================================================
@@ -86,25 +241,469 @@ class AGEventType(str, Enum):
     META_EVENT = "MetaEvent"
 
 
+EVENT_TYPE_VALUES = {
+    event_type: event_type.value for event_type in AGEventType
+}
+
+
 def make_event(
     event_type: AGEventType, payload: Dict[str, Any]
 ) -> Dict[str, Any]:
+    # "id" is assigned by the EventEncoder of the run that emits the event
     return {
-        "id": str(uuid.uuid4()),
-        "type": event_type.value,
-        "timestamp": int(time.time() * 1000),
+        "id": None,
+        "type": EVENT_TYPE_VALUES[event_type],
+        "timestamp": time.time_ns() // 1_000_000,
         "payload": payload,
     }
 
 
+# ============================================================
+# AG-UI event encoding (NDJSON / SSE)
+# ============================================================
+if orjson is not None:
+
+    def dumps_event(event: Dict[str, Any]) -> bytes:
+        return orjson.dumps(event, default=str)
+
+else:
+    _json_encoder = json.JSONEncoder(
+        ensure_ascii=False, separators=(",", ":"), default=str
+    )
+
+    def dumps_event(event: Dict[str, Any]) -> bytes:
+        return _json_encoder.encode(event).encode()
+
+
+class EventEncoder:
+    """
+    Serializes the events of one run.
+
+    Ids come from a per-run counter (``<prefix>-<n>``) instead of a uuid per
+    event, and frames are either NDJSON lines or SSE messages.
+    """
+
+    MEDIA_TYPES = {
+        "ndjson": "application/x-ndjson",
+        "sse": "text/event-stream",
+    }
+
+    def __init__(self, framing: str = "ndjson"):
+        if framing not in self.MEDIA_TYPES:
+            raise ValueError(f"Unsupported framing: {framing}")
+        self.framing = framing
+        self.media_type = self.MEDIA_TYPES[framing]
+        self._prefix = uuid.uuid4().hex[:12]
+        self._counter = itertools.count(1)
+
+    def encode(self, event: Dict[str, Any]) -> bytes:
+        event_id = f"{self._prefix}-{next(self._counter)}"
+        event["id"] = event_id
+        data = dumps_event(event)
+        if self.framing == "sse":
+            return b"id: %s\nevent: %s\ndata: %s\n\n" % (
+                event_id.encode(),
+                event["type"].encode(),
+                data,
+            )
+        return data + b"\n"
+
+
+def benchmark_event_encoding(events: int = 200_000) -> None:
+    """Compare per-event cost of the legacy path and EventEncoder."""
+
+    def legacy_event(payload: Dict[str, Any]) -> str:
+        event = {
+            "id": str(uuid.uuid4()),
+            "type": AGEventType.TEXT_CONTENT.value,
+            "timestamp": int(time.time() * 1000),
+            "payload": payload,
+        }
+        return json.dumps(event, ensure_ascii=False) + "\n"
+
+    def encoded_event(encoder: EventEncoder, payload: Dict[str, Any]) -> bytes:
+        return encoder.encode(make_event(AGEventType.TEXT_CONTENT, payload))
+
+    payload = {"messageId": str(uuid.uuid4()), "delta": "token "}
+    cases = [
+        ("legacy make_event + json.dumps", lambda: legacy_event(payload)),
+    ]
+    for framing in EventEncoder.MEDIA_TYPES:
+        encoder = EventEncoder(framing)
+        cases.append(
+            (
+                f"EventEncoder {framing} "
+                f"({'orjson' if orjson else 'json'})",
+                partial(encoded_event, encoder, payload),
+            )
+        )
+
+    for name, encode in cases:
+        started = time.perf_counter()
+        for _ in range(events):
+            encode()
+        elapsed = time.perf_counter() - started
+        console.print(f"{name:<40} {events / elapsed:>12,.0f} events/s")
+
+
+# ============================================================
+# Schema catalog cache
+# ============================================================
+schema_catalog = SchemaCatalog()
+
+
+# ============================================================
+# Tool approval policy
+# ============================================================
+AUTO_APPROVE_READ_ONLY = (
+    os.getenv("AUTO_APPROVE_READ_ONLY", "true").lower() == "true"
+)
+READ_ONLY_TOOLS = {
+    "list_tables",
+    "describe_table",
+    "describe_all",
+    "sample_table",
+}
+SQL_TOOLS = {"run_test_sql_query", "run_final_sql_query"}
+
+
+class ApprovalPolicy:
+    """
+    Decides which tool calls need a human: schema lookups and read-only SQL
+    are approved automatically, anything that may write still asks.
+    """
+
+    def __init__(self, auto_approve_read_only: bool = True):
+        self.auto_approve_read_only = auto_approve_read_only
+
+    def requires_confirmation(
+        self, tool_name: str, args: Dict[str, Any]
+    ) -> bool:
+        if not self.auto_approve_read_only:
+            return True
+        if tool_name in READ_ONLY_TOOLS:
+            return False
+        if tool_name in SQL_TOOLS:
+            return not is_read_only_sql(args.get("sql_query") or "")
+        return True
+
+
+approval_policy = ApprovalPolicy(AUTO_APPROVE_READ_ONLY)
+
+
+# ============================================================
+# Tool result encoding (row/byte budgets, header-once rows)
+# ============================================================
+RESULT_FORMAT = os.getenv("RESULT_FORMAT", "csv")
+RESULT_MAX_ROWS = int(os.getenv("RESULT_MAX_ROWS", "50"))
+RESULT_MAX_BYTES = int(os.getenv("RESULT_MAX_BYTES", "8192"))
+FINAL_RESULT_MAX_ROWS = int(os.getenv("FINAL_RESULT_MAX_ROWS", "1000"))
+FINAL_RESULT_MAX_BYTES = int(
+    os.getenv("FINAL_RESULT_MAX_BYTES", str(1024 * 1024))
+)
+TEST_PREVIEW_ROWS = int(os.getenv("TEST_PREVIEW_ROWS", "5"))
+RESULT_FETCH_SIZE = 256
+SUMMARY_COLUMNS = [
+    "column_name",
+    "column_type",
+    "min",
+    "max",
+    "approx_unique",
+    "null_percentage",
+]
+
+
+def format_row(values: Iterable[Any], result_format: str) -> str:
+    cells = ["NULL" if value is None else str(value) for value in values]
+    if result_format == "markdown":
+        escaped = [cell.replace("|", "\\|") for cell in cells]
+        return "| " + " | ".join(escaped) + " |"
+    buffer = io.StringIO()
+    csv.writer(buffer, lineterminator="").writerow(cells)
+    return buffer.getvalue()
+
+
+def format_header(columns: List[str], result_format: str) -> List[str]:
+    header = format_row(columns, result_format)
+    if result_format == "markdown":
+        return [header, "|" + "---|" * len(columns)]
+    return [header]
+
+
+def iter_rows(
+    cursor: duckdb.DuckDBPyConnection, prefetched: Iterable[tuple] = ()
+) -> Iterator[tuple]:
+    yield from prefetched
+    while batch := cursor.fetchmany(RESULT_FETCH_SIZE):
+        yield from batch
+
+
+def encode_result(
+    cursor: duckdb.DuckDBPyConnection,
+    max_rows: int = RESULT_MAX_ROWS,
+    max_bytes: int = RESULT_MAX_BYTES,
+    result_format: str = RESULT_FORMAT,
+    prefetched: Iterable[tuple] = (),
+) -> str:
+    """
+    Encode a result with the header once and one compact line per row,
+    fetching in batches and stopping at the row or byte budget.
+    """
+    if cursor.description is None:
+        return "Statement executed successfully."
+    columns = [column[0] for column in cursor.description]
+    lines = format_header(columns, result_format)
+    size = sum(len(line) + 1 for line in lines)
+    shown = 0
+    for row in iter_rows(cursor, prefetched):
+        line = format_row(row, result_format)
+        if shown >= max_rows or size + len(line) + 1 > max_bytes:
+            lines.append(
+                f"... truncated after {shown} rows"
+                f" (budget: {max_rows} rows / {max_bytes} bytes)"
+            )
+            break
+        lines.append(line)
+        size += len(line) + 1
+        shown += 1
+    return "\n".join(lines)
+
+
+def summarize_test_query(
+    cursor: duckdb.DuckDBPyConnection,
+    sql_query: str,
+    result_format: str = RESULT_FORMAT,
+) -> str:
+    """
+    Small results come back as rows. Larger read-only results come back as
+    the row count, per-column SUMMARIZE statistics and a short preview, so a
+    test query never pulls its full result into the agent context.
+    """
+    if cursor.description is None:
+        return "Statement executed successfully."
+    preview = cursor.fetchmany(TEST_PREVIEW_ROWS + 1)
+    if len(preview) <= TEST_PREVIEW_ROWS or not is_read_only_sql(sql_query):
+        return encode_result(cursor, prefetched=preview)
+
+    columns = [column[0] for column in cursor.description]
+    preview_lines = format_header(columns, result_format) + [
+        format_row(row, result_format) for row in preview[:TEST_PREVIEW_ROWS]
+    ]
+    try:
+        db.execute(cursor, f"SUMMARIZE ({sql_query.strip().rstrip(';')})")
+        summary_columns = [column[0] for column in cursor.description]
+        stats = [dict(zip(summary_columns, row)) for row in cursor.fetchall()]
+    except Exception:
+        return "\n".join(
+            preview_lines + [f"... more than {TEST_PREVIEW_ROWS} rows"]
+        )
+
+    stats_lines = format_header(SUMMARY_COLUMNS, result_format) + [
+        format_row([stat[key] for key in SUMMARY_COLUMNS], result_format)
+        for stat in stats
+    ]
+    row_count = stats[0]["count"] if stats else "unknown"
+    return "\n".join(
+        [f"rows: {row_count}", "column summary:"]
+        + stats_lines
+        + [f"preview (first {TEST_PREVIEW_ROWS} rows):"]
+        + preview_lines
+    )
+
+
+# ============================================================
+# Query result cache (test queries, shared across runs)
+# ============================================================
+QUERY_CACHE_MAX_ENTRIES = int(os.getenv("QUERY_CACHE_MAX_ENTRIES", "256"))
+QUERY_CACHE_MAX_BYTES = int(
+    os.getenv("QUERY_CACHE_MAX_BYTES", str(16 * 1024 * 1024))
+)
+QUERY_CACHE_TTL_SECONDS = float(os.getenv("QUERY_CACHE_TTL_SECONDS", "300"))
+query_cache = QueryResultCache(
+    QUERY_CACHE_MAX_ENTRIES, QUERY_CACHE_MAX_BYTES, QUERY_CACHE_TTL_SECONDS
+)
+
+
+# ============================================================
+# Final query results (Arrow record batches, served by handle)
+# ============================================================
+RESULT_TTL_SECONDS = float(os.getenv("RESULT_TTL_SECONDS", "600"))
+MAX_OPEN_RESULTS = int(os.getenv("MAX_OPEN_RESULTS", "16"))
+RESULT_BATCH_ROWS = int(os.getenv("RESULT_BATCH_ROWS", "65536"))
+FINAL_PREVIEW_ROWS = int(os.getenv("FINAL_PREVIEW_ROWS", "20"))
+RESULT_MEDIA_TYPES = {
+    "arrow": "application/vnd.apache.arrow.stream",
+    "ndjson": "application/x-ndjson",
+}
+
+
+def unique_column_names(names: List[str]) -> List[str]:
+    """Suffix repeated names (id, id_1, ...) so keyed rows keep every column."""
+    taken = set(names)
+    seen = set()
+    unique = []
+    for name in names:
+        candidate, suffix = name, 0
+        while candidate in seen or (suffix and candidate in taken):
+            suffix += 1
+            candidate = f"{name}_{suffix}"
+        seen.add(candidate)
+        taken.add(candidate)
+        unique.append(candidate)
+    return unique
+
+
+def read_next_batch(reader: pa.RecordBatchReader) -> Optional[pa.RecordBatch]:
+    try:
+        return reader.read_next_batch()
+    except StopIteration:
+        return None
+
+
+@dataclass
+class StoredResult:
+    """
+    An executed final query whose rows have not been fetched yet. The
+    first record batch is read up front for the preview; the rest stays in
+    DuckDB until the client streams it.
+    """
+
+    handle: str
+    cursor: duckdb.DuckDBPyConnection
+    reader: pa.RecordBatchReader
+    first_batch: Optional[pa.RecordBatch]
+    created_at: float = field(default_factory=time.monotonic)
+
+    @property
+    def columns(self) -> List[str]:
+        return unique_column_names(self.reader.schema.names)
+
+    def preview(self, rows: int) -> List[tuple]:
+        if self.first_batch is None:
+            return []
+        batch = self.first_batch.slice(0, rows)
+        return list(zip(*(column.to_pylist() for column in batch.columns)))
+
+    def batches(self) -> Iterator[pa.RecordBatch]:
+        batch = self.first_batch
+        while batch is not None:
+            yield batch
+            batch = read_next_batch(self.reader)
+
+    def close(self) -> None:
+        self.cursor.close()
+
+
+class ResultStore:
+    """
+    Open final query results, each streamed once via GET /results/{handle}.
+    Unclaimed results are closed after ``ttl`` seconds and the oldest are
+    dropped beyond ``max_results``.
+    """
+
+    def __init__(self, ttl: float, max_results: int):
+        self.ttl = ttl
+        self.max_results = max_results
+        self._results: "OrderedDict[str, StoredResult]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def open(self, sql_query: str) -> StoredResult:
+        """Execute ``sql_query`` on a dedicated cursor and keep its reader."""
+        cursor = db.database.cursor()
+        try:
+            db.execute(cursor, sql_query)
+            reader = cursor.fetch_record_batch(RESULT_BATCH_ROWS)
+            first_batch = read_next_batch(reader)
+        except Exception:
+            cursor.close()
+            raise
+        stored = StoredResult(
+            handle=str(uuid.uuid4()),
+            cursor=cursor,
+            reader=reader,
+            first_batch=first_batch,
+        )
+        with self._lock:
+            self._results[stored.handle] = stored
+            expired = self._expire()
+        for result in expired:
+            result.close()
+        return stored
+
+    def claim(self, handle: str) -> Optional[StoredResult]:
+        with self._lock:
+            expired = self._expire()
+            stored = self._results.pop(handle, None)
+        for result in expired:
+            result.close()
+        return stored
+
+    def _expire(self) -> List[StoredResult]:
+        expired = []
+        deadline = time.monotonic() - self.ttl
+        while self._results:
+            handle, stored = next(iter(self._results.items()))
+            if stored.created_at >= deadline and len(self._results) <= (
+                self.max_results
+            ):
+                break
+            expired.append(self._results.pop(handle))
+        return expired
+
+
+result_store = ResultStore(RESULT_TTL_SECONDS, MAX_OPEN_RESULTS)
+
+
+def encode_batches(
+    batches: Iterator[pa.RecordBatch],
+    schema: pa.Schema,
+    result_format: str,
+) -> Iterator[bytes]:
+    """
+    Arrow IPC stream bytes per record batch, or one NDJSON line per batch
+    with the batch in columnar form ({column: [values]}).
+    """
+    if result_format == "ndjson":
+        names = unique_column_names(schema.names)
+        for batch in batches:
+            columns = (column.to_pylist() for column in batch.columns)
+            yield dumps_event(dict(zip(names, columns))) + b"\n"
+        return
+
+    sink = io.BytesIO()
+    with pa.ipc.new_stream(sink, schema) as writer:
+        for batch in batches:
+            writer.write_batch(batch)
+            yield sink.getvalue()
+            sink.seek(0)
+            sink.truncate()
+    yield sink.getvalue()
+
+
+async def stream_result(
+    stored: StoredResult, result_format: str
+) -> AsyncIterator[bytes]:
+    chunks = encode_batches(
+        stored.batches(), stored.reader.schema, result_format
+    )
+    try:
+        # Batches are pulled from DuckDB on the DB pool, off the event loop
+        while True:
+            chunk = await run_in_db_executor(next, chunks, None)
+            if chunk is None:
+                return
+            yield chunk
+    finally:
+        await run_in_db_executor(stored.close)
+
+
 # ============================================================
 # DuckDB tools (based on your script)
 # ============================================================
 def list_tables(reasoning: str) -> List[str]:
     try:
-        con.execute("SHOW TABLES")
-        rows = con.fetchall()
-        result = [r[0] for r in rows]
+        with db.cursor() as cursor:
+            result = schema_catalog.tables(cursor)
         console.log(
             f"[blue]list_tables[/blue] - reasoning: {reasoning} -> {result}"
         )
@@ -116,8 +715,8 @@ def list_tables(reasoning: str) -> List[str]:
 
 def describe_table(reasoning: str, table_name: str) -> str:
     try:
-        con.execute(f"DESCRIBE {table_name}")
-        schema = con.fetchall()
+        with db.cursor() as cursor:
+            schema = schema_catalog.columns(cursor, table_name)
         result = "\n".join([f"{col[0]}: {col[1]}" for col in schema])
         console.log(
             f"[blue]describe_table[/blue] - {table_name} - {reasoning}"
@@ -128,13 +727,30 @@ def describe_table(reasoning: str, table_name: str) -> str:
         return f"Error describing {table_name}: {e}"
 
 
-def sample_table(reasoning: str, table_name: str, row_sample_size: int) -> str:
+def describe_all(reasoning: str) -> str:
     try:
-        con.execute(
-            f"SELECT * FROM {table_name} LIMIT {int(row_sample_size)};"
+        with db.cursor() as cursor:
+            catalog = schema_catalog.describe_all(cursor)
+        result = "\n\n".join(
+            f"{table_name}\n"
+            + "\n".join([f"{col[0]}: {col[1]}" for col in columns])
+            for table_name, columns in catalog.items()
         )
-        sample = con.fetchall()
-        result = "\n".join([str(r) for r in sample])
+        console.log(f"[blue]describe_all[/blue] - {reasoning}")
+        return result
+    except Exception as e:
+        console.log(f"[red]describe_all error[/red] {e}")
+        return f"Error describing tables: {e}"
+
+
+def sample_table(reasoning: str, table_name: str, row_sample_size: int) -> str:
+    try:
+        with db.cursor() as cursor:
+            db.execute(
+                cursor,
+                f"SELECT * FROM {table_name} LIMIT {int(row_sample_size)};",
+            )
+            result = encode_result(cursor)
         console.log(f"[blue]sample_table[/blue] - {table_name} - {reasoning}")
         return result
     except Exception as e:
@@ -145,12 +761,26 @@ def sample_table(reasoning: str, table_name: str, row_sample_size: int) -> str:
 def run_test_sql_query(reasoning: str, sql_query: str) -> str:
     console.print(f"[dim]Test query: {sql_query}[/dim]")
     try:
-        con.execute(sql_query)
-        rows = con.fetchall()
+        check_sandboxed(sql_query)
+        cacheable = is_read_only_sql(sql_query)
+        if cacheable:
+            cached, version = query_cache.get(sql_query)
+            console.log(
+                f"[cyan]query cache {'miss' if cached is None else 'hit'}"
+                f"[/cyan] - {query_cache.stats()}"
+            )
+            if cached is not None:
+                return cached
+        # Test queries never persist anything: the transaction is rolled back
+        with db.sandbox() as cursor:
+            db.execute(cursor, sql_query)
+            result = summarize_test_query(cursor, sql_query)
+        if cacheable:
+            query_cache.put(sql_query, version, result, len(result))
         console.log(
             f"[blue]run_test_sql_query[/blue] - {sql_query} - {reasoning}"
         )
-        return "\n".join([str(r) for r in rows])
+        return result
     except Exception as e:
         console.log(f"[red]run_test_sql_query error[/red] {e}")
         return f"Error executing test query: {e}"
@@ -163,10 +793,33 @@ def run_final_sql_query(reasoning: str, sql_query: str) -> str:
         )
     )
     try:
-        con.execute(sql_query)
-        rows = con.fetchall()
-        console.log(f"[green]run_final_sql_query[/green] - success")
-        return "\n".join([str(r) for r in rows])
+        if is_read_only_sql(sql_query):
+            # Rows stay in DuckDB; the result only carries a handle + preview
+            stored = result_store.open(sql_query)
+            console.log(
+                f"[green]run_final_sql_query[/green] - result {stored.handle}"
+            )
+            preview = stored.preview(FINAL_PREVIEW_ROWS)
+            lines = format_header(stored.columns, RESULT_FORMAT)
+            lines += [format_row(row, RESULT_FORMAT) for row in preview]
+            lines.append(
+                f"... preview of the first {len(preview)} rows;"
+                f" full result: /results/{stored.handle}"
+            )
+            return "\n".join(lines)
+
+        with db.cursor() as cursor:
+            try:
+                db.execute(cursor, sql_query)
+            finally:
+                # Even a failed script may have committed earlier statements
+                query_cache.bump()
+            if is_ddl(sql_query):
+                schema_catalog.invalidate()
+            console.log(f"[green]run_final_sql_query[/green] - success")
+            return encode_result(
+                cursor, FINAL_RESULT_MAX_ROWS, FINAL_RESULT_MAX_BYTES
+            )
     except Exception as e:
         console.log(f"[red]run_final_sql_query error[/red] {e}")
         return f"Error executing final query: {e}"
@@ -201,6 +854,18 @@ TOOLS_SCHEMA = [
             },
         },
     },
+    {
+        "type": "function",
+        "function": {
+            "name": "describe_all",
+            "description": "Returns schema info for every table in a single call",
+            "parameters": {
+                "type": "object",
+                "properties": {"reasoning": {"type": "string"}},
+                "required": ["reasoning"],
+            },
+        },
+    },
     {
         "type": "function",
         "function": {
@@ -221,7 +886,7 @@ TOOLS_SCHEMA = [
         "type": "function",
         "function": {
             "name": "run_test_sql_query",
-            "description": "Tests a SQL query and returns results (only visible to agent)",
+            "description": "Tests a SQL query and returns results (only visible to agent). Runs in a transaction that is rolled back, so changes are not kept",
             "parameters": {
                 "type": "object",
                 "properties": {
@@ -252,12 +917,433 @@ TOOLS_SCHEMA = [
 AVAILABLE_FUNCTIONS = {
     "list_tables": list_tables,
     "describe_table": describe_table,
+    "describe_all": describe_all,
     "sample_table": sample_table,
     "run_test_sql_query": run_test_sql_query,
     "run_final_sql_query": run_final_sql_query,
 }
 
 
+# ============================================================
+# Streamed completion -> AG-UI text and tool call events
+# ============================================================
+class StreamedMessage:
+    """
+    Accumulates a streamed completion while turning each chunk into
+    TextMessage* and ToolCall* events, so the UI renders from the first token.
+    """
+
+    def __init__(self):
+        self.message_id = str(uuid.uuid4())
+        self.tool_calls: List[Dict[str, str]] = []
+        self._text_parts: List[str] = []
+        self._text_started = False
+        self._calls_by_index: Dict[int, Dict[str, str]] = {}
+        self._open_call: Optional[Dict[str, str]] = None
+
+    @property
+    def text(self) -> str:
+        return "".join(self._text_parts)
+
+    def feed(self, chunk: Any) -> List[Dict[str, Any]]:
+        events: List[Dict[str, Any]] = []
+        if not chunk.choices:
+            return events
+        delta = chunk.choices[0].delta
+
+        content = getattr(delta, "content", None)
+        if content:
+            if not self._text_started:
+                self._text_started = True
+                events.append(
+                    make_event(
+                        AGEventType.TEXT_START,
+                        {"messageId": self.message_id, "role": "assistant"},
+                    )
+                )
+            self._text_parts.append(content)
+            events.append(
+                make_event(
+                    AGEventType.TEXT_CONTENT,
+                    {"messageId": self.message_id, "delta": content},
+                )
+            )
+
+        for fragment in getattr(delta, "tool_calls", None) or []:
+            events.extend(self._feed_tool_call(fragment))
+        return events
+
+    def close(self) -> List[Dict[str, Any]]:
+        events: List[Dict[str, Any]] = []
+        if self._text_started:
+            events.append(
+                make_event(
+                    AGEventType.TEXT_END, {"messageId": self.message_id}
+                )
+            )
+        events.extend(self._end_open_call())
+        return events
+
+    def _feed_tool_call(self, fragment: Any) -> List[Dict[str, Any]]:
+        events: List[Dict[str, Any]] = []
+        function = getattr(fragment, "function", None)
+        index = getattr(fragment, "index", None)
+        if index is None:
+            index = len(self.tool_calls)
+
+        call = self._calls_by_index.get(index)
+        # Some providers reuse index 0 for every call, each with its own id
+        if call is None or (fragment.id and fragment.id != call["id"]):
+            events.extend(self._end_open_call())
+            call = {
+                "id": fragment.id or str(uuid.uuid4()),
+                "name": getattr(function, "name", None) or "",
+                "arguments": "",
+            }
+            self._calls_by_index[index] = call
+            self.tool_calls.append(call)
+            self._open_call = call
+            events.append(
+                make_event(
+                    AGEventType.TOOL_START,
+                    {
+                        "toolCallId": call["id"],
+                        "toolCallName": call["name"],
+                        "parentMessageId": self.message_id,
+                    },
+                )
+            )
+
+        arguments = getattr(function, "arguments", None)
+        if arguments:
+            call["arguments"] += arguments
+            events.append(
+                make_event(
+                    AGEventType.TOOL_ARGS,
+                    {"toolCallId": call["id"], "delta": arguments},
+                )
+            )
+        return events
+
+    def _end_open_call(self) -> List[Dict[str, Any]]:
+        if self._open_call is None:
+            return []
+        call, self._open_call = self._open_call, None
+        return [make_event(AGEventType.TOOL_END, {"toolCallId": call["id"]})]
+
+
+# ============================================================
+# Client-side LLM rate limiting (shared across sessions)
+# ============================================================
+LLM_RPM = float(os.getenv("LLM_RPM", "0"))
+
+
+class TokenBucket:
+    """
+    Allows ``rate_per_minute`` acquisitions per minute with bursts up to
+    ``capacity``; callers only wait once the bucket is empty.
+    """
+
+    def __init__(self, rate_per_minute: float, capacity: float = 0):
+        self.rate = rate_per_minute / 60.0
+        self.capacity = capacity or rate_per_minute
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self._tokens = min(
+            self.capacity, self._tokens + (now - self._updated) * self.rate
+        )
+        self._updated = now
+
+    async def acquire(self) -> float:
+        """Take one token, returning how long the caller had to wait."""
+        async with self._lock:
+            self._refill()
+            wait = 0.0
+            if self._tokens < 1:
+                wait = (1 - self._tokens) / self.rate
+                await asyncio.sleep(wait)
+                self._refill()
+            self._tokens -= 1
+            return wait
+
+
+class RateLimiter:
+    """One token bucket per (model, api key); disabled when rpm is 0."""
+
+    def __init__(self, rate_per_minute: float):
+        self.rate_per_minute = rate_per_minute
+        self._buckets: Dict[Tuple[str, Optional[str]], TokenBucket] = {}
+
+    async def acquire(self, model: str, api_key: Optional[str]) -> float:
+        if self.rate_per_minute <= 0:
+            return 0.0
+        key = (model, api_key)
+        if key not in self._buckets:
+            self._buckets[key] = TokenBucket(self.rate_per_minute)
+        return await self._buckets[key].acquire()
+
+
+llm_rate_limiter = RateLimiter(LLM_RPM)
+
+
+# ============================================================
+# LLM completion cache (opt-in, SQLite)
+# ============================================================
+LLM_CACHE = os.getenv("LLM_CACHE", "off").lower()
+LLM_CACHE_PATH = os.getenv("LLM_CACHE_PATH", ".llm_cache.sqlite")
+LLM_CACHE_MAX_BYTES = int(
+    os.getenv("LLM_CACHE_MAX_BYTES", str(64 * 1024 * 1024))
+)
+
+
+completion_cache = (
+    CompletionCache(LLM_CACHE_PATH, LLM_CACHE_MAX_BYTES, LLM_CACHE)
+    if LLM_CACHE in ("on", "replay")
+    else None
+)
+
+
+def cached_completion_chunks(completion: Dict[str, Any]) -> List[Any]:
+    """Rebuild stream chunks from a cached completion for StreamedMessage."""
+
+    def chunk(**delta: Any) -> SimpleNamespace:
+        return SimpleNamespace(
+            choices=[SimpleNamespace(delta=SimpleNamespace(**delta))]
+        )
+
+    chunks = []
+    if completion["content"]:
+        chunks.append(chunk(content=completion["content"]))
+    for index, call in enumerate(completion["tool_calls"]):
+        function = SimpleNamespace(
+            name=call["name"], arguments=call["arguments"]
+        )
+        chunks.append(
+            chunk(
+                tool_calls=[
+                    SimpleNamespace(
+                        index=index, id=call["id"], function=function
+                    )
+                ]
+            )
+        )
+    return chunks
+
+
+# ============================================================
+# History compaction (token budget)
+# ============================================================
+CONTEXT_TOKEN_BUDGET = int(os.getenv("CONTEXT_TOKEN_BUDGET", "24000"))
+KEEP_RECENT_MESSAGES = int(os.getenv("KEEP_RECENT_MESSAGES", "6"))
+history_compactor = HistoryCompactor(
+    CONTEXT_TOKEN_BUDGET, KEEP_RECENT_MESSAGES
+)
+
+
+# ============================================================
+# Human-in-the-loop confirmations & run checkpoints
+# ============================================================
+CONFIRMATION_TTL_SECONDS = float(os.getenv("CONFIRMATION_TTL_SECONDS", "600"))
+MAX_PENDING_CONFIRMATIONS = int(os.getenv("MAX_PENDING_CONFIRMATIONS", "100"))
+MAX_CHECKPOINTED_RUNS = int(os.getenv("MAX_CHECKPOINTED_RUNS", "100"))
+
+
+class ConfirmationExpired(Exception):
+    pass
+
+
+def expand_decisions(
+    tool_call_ids: List[str],
+    approved: Optional[bool],
+    decisions: Optional[Dict[str, bool]],
+) -> Dict[str, bool]:
+    """Per-call decisions, with ``approved`` applied to calls not listed."""
+    decisions = decisions or {}
+    return {
+        tool_call_id: bool(decisions.get(tool_call_id, approved))
+        for tool_call_id in tool_call_ids
+    }
+
+
+class ConfirmationRegistry:
+    """
+    Futures of tool call batches waiting for a human decision.
+
+    A wait fails with ConfirmationExpired after ``ttl`` seconds, or earlier
+    when ``max_pending`` newer confirmations push it out, so an abandoned
+    tab cannot hold a run open forever.
+    """
+
+    def __init__(self, ttl: float, max_pending: int):
+        self.ttl = ttl
+        self.max_pending = max_pending
+        self._pending: "OrderedDict[str, Tuple[asyncio.Future, List[str]]]" = (
+            OrderedDict()
+        )
+
+    async def wait(
+        self, confirmation_id: str, tool_call_ids: List[str]
+    ) -> Dict[str, bool]:
+        while len(self._pending) >= self.max_pending:
+            evicted_id, (evicted, _) = self._pending.popitem(last=False)
+            if not evicted.done():
+                evicted.set_exception(
+                    ConfirmationExpired(
+                        f"Confirmation {evicted_id} evicted: too many pending"
+                    )
+                )
+
+        fut = asyncio.get_running_loop().create_future()
+        self._pending[confirmation_id] = (fut, tool_call_ids)
+        try:
+            return await asyncio.wait_for(fut, timeout=self.ttl)
+        except asyncio.TimeoutError:
+            raise ConfirmationExpired(
+                f"Confirmation {confirmation_id} expired after {self.ttl:.0f}s"
+            )
+        finally:
+            pending = self._pending.get(confirmation_id)
+            if pending is not None and pending[0] is fut:
+                del self._pending[confirmation_id]
+
+    def resolve(
+        self,
+        confirmation_id: str,
+        approved: Optional[bool],
+        decisions: Optional[Dict[str, bool]] = None,
+    ) -> Optional[Dict[str, bool]]:
+        pending = self._pending.get(confirmation_id)
+        if pending is None or pending[0].done():
+            return None
+        fut, tool_call_ids = pending
+        resolved = expand_decisions(tool_call_ids, approved, decisions)
+        fut.set_result(resolved)
+        return resolved
+
+
+@dataclass
+class RunState:
+    run_id: str
+    messages: List[Dict[str, Any]]
+    pending_tool_calls: List[Dict[str, str]] = field(default_factory=list)
+    decisions: Dict[str, bool] = field(default_factory=dict)
+    confirmation_id: Optional[str] = None
+    confirmation_tool_call_ids: List[str] = field(default_factory=list)
+    # Results of approved calls, recorded as each one completes
+    results: Dict[str, str] = field(default_factory=dict)
+    # Calls still executing; they outlive a dropped stream
+    tool_tasks: Dict[str, asyncio.Task] = field(
+        default_factory=dict, repr=False
+    )
+    loops: int = 0
+    should_finish: bool = False
+    active: bool = False
+    updated_at: float = field(default_factory=time.monotonic)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "runId": self.run_id,
+            "active": self.active,
+            "loops": self.loops,
+            "pendingToolCalls": self.pending_tool_calls,
+            "completedToolCalls": list(self.results),
+            "confirmationId": self.confirmation_id,
+        }
+
+
+class RunStore:
+    """
+    In-memory checkpoints of unfinished runs, so a client can drop the
+    stream and resume the run by id. Idle entries expire after ``ttl``
+    seconds without progress and the oldest idle ones are dropped beyond
+    ``max_runs``; active runs are never evicted.
+    """
+
+    def __init__(self, ttl: float, max_runs: int):
+        self.ttl = ttl
+        self.max_runs = max_runs
+        self._runs: "OrderedDict[str, RunState]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def save(self, state: RunState) -> None:
+        with self._lock:
+            state.updated_at = time.monotonic()
+            self._runs[state.run_id] = state
+            self._runs.move_to_end(state.run_id)
+            self._expire()
+
+    def get(self, run_id: str) -> Optional[RunState]:
+        with self._lock:
+            self._expire()
+            return self._runs.get(run_id)
+
+    def claim(self, run_id: str) -> Optional[RunState]:
+        """
+        Mark an idle run active and return it; None if it is unknown or
+        already streaming. The caller must ``release`` it when its stream
+        closes, whether or not the stream ever started.
+        """
+        with self._lock:
+            self._expire()
+            state = self._runs.get(run_id)
+            if state is None or state.active:
+                return None
+            state.active = True
+            state.updated_at = time.monotonic()
+            return state
+
+    def release(self, state: RunState) -> None:
+        with self._lock:
+            state.active = False
+            state.updated_at = time.monotonic()
+
+    def discard(self, run_id: str) -> None:
+        with self._lock:
+            self._runs.pop(run_id, None)
+
+    def find_pending(self, confirmation_id: str) -> Optional[RunState]:
+        if not confirmation_id:
+            return None
+        with self._lock:
+            self._expire()
+            for state in self._runs.values():
+                if state.confirmation_id == confirmation_id:
+                    return state
+        return None
+
+    def _expire(self) -> None:
+        deadline = time.monotonic() - self.ttl
+        excess = len(self._runs) - self.max_runs
+        for run_id, state in list(self._runs.items()):
+            if state.active:
+                continue
+            if excess > 0 or state.updated_at < deadline:
+                del self._runs[run_id]
+                excess -= 1
+
+
+confirmations = ConfirmationRegistry(
+    CONFIRMATION_TTL_SECONDS, MAX_PENDING_CONFIRMATIONS
+)
+run_store = RunStore(CONFIRMATION_TTL_SECONDS, MAX_CHECKPOINTED_RUNS)
+
+
+def tool_result_event(tc: Dict[str, str], result_text: str) -> Dict[str, Any]:
+    return make_event(
+        AGEventType.TOOL_RESULT,
+        {
+            "toolCallId": tc["id"],
+            "toolName": tc["name"],
+            "content": result_text,
+            "role": "tool",
+        },
+    )
+
+
 # ============================================================
 # Agentic loop using litellm and AG-UI events with HITL
 # ============================================================
@@ -266,225 +1352,447 @@ class AGUIAgent:
         self,
         model: str = os.getenv("LLM_MODEL", "gemini/gemini-2.0-flash"),
         max_loops: int = 8,
+        api_key: Optional[str] = None,
     ):
         self.model = model
         self.max_loops = max_loops
+        self.api_key = api_key
 
     async def run(self, user_input: str) -> AsyncIterable[Dict[str, Any]]:
         """
         Agent loop:
           - Build messages
           - Ask LLM (with tools schema)
-          - If LLM returns tool calls -> emit tool events + HumanConfirmation, wait for user decision
-          - If approved -> execute tool, emit TOOL_RESULT, append tool response to messages and loop
+          - If LLM returns tool calls -> auto-approve read-only ones, emit one HumanConfirmation for the rest, wait for user decisions
+          - Execute approved tools concurrently, emit TOOL_RESULTs, append tool responses to messages and loop
           - If tool is run_final_sql_query -> emit final TOOL_RESULT (visible to user) and finish
           - If LLM returns no tools -> emit TEXT content and finish
+        The run is checkpointed in ``run_store`` until it finishes, so a
+        dropped stream can be continued with ``resume``.
         """
-        run_id = str(uuid.uuid4())
+        state = RunState(
+            run_id=str(uuid.uuid4()),
+            messages=[
+                {
+                    "role": "system",
+                    "content": "You are a DuckDB SQL expert. Use tools to explore the DB, test queries, and only call run_final_sql_query when correct.",
+                },
+                {"role": "user", "content": user_input},
+            ],
+        )
         yield make_event(
-            AGEventType.RUN_STARTED, {"runId": run_id, "input": user_input}
+            AGEventType.RUN_STARTED,
+            {"runId": state.run_id, "input": user_input},
         )
-        messages = [
-            {
-                "role": "system",
-                "content": "You are a DuckDB SQL expert. Use tools to explore the DB, test queries, and only call run_final_sql_query when correct.",
-            },
-            {"role": "user", "content": user_input},
-        ]
+        async with aclosing(self._drive(state)) as events:
+            async for event in events:
+                yield event
 
-        loops = 0
-        while loops < self.max_loops:
-            loops += 1
-            console.log(f"[yellow]LLM call #{loops}[/yellow]")
+    async def resume(self, state: RunState) -> AsyncIterable[Dict[str, Any]]:
+        """
+        Continue a checkpointed run from its pending tool calls. The caller
+        claims the run first (``run_store.claim``) and releases it when the
+        response closes.
+        """
+        yield make_event(
+            AGEventType.RUN_STARTED,
+            {"runId": state.run_id, "resumed": True},
+        )
+        async with aclosing(self._drive(state)) as events:
+            async for event in events:
+                yield event
+
+    async def _drive(self, state: RunState) -> AsyncIterable[Dict[str, Any]]:
+        state.active = True
+        run_store.save(state)
+        finished = False
+        try:
+            async with aclosing(self._loop(state)) as events:
+                async for event in events:
+                    yield event
+            finished = True
+        finally:
+            state.active = False
+            if finished:
+                run_store.discard(state.run_id)
+            else:
+                # Stream dropped: keep the checkpoint for a later resume
+                run_store.save(state)
+
+    async def _loop(self, state: RunState) -> AsyncIterable[Dict[str, Any]]:
+        run_id = state.run_id
+        while True:
+            # Process ALL pending tool calls before next LLM call
+            if state.pending_tool_calls:
+                calls = []
+                for tc in state.pending_tool_calls:
+                    try:
+                        args = json.loads(tc["arguments"])
+                    except Exception:
+                        args = {}
+                    calls.append((tc, args))
+
+                # Read-only calls are approved by policy, the rest are
+                # confirmed together in a single HUMAN_CONFIRMATION
+                needs_human = []
+                for tc, args in calls:
+                    if tc["id"] in state.decisions:
+                        continue
+                    if approval_policy.requires_confirmation(tc["name"], args):
+                        needs_human.append((tc, args))
+                    else:
+                        state.decisions[tc["id"]] = True
+                        yield make_event(
+                            AGEventType.HUMAN_CONFIRMATION,
+                            {
+                                "runId": run_id,
+                                "toolCallId": tc["id"],
+                                "toolName": tc["name"],
+                                "approved": True,
+                                "autoApproved": True,
+                            },
+                        )
 
-            # Call LLM with tools
+                if needs_human:
+                    state.confirmation_id = str(uuid.uuid4())
+                    state.confirmation_tool_call_ids = [
+                        tc["id"] for tc, _ in needs_human
+                    ]
+                    proposals = "\n".join(
+                        f"- `{tc['name']}` with args: {json.dumps(args)}"
+                        for tc, args in needs_human
+                    )
+                    yield make_event(
+                        AGEventType.HUMAN_CONFIRMATION,
+                        {
+                            "runId": run_id,
+                            "confirmationId": state.confirmation_id,
+                            "toolCalls": [
+                                {
+                                    "toolCallId": tc["id"],
+                                    "toolName": tc["name"],
+                                    "args": args,
+                                }
+                                for tc, args in needs_human
+                            ],
+                            "prompt": f"Agent proposes to call:\n{proposals}\nConfirm?",
+                        },
+                    )
+                    run_store.save(state)
+                    try:
+                        decisions = await confirmations.wait(
+                            state.confirmation_id,
+                            state.confirmation_tool_call_ids,
+                        )
+                    except ConfirmationExpired as e:
+                        yield make_event(
+                            AGEventType.RUN_ERROR,
+                            {"runId": run_id, "message": str(e)},
+                        )
+                        return
+                    state.decisions.update(decisions)
+                    state.confirmation_id = None
+                    state.confirmation_tool_call_ids = []
+
+                approved_calls = []
+                for tc, args in calls:
+                    if state.decisions.get(tc["id"]):
+                        approved_calls.append((tc, args))
+                    else:
+                        yield make_event(
+                            AGEventType.HUMAN_CONFIRMATION,
+                            {"toolCallId": tc["id"], "approved": False},
+                        )
+
+                if not approved_calls:
+                    # User denied every call -> finish run
+                    yield make_event(
+                        AGEventType.RUN_FINISHED,
+                        {"runId": run_id, "result": "Cancelled by user."},
+                    )
+                    return
+
+                # Execute approved calls concurrently, emitting each result
+                # as soon as it is ready. A resume replays recorded results
+                # and waits on calls still running instead of executing
+                # them again (an approved DML must not run twice).
+                for tc, args in approved_calls:
+                    if (
+                        tc["id"] not in state.results
+                        and tc["id"] not in state.tool_tasks
+                    ):
+                        state.tool_tasks[tc["id"]] = asyncio.ensure_future(
+                            self._execute_recorded(state, tc, args)
+                        )
+                done = [
+                    tc for tc, _ in approved_calls if tc["id"] in state.results
+                ]
+                running = [
+                    state.tool_tasks[tc["id"]]
+                    for tc, _ in approved_calls
+                    if tc["id"] not in state.results
+                ]
+                for tc in done:
+                    yield tool_result_event(tc, state.results[tc["id"]])
+                for next_result in asyncio.as_completed(running):
+                    tc, result_text = await next_result
+                    yield tool_result_event(tc, result_text)
+
+                # Append tool outputs into LLM conversation in call order
+                for tc, _ in calls:
+                    state.messages.append(
+                        {
+                            "role": "tool",
+                            "tool_call_id": tc["id"],
+                            "content": state.results.get(
+                                tc["id"], "Tool call declined by the user."
+                            ),
+                        }
+                    )
+                    # If final tool ran, finish after all tools processed
+                    if (
+                        tc["name"] == "run_final_sql_query"
+                        and tc["id"] in state.results
+                    ):
+                        state.should_finish = True
+                state.pending_tool_calls = []
+                state.decisions = {}
+                state.results = {}
+
+            # After processing ALL tool calls, check if we should finish
+            if state.should_finish:
+                yield make_event(
+                    AGEventType.RUN_FINISHED,
+                    {"runId": run_id, "result": "Query completed"},
+                )
+                return
+
+            if state.loops >= self.max_loops:
+                yield make_event(
+                    AGEventType.RUN_FINISHED,
+                    {"runId": run_id, "result": "Reached max agent loops."},
+                )
+                return
+
+            state.loops += 1
+            console.log(f"[yellow]LLM call #{state.loops}[/yellow]")
+
+            # Call LLM with tools, forwarding deltas as they arrive
+            message = StreamedMessage()
+            cache_key = cached = None
             try:
-                completion = litellm.completion(
-                    model=self.model, messages=messages, tools=TOOLS_SCHEMA
+                # The checkpoint keeps the full history, the LLM gets a
+                # compacted copy
+                prompt_messages = history_compactor.compact(
+                    state.messages, self.model
                 )
+                if completion_cache is not None:
+                    cache_key = CompletionCache.key(
+                        self.model, prompt_messages, TOOLS_SCHEMA
+                    )
+                    cached = completion_cache.get(cache_key)
+                if cached is not None:
+                    console.log("[cyan]completion cache hit[/cyan]")
+                    for chunk in cached_completion_chunks(cached):
+                        for event in message.feed(chunk):
+                            yield event
+                else:
+                    waited = await llm_rate_limiter.acquire(
+                        self.model, self.api_key
+                    )
+                    if waited:
+                        console.log(
+                            f"[yellow]Rate limited, waited {waited:.2f}s[/yellow]"
+                        )
+                    response = await litellm.acompletion(
+                        model=self.model,
+                        messages=prompt_messages,
+                        tools=TOOLS_SCHEMA,
+                        stream=True,
+                        api_key=self.api_key,
+                    )
+                    async for chunk in response:
+                        for event in message.feed(chunk):
+                            yield event
             except Exception as e:
                 yield make_event(
                     AGEventType.RUN_ERROR, {"message": f"LLM call failed: {e}"}
                 )
                 return
+            if cache_key is not None and cached is None:
+                completion_cache.put(
+                    cache_key,
+                    {
+                        "content": message.text,
+                        "tool_calls": message.tool_calls,
+                    },
+                )
+            for event in message.close():
+                yield event
 
-            choice = completion.choices[0].message
-            tool_calls = getattr(choice, "tool_calls", None)
-            assistant_text = getattr(choice, "content", "") or ""
+            tool_calls = message.tool_calls
+            assistant_text = message.text
 
             # If LLM wants to call tools
             if tool_calls:
                 # keep assistant message in transcript with tool metadata
-                messages.append(
+                state.messages.append(
                     {
                         "role": "assistant",
                         "content": assistant_text,
                         "tool_calls": [
                             {
-                                "id": tc.id,
+                                "id": tc["id"],
                                 "function": {
-                                    "name": tc.function.name,
-                                    "arguments": tc.function.arguments,
+                                    "name": tc["name"],
+                                    "arguments": tc["arguments"],
                                 },
                             }
                             for tc in tool_calls
                         ],
                     }
                 )
+                state.pending_tool_calls = list(tool_calls)
+                # Continue loop with updated messages (one LLM call for all tools)
+                continue
 
-                # Process ALL tool calls before next LLM call
-                should_finish = False
-                for tc in tool_calls:
-                    tool_name = tc.function.name
-                    args_str = tc.function.arguments
-                    try:
-                        args = json.loads(args_str)
-                    except Exception:
-                        args = {}
-
-                    tool_call_id = tc.id or str(uuid.uuid4())
-
-                    # Emit tool start/args/end events (streaming pattern)
-                    yield make_event(
-                        AGEventType.TOOL_START,
-                        {
-                            "toolCallId": tool_call_id,
-                            "toolCallName": tool_name,
-                        },
-                    )
-                    yield make_event(
-                        AGEventType.TOOL_ARGS,
-                        {"toolCallId": tool_call_id, "delta": args},
-                    )
-                    yield make_event(
-                        AGEventType.TOOL_END, {"toolCallId": tool_call_id}
-                    )
-
-                    # Emit HUMAN_CONFIRMATION and wait for frontend action
-                    yield make_event(
-                        AGEventType.HUMAN_CONFIRMATION,
-                        {
-                            "toolCallId": tool_call_id,
-                            "toolName": tool_name,
-                            "args": args,
-                            "prompt": f"Agent proposes to call `{tool_name}` with args: {json.dumps(args)}. Confirm?",
-                        },
-                    )
+            # No tool calls => assistant content was streamed, finish
+            yield make_event(
+                AGEventType.RUN_FINISHED,
+                {"runId": run_id, "result": assistant_text},
+            )
+            return
+
+    async def _execute_recorded(
+        self, state: RunState, tc: Dict[str, str], args: Dict[str, Any]
+    ) -> Tuple[Dict[str, str], str]:
+        """Run one approved call and record its result on the run."""
+        try:
+            result_text = await self.execute_tool(tc["name"], args)
+        finally:
+            state.tool_tasks.pop(tc["id"], None)
+        state.results[tc["id"]] = result_text
+        return tc, result_text
+
+    async def execute_tool(self, tool_name: str, args: Dict[str, Any]) -> str:
+        func = AVAILABLE_FUNCTIONS.get(tool_name)
+        if not func:
+            return f"Unknown tool: {tool_name}"
+        try:
+            if tool_name == "list_tables":
+                return json.dumps(
+                    await run_in_db_executor(func, args.get("reasoning", ""))
+                )
+            elif tool_name == "describe_table":
+                return await run_in_db_executor(
+                    func,
+                    args.get("reasoning", ""),
+                    args.get("table_name"),
+                )
+            elif tool_name == "describe_all":
+                return await run_in_db_executor(
+                    func, args.get("reasoning", "")
+                )
+            elif tool_name == "sample_table":
+                return await run_in_db_executor(
+                    func,
+                    args.get("reasoning", ""),
+                    args.get("table_name"),
+                    int(args.get("row_sample_size", 3)),
+                )
+            elif tool_name == "run_test_sql_query":
+                return await run_in_db_executor(
+                    func,
+                    args.get("reasoning", ""),
+                    args.get("sql_query"),
+                )
+            elif tool_name == "run_final_sql_query":
+                return await run_in_db_executor(
+                    func,
+                    args.get("reasoning", ""),
+                    args.get("sql_query"),
+                )
+            else:
+                return await run_in_db_executor(partial(func, **args))
+        except Exception as e:
+            return f"Error executing {tool_name}: {e}"
 
-                    fut = asyncio.get_event_loop().create_future()
-                    confirmation_futures[tool_call_id] = fut
-                    try:
-                        approved = await asyncio.wait_for(fut, timeout=None)
-                    except asyncio.CancelledError:
-                        approved = False
-                    finally:
-                        confirmation_futures.pop(tool_call_id, None)
-
-                    if not approved:
-                        # User denied -> emit cancellation and finish run
-                        yield make_event(
-                            AGEventType.HUMAN_CONFIRMATION,
-                            {"toolCallId": tool_call_id, "approved": False},
-                        )
-                        yield make_event(
-                            AGEventType.RUN_FINISHED,
-                            {"runId": run_id, "result": "Cancelled by user."},
-                        )
-                        return
-                    else:
-                        # Execute tool
-                        func = AVAILABLE_FUNCTIONS.get(tool_name)
-                        if not func:
-                            result_text = f"Unknown tool: {tool_name}"
-                        else:
-                            try:
-                                if tool_name == "list_tables":
-                                    result_text = json.dumps(
-                                        func(args.get("reasoning", ""))
-                                    )
-                                elif tool_name == "describe_table":
-                                    result_text = func(
-                                        args.get("reasoning", ""),
-                                        args.get("table_name"),
-                                    )
-                                elif tool_name == "sample_table":
-                                    result_text = func(
-                                        args.get("reasoning", ""),
-                                        args.get("table_name"),
-                                        int(args.get("row_sample_size", 3)),
-                                    )
-                                elif tool_name == "run_test_sql_query":
-                                    result_text = func(
-                                        args.get("reasoning", ""),
-                                        args.get("sql_query"),
-                                    )
-                                elif tool_name == "run_final_sql_query":
-                                    result_text = func(
-                                        args.get("reasoning", ""),
-                                        args.get("sql_query"),
-                                    )
-                                else:
-                                    result_text = func(**args)
-                            except Exception as e:
-                                result_text = (
-                                    f"Error executing {tool_name}: {e}"
-                                )
-
-                        # Emit the tool result
-                        yield make_event(
-                            AGEventType.TOOL_RESULT,
-                            {
-                                "toolCallId": tool_call_id,
-                                "toolName": tool_name,
-                                "content": result_text,
-                                "role": "tool",
-                            },
-                        )
 
-                        # Append tool output into LLM conversation
-                        messages.append(
-                            {
-                                "role": "tool",
-                                "tool_call_id": tool_call_id,
-                                "content": result_text,
-                            }
-                        )
+# ============================================================
+# Event writer (immediate flush, optional micro-batching)
+# ============================================================
+EVENT_BATCH_MAX = int(os.getenv("EVENT_BATCH_MAX", "1"))
+EVENT_BATCH_MAX_BYTES = int(os.getenv("EVENT_BATCH_MAX_BYTES", "16384"))
+END_OF_STREAM = object()
 
-                        # If final tool, mark to finish after all tools processed
-                        if tool_name == "run_final_sql_query":
-                            should_finish = True
 
-                # After processing ALL tool calls, check if we should finish
-                if should_finish:
-                    yield make_event(
-                        AGEventType.RUN_FINISHED,
-                        {"runId": run_id, "result": "Query completed"},
-                    )
-                    return
+class EventWriter:
+    """
+    Writes events through an EventEncoder, flushing each one as soon as it
+    is produced.
 
-                # Continue loop with updated messages (one LLM call for all tools)
-                # Add small delay to respect rate limits
-                await asyncio.sleep(0.5)
-                continue
+    With ``max_batch`` > 1, events already queued when the writer wakes up
+    are coalesced into one chunk (up to ``max_batch_bytes``). The writer
+    never waits to fill a batch, so batching adds no latency.
+    """
 
-            else:
-                # No tool calls => send assistant content to user and finish
-                if assistant_text:
-                    yield make_event(
-                        AGEventType.TEXT_CONTENT, {"content": assistant_text}
-                    )
-                yield make_event(
-                    AGEventType.RUN_FINISHED,
-                    {"runId": run_id, "result": assistant_text},
-                )
-                return
-
-        # Max loops reached
-        yield make_event(
-            AGEventType.RUN_FINISHED,
-            {"runId": run_id, "result": "Reached max agent loops."},
-        )
-        return
+    def __init__(
+        self,
+        encoder: EventEncoder,
+        max_batch: int = 1,
+        max_batch_bytes: int = 16384,
+    ):
+        self.encoder = encoder
+        self.max_batch = max_batch
+        self.max_batch_bytes = max_batch_bytes
+
+    async def write(
+        self, events: AsyncIterable[Dict[str, Any]]
+    ) -> AsyncIterator[bytes]:
+        if self.max_batch <= 1:
+            async for event in events:
+                yield self.encoder.encode(event)
+            return
+
+        queue: asyncio.Queue = asyncio.Queue()
+        producer = asyncio.create_task(self._produce(events, queue))
+        try:
+            while True:
+                item = await queue.get()
+                lines: List[bytes] = []
+                size = 0
+                while True:
+                    if item is END_OF_STREAM:
+                        if lines:
+                            yield b"".join(lines)
+                        return
+                    if isinstance(item, BaseException):
+                        raise item
+                    line = self.encoder.encode(item)
+                    lines.append(line)
+                    size += len(line)
+                    if (
+                        len(lines) >= self.max_batch
+                        or size >= self.max_batch_bytes
+                        or queue.empty()
+                    ):
+                        break
+                    item = queue.get_nowait()
+                yield b"".join(lines)
+        finally:
+            producer.cancel()
+
+    @staticmethod
+    async def _produce(
+        events: AsyncIterable[Dict[str, Any]], queue: asyncio.Queue
+    ) -> None:
+        try:
+            async for event in events:
+                queue.put_nowait(event)
+        except Exception as e:
+            queue.put_nowait(e)
+        finally:
+            queue.put_nowait(END_OF_STREAM)
 
 
 # ============================================================
@@ -527,12 +1835,17 @@ function Bubble({role, children}) {
   return React.createElement("div", {className:cls}, children);
 }
 
-function ConfirmBox({id,prompt,onConfirm,onCancel}) {
+function ConfirmBox({id,toolCalls,onSubmit}) {
+  const [selected,setSelected]=useState(()=>Object.fromEntries(toolCalls.map(tc=>[tc.toolCallId,true])));
   return React.createElement("div",{className:"confirm"},
-    React.createElement("div",null,prompt),
+    React.createElement("div",null,"Agent proposes to call:"),
+    toolCalls.map(tc=>React.createElement("label",{key:tc.toolCallId,style:{display:"block",marginTop:4}},
+      React.createElement("input",{type:"checkbox",checked:!!selected[tc.toolCallId],onChange:e=>setSelected(prev=>({...prev,[tc.toolCallId]:e.target.checked})),style:{marginRight:6}}),
+      `${tc.toolName} ${JSON.stringify(tc.args)}`
+    )),
     React.createElement("div",{style:{marginTop:8,textAlign:"right"}},
-      React.createElement("button",{onClick:()=>onConfirm(id),style:{background:"#16a34a",marginRight:8}}, "Confirm"),
-      React.createElement("button",{onClick:()=>onCancel(id),style:{background:"#ef4444"}}, "Cancel")
+      React.createElement("button",{onClick:()=>onSubmit(id,{decisions:selected}),style:{background:"#16a34a",marginRight:8}}, "Confirm selected"),
+      React.createElement("button",{onClick:()=>onSubmit(id,{approved:false}),style:{background:"#ef4444"}}, "Cancel")
     )
   );
 }
@@ -543,9 +1856,14 @@ function App(){
   const [input,setInput]=useState("");
   const [loading,setLoading]=useState(false);
   const chatRef=useRef(null);
+  const streaming=useRef(false);
 
   useEffect(()=>{ if(chatRef.current) chatRef.current.scrollTop = chatRef.current.scrollHeight; }, [messages, pending]);
 
+  function update(id, fn){
+    setMessages(prev=>prev.map(m=> m.id===id ? fn(m) : m));
+  }
+
   function append(msg){
     setMessages(prev=>{
       const last = prev[prev.length-1];
@@ -560,9 +1878,13 @@ function App(){
     const text=input.trim();
     append({role:"user",content:text});
     setInput("");
-    setLoading(true);
+    await consume('/stream?input='+encodeURIComponent(text));
+  }
 
-    const res = await fetch('/stream?input='+encodeURIComponent(text));
+  async function consume(url){
+    setLoading(true);
+    streaming.current = true;
+    const res = await fetch(url);
     const reader = res.body.getReader();
     const decoder = new TextDecoder();
     let buf = "";
@@ -579,24 +1901,33 @@ function App(){
           const ev = JSON.parse(line);
           // handle events
           switch(ev.type){
+            case "TextMessageStart":
+              append({id: ev.payload.messageId, role:"assistant", content:""});
+              break;
             case "TextMessageContent":
-              append({role:"assistant",content: ev.payload.content});
+              update(ev.payload.messageId, m=>({...m, content: m.content + ev.payload.delta}));
+              break;
+            case "TextMessageEnd":
               break;
             case "ToolCallStart":
-              append({role:"assistant",content:`[tool start] ${ev.payload.toolCallName || ev.payload.toolName || ""}`});
+              append({id: ev.payload.toolCallId, role:"assistant", content:`[tool start] ${ev.payload.toolCallName || ev.payload.toolName || ""} `});
               break;
             case "ToolCallArgs":
-              // optional: show args summary
+              update(ev.payload.toolCallId, m=>({...m, content: m.content + ev.payload.delta}));
               break;
             case "ToolCallEnd":
               break;
             case "ToolCallResult":
               append({role:"assistant",content: ev.payload.content});
+              // final query rows are fetched separately, by handle
+              const result = String(ev.payload.content || "").match(/[/]results[/][A-Za-z0-9-]+/);
+              if(result) append({role:"assistant",content:"Full result: ",links:[[result[0],"Arrow"],[result[0]+"?format=ndjson","NDJSON"]]});
               break;
             case "HumanConfirmation":
-              // store pending confirmation by id to render ConfirmBox
+              // store pending batch by id to render ConfirmBox
               const p = ev.payload;
-              setPending(prev=>({...prev, [p.toolCallId]:p}));
+              if(p.confirmationId) setPending(prev=>({...prev, [p.confirmationId]:p}));
+              else if(p.autoApproved) append({role:"assistant",content:`[auto-approved] ${p.toolName}`});
               break;
             case "RunFinished":
               if(ev.payload && ev.payload.result){
@@ -616,18 +1947,22 @@ function App(){
         }
       }
     }
+    streaming.current = false;
     setLoading(false);
   }
 
-  async function confirmAction(id, approved){
+  async function confirmAction(id, decision){
     // remove pending UI
     setPending(prev=>{ const c = {...prev}; delete c[id]; return c; });
     try{
-      await fetch("/confirm", {
+      const res = await fetch("/confirm", {
         method:"POST",
         headers: {"Content-Type":"application/json"},
-        body: JSON.stringify({toolCallId:id, approved: !!approved})
+        body: JSON.stringify({confirmationId:id, ...decision})
       });
+      const data = await res.json();
+      // the run's stream was dropped: continue it from its checkpoint
+      if(data.resume && !streaming.current) await consume(data.resume);
     }catch(err){
       console.error("confirm err", err);
     }
@@ -635,8 +1970,9 @@ function App(){
 
   return React.createElement("div", {style:{height:"100vh",display:"flex",flexDirection:"column"}},
     React.createElement("div",{ref:chatRef,className:"chat"},
-      messages.map((m,i)=> React.createElement(Bubble,{key:i,role:m.role}, m.content)),
-      Object.entries(pending).map(([id,p]) => React.createElement(ConfirmBox,{key:id,id:id,prompt:p.prompt || JSON.stringify(p), onConfirm:()=>confirmAction(id,true), onCancel:()=>confirmAction(id,false)}))
+      messages.map((m,i)=> React.createElement(Bubble,{key:i,role:m.role}, m.content,
+        (m.links || []).map(([href,label])=> React.createElement("a",{key:href,href:href,style:{marginRight:8}},label)))),
+      Object.entries(pending).map(([id,p]) => React.createElement(ConfirmBox,{key:id,id:id,toolCalls:p.toolCalls,onSubmit:confirmAction}))
     ),
     React.createElement("div",{className:"input"},
       React.createElement("textarea",{value:input,onChange:e=>setInput(e.target.value),onKeyDown:e=>{if(e.key==="Enter"&&!e.shiftKey){e.preventDefault();send();}},placeholder:"Ask about your data... (Shift+Enter for new line)"}),
@@ -658,40 +1994,113 @@ async def index():
 
 
 @app.get("/stream")
-async def stream(input: str):
+async def stream(input: str, format: Literal["ndjson", "sse"] = "ndjson"):
     agent = AGUIAgent()
 
-    async def gen():
-        async for ev in agent.run(input):
-            # produce newline-delimited JSON (NDJSON)
-            yield json.dumps(ev, ensure_ascii=False) + "\n"
-            # small pause for nicer progressive UI
-            await asyncio.sleep(0.01)
-
-    return StreamingResponse(gen(), media_type="application/x-ndjson")
+    encoder = EventEncoder(format)
+    writer = EventWriter(encoder, EVENT_BATCH_MAX, EVENT_BATCH_MAX_BYTES)
+    return StreamingResponse(
+        writer.write(agent.run(input)), media_type=encoder.media_type
+    )
 
 
 @app.post("/confirm")
 async def confirm(request: Request):
+    """
+    Decide a batch of tool calls: ``approved`` applies to every call in the
+    batch and ``decisions`` ({toolCallId: bool}) overrides single calls.
+    """
     body = await request.json()
-    tool_call_id = body.get("toolCallId")
-    approved = bool(body.get("approved"))
-    fut = confirmation_futures.get(tool_call_id)
-    if fut and not fut.done():
-        fut.set_result(approved)
-        return {"ok": True, "toolCallId": tool_call_id, "approved": approved}
-    else:
+    confirmation_id = body.get("confirmationId")
+    approved = body.get("approved")
+    decisions = body.get("decisions")
+    resolved = confirmations.resolve(confirmation_id, approved, decisions)
+    if resolved is not None:
+        return {
+            "ok": True,
+            "confirmationId": confirmation_id,
+            "decisions": resolved,
+        }
+
+    # Nobody is streaming the run right now: record the decisions on its
+    # checkpoint and let the client resume it
+    state = run_store.find_pending(confirmation_id)
+    if state is not None:
+        resolved = expand_decisions(
+            state.confirmation_tool_call_ids, approved, decisions
+        )
+        state.decisions.update(resolved)
+        state.confirmation_id = None
+        state.confirmation_tool_call_ids = []
         return {
-            "ok": False,
-            "error": "No pending confirmation for this id",
-            "toolCallId": tool_call_id,
+            "ok": True,
+            "confirmationId": confirmation_id,
+            "decisions": resolved,
+            "runId": state.run_id,
+            "resume": None if state.active else f"/runs/{state.run_id}/resume",
         }
+    return {
+        "ok": False,
+        "error": "No pending confirmation for this id",
+        "confirmationId": confirmation_id,
+    }
+
+
+@app.get("/runs/{run_id}")
+async def get_run(run_id: str):
+    state = run_store.get(run_id)
+    if state is None:
+        raise HTTPException(status_code=404, detail="Unknown or expired run")
+    return state.to_dict()
+
+
+@app.get("/runs/{run_id}/resume")
+async def resume_run(run_id: str, format: Literal["ndjson", "sse"] = "ndjson"):
+    # Claimed before returning: two concurrent resumes can't both drive it
+    state = run_store.claim(run_id)
+    if state is None:
+        if run_store.get(run_id) is None:
+            raise HTTPException(
+                status_code=404, detail="Unknown or expired run"
+            )
+        raise HTTPException(status_code=409, detail="Run is already streaming")
+    agent = AGUIAgent()
+
+    encoder = EventEncoder(format)
+    writer = EventWriter(encoder, EVENT_BATCH_MAX, EVENT_BATCH_MAX_BYTES)
+    # Released once the response closes, even if the client disconnects
+    # before the first event and the generator never starts
+    return StreamingResponse(
+        writer.write(agent.resume(state)),
+        media_type=encoder.media_type,
+        background=BackgroundTask(run_store.release, state),
+    )
+
+
+@app.get("/results/{handle}")
+async def get_result(
+    handle: str, format: Literal["arrow", "ndjson"] = "arrow"
+):
+    """Stream a final query result once, as Arrow IPC or NDJSON batches."""
+    stored = result_store.claim(handle)
+    if stored is None:
+        raise HTTPException(
+            status_code=404,
+            detail="Unknown, expired or already fetched result",
+        )
+    return StreamingResponse(
+        stream_result(stored, format), media_type=RESULT_MEDIA_TYPES[format]
+    )
 
 
 # ============================================================
 # Run with uvicorn when executed directly
 # ============================================================
 if __name__ == "__main__":
+    if sys.argv[1:2] == ["bench-events"]:
+        benchmark_event_encoding()
+        sys.exit(0)
+
     import uvicorn
 
     uvicorn.run(app, host="0.0.0.0", port=8000)
@@ -1,10 +1,13 @@
 import asyncio
 import json
 import os
+import queue
+import threading
 import time
 import uuid
+import weakref
 from enum import Enum
-from typing import Any, Dict, List, Optional
+from typing import Any, Dict, List, Optional, Tuple
 
 import duckdb
 import litellm
@@ -13,6 +16,13 @@ from rich.console import Console
 from rich.panel import Panel
 
 import streamlit as st
+from agent_support import (
+    HistoryCompactor,
+    QueryResultCache,
+    SchemaCatalog,
+    is_ddl,
+    is_read_only_sql,
+)
 
 load_dotenv()
 
@@ -20,14 +30,93 @@ load_dotenv()
 # Persistent DuckDB connection
 # ----------------------------
 DB_PATH = "data.duckdb"
+DB_THREADS = int(os.getenv("DB_THREADS", "0"))
+DB_MEMORY_LIMIT = os.getenv("DB_MEMORY_LIMIT", "")
 os.makedirs(os.path.dirname(DB_PATH) or ".", exist_ok=True)
 
 
-def get_connection():
-    """Get or create a DuckDB connection for this session."""
-    if "db_connection" not in st.session_state:
-        st.session_state.db_connection = duckdb.connect(DB_PATH)
-    return st.session_state.db_connection
+@st.cache_resource
+def get_database() -> duckdb.DuckDBPyConnection:
+    """
+    Open the database once per process, shared by every session.
+
+    ``threads`` and ``memory_limit`` are instance-wide in DuckDB, so they
+    bound the whole app rather than each session.
+    """
+    config: Dict[str, Any] = {}
+    if DB_THREADS:
+        config["threads"] = DB_THREADS
+    if DB_MEMORY_LIMIT:
+        config["memory_limit"] = DB_MEMORY_LIMIT
+    return duckdb.connect(DB_PATH, config=config)
+
+
+class SessionCursor:
+    """
+    The DuckDB cursor of one session, closed once the holder is collected
+    (i.e. when the session state of an expired session is dropped).
+    """
+
+    def __init__(self, database: duckdb.DuckDBPyConnection):
+        self.cursor = database.cursor()
+        weakref.finalize(self, self.cursor.close)
+
+
+# Set by AgentWorker threads, which cannot reach st.session_state
+tool_context = threading.local()
+
+
+def get_connection() -> duckdb.DuckDBPyConnection:
+    """Get or create the DuckDB cursor for this session."""
+    connection = getattr(tool_context, "connection", None)
+    if connection is not None:
+        return connection
+    if "db_cursor" not in st.session_state:
+        st.session_state.db_cursor = SessionCursor(get_database())
+    return st.session_state.db_cursor.cursor
+
+
+# ----------------------------
+# Schema catalog cache
+# ----------------------------
+@st.cache_resource
+def shared_schema_catalog() -> SchemaCatalog:
+    """Get the schema catalog shared across sessions."""
+    return SchemaCatalog()
+
+
+def get_schema_catalog() -> SchemaCatalog:
+    """The shared schema catalog, as handed to the AgentWorker thread."""
+    catalog = getattr(tool_context, "schema_catalog", None)
+    if catalog is not None:
+        return catalog
+    return shared_schema_catalog()
+
+
+# ----------------------------
+# Query result cache
+# ----------------------------
+QUERY_CACHE_MAX_ENTRIES = int(os.getenv("QUERY_CACHE_MAX_ENTRIES", "256"))
+QUERY_CACHE_MAX_BYTES = int(
+    os.getenv("QUERY_CACHE_MAX_BYTES", str(16 * 1024 * 1024))
+)
+QUERY_CACHE_TTL_SECONDS = float(os.getenv("QUERY_CACHE_TTL_SECONDS", "300"))
+
+
+@st.cache_resource
+def shared_query_cache() -> QueryResultCache:
+    """Get the test query result cache shared across sessions."""
+    return QueryResultCache(
+        QUERY_CACHE_MAX_ENTRIES, QUERY_CACHE_MAX_BYTES, QUERY_CACHE_TTL_SECONDS
+    )
+
+
+def get_query_cache() -> QueryResultCache:
+    """The shared query cache, as handed to the AgentWorker thread."""
+    query_cache = getattr(tool_context, "query_cache", None)
+    if query_cache is not None:
+        return query_cache
+    return shared_query_cache()
 
 
 console = Console()
@@ -148,6 +237,23 @@ def format_tool_error(error: Exception, tool_name: str) -> str:
     )
 
 
+NOTIFICATION_ICONS = {"toast": None, "success": "✅", "error": "❌"}
+
+
+def notify(kind: str, text: str) -> None:
+    """
+    Show a toast, success or error message.
+
+    Inside an AgentWorker the message is queued as an event instead, and
+    the page shows it as a toast when it drains the worker.
+    """
+    events = getattr(tool_context, "events", None)
+    if events is None:
+        getattr(st, kind)(text)
+    else:
+        events.put(("notify", (kind, text)))
+
+
 # ----------------------------
 # DuckDB tools (MINOR FIX #17: Added complete type hints)
 # ----------------------------
@@ -166,17 +272,15 @@ def list_tables(reasoning: str) -> str:
     """
     try:
         con = get_connection()
-        con.execute("SHOW TABLES")
-        rows = con.fetchall()
-        result = [r[0] for r in rows]
+        result = get_schema_catalog().tables(con)
         debug_log(
             f"[blue]list_tables[/blue] - reasoning: {reasoning} -> {result}"
         )
-        st.toast(f"Tool: list_tables executed. Found: {result}")
+        notify("toast", f"Tool: list_tables executed. Found: {result}")
         return format_tool_result(result, reasoning)
     except Exception as e:
         console.log(f"[red]list_tables error[/red] {e}")
-        st.error(f"list_tables error: {e}")
+        notify("error", f"list_tables error: {e}")
         raise
 
 
@@ -196,15 +300,45 @@ def describe_table(reasoning: str, table_name: str) -> str:
     """
     try:
         con = get_connection()
-        con.execute(f"DESCRIBE {table_name}")
-        schema = con.fetchall()
+        schema = get_schema_catalog().columns(con, table_name)
         result = {col[0]: col[1] for col in schema}
         debug_log(f"[blue]describe_table[/blue] - {table_name} - {reasoning}")
-        st.toast(f"Tool: describe_table for {table_name} executed.")
+        notify("toast", f"Tool: describe_table for {table_name} executed.")
         return format_tool_result(result, reasoning)
     except Exception as e:
         console.log(f"[red]describe_table error[/red] {e}")
-        st.error(f"describe_table error: {e}")
+        notify("error", f"describe_table error: {e}")
+        raise
+
+
+def describe_all(reasoning: str) -> str:
+    """
+    Get schema information for every table in a single call.
+
+    Args:
+        reasoning: Explanation of why this tool is being called
+
+    Returns:
+        JSON-formatted string mapping each table to its columns and types
+
+    Raises:
+        Exception: If database query fails
+    """
+    try:
+        con = get_connection()
+        catalog = get_schema_catalog().describe_all(con)
+        result = {
+            table_name: {col[0]: col[1] for col in columns}
+            for table_name, columns in catalog.items()
+        }
+        debug_log(f"[blue]describe_all[/blue] - {reasoning}")
+        notify(
+            "toast", f"Tool: describe_all executed for {len(result)} tables."
+        )
+        return format_tool_result(result, reasoning)
+    except Exception as e:
+        console.log(f"[red]describe_all error[/red] {e}")
+        notify("error", f"describe_all error: {e}")
         raise
 
 
@@ -231,11 +365,11 @@ def sample_table(reasoning: str, table_name: str, row_sample_size: int) -> str:
         sample = con.fetchall()
         result = [str(r) for r in sample]
         debug_log(f"[blue]sample_table[/blue] - {table_name} - {reasoning}")
-        st.toast(f"Tool: sample_table for {table_name} executed.")
+        notify("toast", f"Tool: sample_table for {table_name} executed.")
         return format_tool_result(result, reasoning)
     except Exception as e:
         console.log(f"[red]sample_table error[/red] {e}")
-        st.error(f"sample_table error: {e}")
+        notify("error", f"sample_table error: {e}")
         raise
 
 
@@ -256,17 +390,37 @@ def run_test_sql_query(reasoning: str, sql_query: str) -> str:
     console.print(f"[dim]Test query: {sql_query}[/dim]")
     try:
         con = get_connection()
-        con.execute(sql_query)
-        rows = con.fetchall()
-        result = [str(r) for r in rows]
+        query_cache = get_query_cache()
+        cacheable = is_read_only_sql(sql_query)
+        result = None
+        if cacheable:
+            result, version = query_cache.get(sql_query)
+            console.log(
+                f"[cyan]query cache {'miss' if result is None else 'hit'}"
+                f"[/cyan] - {query_cache.stats()}"
+            )
+        if result is None:
+            try:
+                con.execute(sql_query)
+            finally:
+                if not cacheable:
+                    query_cache.bump()
+            rows = con.fetchall()
+            if is_ddl(sql_query):
+                get_schema_catalog().invalidate()
+            result = [str(r) for r in rows]
+            if cacheable:
+                query_cache.put(
+                    sql_query, version, result, sum(len(r) for r in result)
+                )
         debug_log(
             f"[blue]run_test_sql_query[/blue] - {sql_query} - {reasoning}"
         )
-        st.toast("Test SQL executed (result visible only to agent).")
+        notify("toast", "Test SQL executed (result visible only to agent).")
         return format_tool_result(result, reasoning)
     except Exception as e:
         console.log(f"[red]run_test_sql_query error[/red] {e}")
-        st.error(f"Test Query Error: {e}")
+        notify("error", f"Test Query Error: {e}")
         raise
 
 
@@ -297,15 +451,20 @@ def run_final_sql_query(reasoning: str, sql_query: str) -> str:
             rows = con.fetchall()
             result = [str(r) for r in rows]
         else:
-            con.execute(sql_query)
+            try:
+                con.execute(sql_query)
+            finally:
+                get_query_cache().bump()
+            if is_ddl(sql_query):
+                get_schema_catalog().invalidate()
             result = f"Statement executed successfully: {sql_query[:50]}..."
 
         console.log(f"[green]run_final_sql_query[/green] - success")
-        st.success("Final Statement Executed!")
+        notify("success", "Final Statement Executed!")
         return format_tool_result(result, reasoning)
     except Exception as e:
         console.log(f"[red]run_final_sql_query error[/red] {e}")
-        st.error(f"Final Statement Error: {e}")
+        notify("error", f"Final Statement Error: {e}")
         raise
 
 
@@ -337,6 +496,18 @@ TOOLS_SCHEMA = [
             },
         },
     },
+    {
+        "type": "function",
+        "function": {
+            "name": "describe_all",
+            "description": "Returns schema info for every table in a single call",
+            "parameters": {
+                "type": "object",
+                "properties": {"reasoning": {"type": "string"}},
+                "required": ["reasoning"],
+            },
+        },
+    },
     {
         "type": "function",
         "function": {
@@ -388,6 +559,7 @@ TOOLS_SCHEMA = [
 AVAILABLE_FUNCTIONS = {
     "list_tables": list_tables,
     "describe_table": describe_table,
+    "describe_all": describe_all,
     "sample_table": sample_table,
     "run_test_sql_query": run_test_sql_query,
     "run_final_sql_query": run_final_sql_query,
@@ -397,68 +569,91 @@ AVAILABLE_FUNCTIONS = {
 # ----------------------------
 # Message History Management
 # ----------------------------
-def rebuild_llm_history(
-    display_messages: List[Dict[str, Any]],
-) -> List[Dict[str, Any]]:
+SYSTEM_PROMPT = "You are a DuckDB SQL expert. Use tools to explore the DB, test queries, and only call run_final_sql_query when correct."
+
+
+class TranscriptBuilder:
     """
-    Rebuild clean LLM message history from display messages.
+    Clean LLM message history, kept in sync with the display messages.
     This ensures the LLM gets proper conversation context without UI artifacts.
 
+    Display messages are append-only, so ``sync`` only converts the ones
+    added since the previous call; tool calls still waiting for their
+    result are carried over. Serialized tool call arguments are cached by
+    tool call id (for the same args object) until the call is paired with
+    its result.
+
     CRITICAL: Maintains proper tool call -> tool result pairing.
     """
-    llm_messages = [
-        {
-            "role": "system",
-            "content": "You are a DuckDB SQL expert. Use tools to explore the DB, test queries, and only call run_final_sql_query when correct.",
-        },
-    ]
 
-    # Track tool calls that need to be paired with results
-    pending_tool_calls = {}
+    def __init__(self):
+        self.reset()
 
-    for msg in display_messages:
+    def reset(self) -> None:
+        """Drop everything synced so far, back to the system prompt."""
+        self.messages: List[Dict[str, Any]] = [
+            {"role": "system", "content": SYSTEM_PROMPT},
+        ]
+        self._synced = 0
+        # Track tool calls that need to be paired with results
+        self._pending_tool_calls: Dict[str, Dict[str, Any]] = {}
+        self._arguments: Dict[str, Tuple[Dict[str, Any], str]] = {}
+
+    def sync(
+        self, display_messages: List[Dict[str, Any]]
+    ) -> List[Dict[str, Any]]:
+        if len(display_messages) < self._synced:
+            # The display history was replaced, start over
+            self.reset()
+        for msg in display_messages[self._synced :]:
+            self._append(msg)
+        self._synced = len(display_messages)
+        return self.messages
+
+    def serialized_arguments(
+        self, tool_call_id: str, args: Dict[str, Any]
+    ) -> str:
+        cached = self._arguments.get(tool_call_id)
+        if cached is None or cached[0] is not args:
+            cached = self._arguments[tool_call_id] = (args, json.dumps(args))
+        return cached[1]
+
+    def _append(self, msg: Dict[str, Any]) -> None:
         role = msg.get("role")
 
         # Skip welcome message
         if role == "assistant" and msg.get("content", "").startswith(
             "Welcome!"
         ):
-            continue
+            return
 
         # Skip confirmation messages (UI only)
         if role == "confirmation":
-            continue
+            return
 
         # Handle tool_call_start - store for later pairing
         if role == "tool_call_start":
             tool_call_id = msg.get("tool_call_id")
-            pending_tool_calls[tool_call_id] = {
+            self._pending_tool_calls[tool_call_id] = {
                 "id": tool_call_id,
                 "type": "function",
                 "function": {
                     "name": msg.get("tool_name"),
-                    "arguments": json.dumps(msg.get("args", {})),
+                    "arguments": self.serialized_arguments(
+                        tool_call_id, msg.get("args", {})
+                    ),
                 },
             }
-            continue
+            return
 
         # Add standard messages
         if role == "user":
-            llm_messages.append({"role": "user", "content": msg["content"]})
-
-        # --- FIX APPLIED HERE: REMOVED THE DUPLICATE ADDITION OF assistant+tool_calls ---
-        # The following block was removed to fix the litellm error:
-        # elif role == "assistant" and "tool_calls" in msg:
-        #     llm_messages.append(
-        #         {
-        #             "role": "assistant",
-        #             "content": msg.get("content", ""),
-        #             "tool_calls": msg["tool_calls"],
-        #         }
-        #     )
+            self.messages.append({"role": "user", "content": msg["content"]})
 
+        # Assistant messages carrying tool_calls are added as plain text:
+        # the call itself is added right before its result (see below)
         elif role == "assistant":
-            llm_messages.append(
+            self.messages.append(
                 {"role": "assistant", "content": msg["content"]}
             )
 
@@ -466,20 +661,21 @@ def rebuild_llm_history(
             tool_call_id = msg.get("tool_call_id")
 
             # If we have a pending tool call that wasn't added yet, add it now
-            if tool_call_id in pending_tool_calls:
+            if tool_call_id in self._pending_tool_calls:
                 # Add the assistant message with tool call
-                llm_messages.append(
+                self.messages.append(
                     {
                         "role": "assistant",
                         "content": "",
-                        "tool_calls": [pending_tool_calls[tool_call_id]],
+                        "tool_calls": [
+                            self._pending_tool_calls.pop(tool_call_id)
+                        ],
                     }
                 )
-                # Remove from pending
-                del pending_tool_calls[tool_call_id]
+                self._arguments.pop(tool_call_id, None)
 
             # Now add the tool result
-            llm_messages.append(
+            self.messages.append(
                 {
                     "role": "tool",
                     "tool_call_id": tool_call_id,
@@ -487,7 +683,18 @@ def rebuild_llm_history(
                 }
             )
 
-    return llm_messages
+
+# ----------------------------
+# History compaction (token budget)
+# ----------------------------
+CONTEXT_TOKEN_BUDGET = int(os.getenv("CONTEXT_TOKEN_BUDGET", "24000"))
+KEEP_RECENT_MESSAGES = int(os.getenv("KEEP_RECENT_MESSAGES", "6"))
+
+
+@st.cache_resource
+def get_history_compactor() -> HistoryCompactor:
+    """Get the history compactor (and its token counts) shared across sessions."""
+    return HistoryCompactor(CONTEXT_TOKEN_BUDGET, KEEP_RECENT_MESSAGES)
 
 
 # ----------------------------
@@ -558,6 +765,10 @@ def execute_tool_safely(
             args.get("reasoning", ""),
             args.get("table_name"),
         )
+    elif tool_name == "describe_all":
+        result_text = safe_tool_execution(
+            func, tool_name, args.get("reasoning", "")
+        )
     elif tool_name == "sample_table":
         result_text = safe_tool_execution(
             func,
@@ -661,65 +872,145 @@ class AGUIAgent:
 # ----------------------------
 # MAJOR FIX #12: Conversation Persistence
 # ----------------------------
-def save_conversation(conversation_id: str, messages: List[Dict[str, Any]]):
-    """Save conversation to database for persistence."""
-    try:
-        con = get_connection()
-        con.execute(
-            """
-            CREATE TABLE IF NOT EXISTS conversations (
-                id VARCHAR PRIMARY KEY,
-                messages JSON,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-            )
+CONVERSATION_PAGE_SIZE = 100
+
+
+@st.cache_resource
+def migrate_conversation_store() -> bool:
+    """
+    Create the append-only message table once per process and move any
+    legacy ``conversations`` rows (one JSON blob per conversation) into it.
+    """
+    con = get_connection()
+    con.execute(
         """
+        CREATE TABLE IF NOT EXISTS conversation_messages (
+            conversation_id VARCHAR NOT NULL,
+            seq INTEGER NOT NULL,
+            message JSON NOT NULL,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            PRIMARY KEY (conversation_id, seq)
         )
-        con.execute(
+    """
+    )
+    legacy = con.execute(
+        "SELECT count(*) FROM information_schema.tables"
+        " WHERE table_name = 'conversations'"
+    ).fetchone()[0]
+    if legacy:
+        rows = con.execute(
+            "SELECT id, messages, updated_at FROM conversations"
+        ).fetchall()
+        con.begin()
+        try:
+            con.executemany(
+                """
+                INSERT OR IGNORE INTO conversation_messages
+                    (conversation_id, seq, message, created_at)
+                VALUES (?, ?, ?, ?)
+            """,
+                [
+                    [conversation_id, seq, json.dumps(message), updated_at]
+                    for conversation_id, messages, updated_at in rows
+                    for seq, message in enumerate(json.loads(messages))
+                ],
+            )
+            con.execute("DROP TABLE conversations")
+            con.commit()
+        except Exception:
+            con.rollback()
+            raise
+        console.log(f"Migrated {len(rows)} conversations to message rows")
+    get_schema_catalog().invalidate()
+    return True
+
+
+def save_conversation(
+    conversation_id: str, messages: List[Dict[str, Any]], persisted_count: int
+) -> int:
+    """
+    Append the messages not persisted yet, in one batch.
+
+    Messages are append-only, so only ``messages[persisted_count:]`` is
+    serialized and written, whatever the conversation length. Returns the
+    new persisted count (unchanged if the write failed).
+    """
+    start = persisted_count
+    if start >= len(messages):
+        return start
+    try:
+        con = get_connection()
+        con.executemany(
             """
-            INSERT OR REPLACE INTO conversations (id, messages, updated_at)
-            VALUES (?, ?, CURRENT_TIMESTAMP)
+            INSERT INTO conversation_messages (conversation_id, seq, message)
+            VALUES (?, ?, ?)
         """,
-            [conversation_id, json.dumps(messages)],
+            [
+                [conversation_id, seq, json.dumps(message)]
+                for seq, message in enumerate(messages[start:], start)
+            ],
         )
-        debug_log(f"[green]Conversation {conversation_id} saved[/green]")
+        debug_log(
+            f"[green]Conversation {conversation_id} saved"
+            f" ({len(messages) - start} new messages)[/green]"
+        )
+        return len(messages)
     except Exception as e:
         console.log(f"[red]Error saving conversation: {e}[/red]")
+        return start
 
 
-def load_conversation(conversation_id: str) -> Optional[List[Dict[str, Any]]]:
-    """Load conversation from database."""
+def load_conversation(
+    conversation_id: str,
+    limit: int = CONVERSATION_PAGE_SIZE,
+    before_seq: Optional[int] = None,
+) -> Tuple[List[Dict[str, Any]], Optional[int]]:
+    """
+    Load one page of a conversation, oldest message first.
+
+    Returns the ``limit`` messages before ``before_seq`` (the latest ones
+    by default) and the ``before_seq`` of the previous page, or None once
+    the start of the conversation is reached.
+    """
     try:
         con = get_connection()
-        result = con.execute(
-            "SELECT messages FROM conversations WHERE id = ?",
-            [conversation_id],
-        ).fetchone()
-        if result:
-            debug_log(f"[green]Conversation {conversation_id} loaded[/green]")
-            return json.loads(result[0])
-        return None
+        rows = con.execute(
+            """
+            SELECT seq, message FROM conversation_messages
+            WHERE conversation_id = ? AND seq < ?
+            ORDER BY seq DESC
+            LIMIT ?
+        """,
+            [
+                conversation_id,
+                before_seq if before_seq is not None else 2**31 - 1,
+                limit,
+            ],
+        ).fetchall()
+        rows.reverse()
+        messages = [json.loads(message) for _, message in rows]
+        debug_log(
+            f"[green]Conversation {conversation_id} loaded"
+            f" ({len(messages)} messages)[/green]"
+        )
+        previous_page = rows[0][0] if rows and rows[0][0] > 0 else None
+        return messages, previous_page
     except Exception as e:
         console.log(f"[red]Error loading conversation: {e}[/red]")
-        return None
+        return [], None
 
 
 def list_conversations() -> List[tuple]:
     """List all saved conversations."""
     try:
         con = get_connection()
-        con.execute(
+        results = con.execute(
             """
-            CREATE TABLE IF NOT EXISTS conversations (
-                id VARCHAR PRIMARY KEY,
-                messages JSON,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-            )
+            SELECT conversation_id, min(created_at), max(created_at)
+            FROM conversation_messages
+            GROUP BY conversation_id
+            ORDER BY max(created_at) DESC
         """
-        )
-        results = con.execute(
-            "SELECT id, created_at, updated_at FROM conversations ORDER BY updated_at DESC"
         ).fetchall()
         return results
     except Exception as e:
@@ -728,67 +1019,161 @@ def list_conversations() -> List[tuple]:
 
 
 # ----------------------------
-# Streamlit UI Logic
+# Background agent worker
 # ----------------------------
+WORKER_POLL_SECONDS = float(os.getenv("WORKER_POLL_SECONDS", "0.5"))
+WORKER_IDLE_TIMEOUT_SECONDS = float(
+    os.getenv("WORKER_IDLE_TIMEOUT_SECONDS", "300")
+)
 
-# --- Session State Initialization ---
-if "messages" not in st.session_state:
-    st.session_state.messages = [
-        {
-            "role": "assistant",
-            "content": "Welcome! I'm your DuckDB SQL Agent. Ask me a question about the data in your database.",
-        }
-    ]
-if "conversation_id" not in st.session_state:
-    st.session_state.conversation_id = str(uuid.uuid4())
-if "run_id" not in st.session_state:
-    st.session_state.run_id = None
-if "pending_confirmation" not in st.session_state:
-    st.session_state.pending_confirmation = None
-if "confirmation_result" not in st.session_state:
-    st.session_state.confirmation_result = None
-# MAJOR FIX #7: Use state machine
-if "agent_state" not in st.session_state:
-    st.session_state.agent_state = AgentState.IDLE
-if "llm_model" not in st.session_state:
-    st.session_state.llm_model = os.getenv(
-        "LLM_MODEL", "gemini/gemini-2.0-flash"
-    )
-if "user_input" not in st.session_state:
-    st.session_state.user_input = ""
-if "loop_count" not in st.session_state:
-    st.session_state.loop_count = 0
 
+class AgentWorker:
+    """
+    Runs the agent state machine of one session on a background thread.
+
+    The script thread only submits commands (``"input"`` with the user
+    message, ``"confirm"`` with the user decision) and drains ``events``:
+    every appended message, state change and tool notification is pushed
+    there, so the page stays responsive while the LLM and the tools run.
+
+    The thread exits after ``idle_timeout`` seconds without commands (e.g.
+    once the session expired) and the next ``submit`` starts a new one.
+    ``connection`` is the worker's own cursor, closed with the worker. The
+    shared caches are resolved on the script thread and passed in too,
+    since ``st.cache_resource`` getters need a ScriptRunContext.
+    """
 
-st.set_page_config(page_title="AG-UI DuckDB Agent (Streamlit)")
-st.title("🦆 DuckDB SQL Agent (Streamlit)")
+    def __init__(
+        self,
+        conversation_id: str,
+        messages: List[Dict[str, Any]],
+        model: str,
+        connection: duckdb.DuckDBPyConnection,
+        schema_catalog: SchemaCatalog,
+        query_cache: QueryResultCache,
+        history_compactor: HistoryCompactor,
+        idle_timeout: float = WORKER_IDLE_TIMEOUT_SECONDS,
+    ):
+        self.conversation_id = conversation_id
+        self.messages = list(messages)
+        self.persisted_count = 0
+        self.transcript = TranscriptBuilder()
+        self.agent = AGUIAgent(model=model)
+        self.connection = connection
+        weakref.finalize(self, connection.close)
+        self.schema_catalog = schema_catalog
+        self.query_cache = query_cache
+        self.history_compactor = history_compactor
+        self.idle_timeout = idle_timeout
+        self.agent_state = AgentState.IDLE
+        self.pending_confirmation: Optional[Dict[str, Any]] = None
+        self.confirmation_result: Optional[bool] = None
+        self.run_id: Optional[str] = None
+        self.loop_count = 0
+        self.commands: "queue.Queue[Tuple[str, Any]]" = queue.Queue()
+        self.events: "queue.Queue[Tuple[str, Any]]" = queue.Queue()
+        self._stopped = False
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+
+    def submit(self, command: str, value: Any = None) -> None:
+        with self._lock:
+            self.commands.put((command, value))
+            if self._thread is None:
+                self._thread = threading.Thread(
+                    target=self._run,
+                    name=f"agent-worker-{self.conversation_id[:8]}",
+                    daemon=True,
+                )
+                self._thread.start()
 
+    def stop(self) -> None:
+        """Drop the worker: a step in flight finishes but emits nothing."""
+        self._stopped = True
+        self.submit("stop")
 
-# ----------------------------
-# Main Agent Logic with State Machine
-# ----------------------------
-def run_agent_logic():
-    """
-    Main agent execution logic with state machine pattern.
-    MAJOR FIX #7: Clear state transitions instead of multiple boolean flags.
-    MAJOR FIX #6: Proper error recovery with graceful degradation.
-    """
-    debug_log(
-        f"--- Running Agent Logic (State: {st.session_state.agent_state}) ---"
-    )
+    def drain(self) -> List[Tuple[str, Any]]:
+        """Pop the pending events without blocking."""
+        events = []
+        while True:
+            try:
+                events.append(self.events.get_nowait())
+            except queue.Empty:
+                return events
+
+    def _run(self) -> None:
+        tool_context.connection = self.connection
+        tool_context.schema_catalog = self.schema_catalog
+        tool_context.query_cache = self.query_cache
+        tool_context.events = self.events
+        while not self._stopped:
+            try:
+                command, value = self.commands.get(timeout=self.idle_timeout)
+            except queue.Empty:
+                with self._lock:
+                    if self.commands.empty():
+                        self._thread = None
+                        return
+                continue
 
-    agent = AGUIAgent(model=st.session_state.llm_model)
+            try:
+                if command == "input":
+                    self._start_run(value)
+                elif command == "confirm":
+                    self._confirm(value)
+                else:
+                    continue
+                self._run_agent_logic()
+            except Exception as e:
+                console.log(f"[red]Agent worker failed: {e}[/red]")
+                self._append(
+                    {
+                        "role": "assistant",
+                        "content": f"⚠️ Something went wrong: {str(e)[:200]}",
+                    }
+                )
+                self._set_state(AgentState.ERROR)
+        with self._lock:
+            self._thread = None
+
+    def _emit(self, kind: str, payload: Any) -> None:
+        if not self._stopped:
+            self.events.put((kind, payload))
+
+    def _append(self, message: Dict[str, Any]) -> None:
+        self.messages.append(message)
+        self._emit("message", message)
+
+    def _set_state(self, state: AgentState) -> None:
+        self.agent_state = state
+        pending = (
+            self.pending_confirmation
+            if state == AgentState.AWAITING_CONFIRMATION
+            else None
+        )
+        self._emit("state", (state, pending))
 
-    # Check for duplicate user input before adding
-    if (
-        st.session_state.user_input
-        and st.session_state.agent_state == AgentState.IDLE
-    ):
-        user_input = st.session_state.user_input
+    def _save(self) -> None:
+        self.persisted_count = save_conversation(
+            self.conversation_id, self.messages, self.persisted_count
+        )
+
+    def _finish(self, state: AgentState = AgentState.FINISHED) -> None:
+        self._save()
+        self._set_state(state)
+
+    def _start_run(self, user_input: str) -> None:
+        if self.agent_state not in [
+            AgentState.IDLE,
+            AgentState.FINISHED,
+            AgentState.ERROR,
+        ]:
+            debug_log("[yellow]Run in progress, ignoring input[/yellow]")
+            return
 
         # Check last few messages to avoid duplicates
         is_duplicate = False
-        for msg in st.session_state.messages[-3:]:
+        for msg in self.messages[-3:]:
             if msg.get("role") == "user" and msg.get("content") == user_input:
                 is_duplicate = True
                 break
@@ -797,287 +1182,356 @@ def run_agent_logic():
             debug_log(
                 f"[blue]Adding new user message: {user_input[:50]}...[/blue]"
             )
-            st.session_state.messages.append(
-                {"role": "user", "content": user_input}
-            )
+            self._append({"role": "user", "content": user_input})
         else:
             debug_log(
                 "[yellow]User input already in history, skipping duplicate[/yellow]"
             )
 
-        st.session_state.agent_state = AgentState.THINKING
-        st.session_state.run_id = str(uuid.uuid4())
-        st.session_state.loop_count = 0
-
-    # Main agent loop
-    while st.session_state.agent_state not in [
-        AgentState.IDLE,
-        AgentState.FINISHED,
-        AgentState.ERROR,
-    ]:
-        st.session_state.loop_count += 1
-        debug_log(
-            f"[yellow]Agent Loop #{st.session_state.loop_count} (State: {st.session_state.agent_state})[/yellow]"
-        )
+        self.run_id = str(uuid.uuid4())
+        self.loop_count = 0
+        self._set_state(AgentState.THINKING)
 
-        # Check max loops
-        if st.session_state.loop_count > MAX_AGENT_LOOPS:
-            console.log("[red]Max loops reached[/red]")
-            st.session_state.messages.append(
-                {
-                    "role": "assistant",
-                    "content": "⚠️ I've reached the maximum number of steps. Please rephrase your question or break it into smaller parts.",
-                }
-            )
-            st.session_state.agent_state = AgentState.FINISHED
-            st.session_state.user_input = ""
-            save_conversation(
-                st.session_state.conversation_id, st.session_state.messages
-            )
+    def _confirm(self, approved: bool) -> None:
+        # When user clicks confirm/cancel, we transition to EXECUTING_TOOL
+        if self.agent_state != AgentState.AWAITING_CONFIRMATION:
+            debug_log("[yellow]No tool awaiting confirmation[/yellow]")
             return
+        debug_log(f"Confirmation submitted: {approved}")
+        self.confirmation_result = approved
+        self._set_state(AgentState.EXECUTING_TOOL)
 
-        # STATE: EXECUTING_TOOL - Process confirmation result
-        if st.session_state.agent_state == AgentState.EXECUTING_TOOL:
-            if st.session_state.confirmation_result is None:
-                # Waiting for user decision
-                debug_log("[yellow]Waiting for confirmation result[/yellow]")
+    def _run_agent_logic(self) -> None:
+        """
+        Main agent execution logic with state machine pattern.
+        MAJOR FIX #7: Clear state transitions instead of multiple boolean flags.
+        MAJOR FIX #6: Proper error recovery with graceful degradation.
+        """
+        debug_log(f"--- Running Agent Logic (State: {self.agent_state}) ---")
+
+        # Main agent loop
+        while self.agent_state not in [
+            AgentState.IDLE,
+            AgentState.FINISHED,
+            AgentState.ERROR,
+        ]:
+            if self._stopped:
                 return
 
-            approved = st.session_state.confirmation_result
-            p = st.session_state.pending_confirmation
-
+            self.loop_count += 1
             debug_log(
-                f"[blue]Processing confirmation (approved={approved})[/blue]"
+                f"[yellow]Agent Loop #{self.loop_count} (State: {self.agent_state})[/yellow]"
             )
 
-            # Record user decision
-            st.session_state.messages.append(
-                {
-                    "role": "confirmation",
-                    "toolCallId": p["toolCallId"],
-                    "toolName": p["toolName"],
-                    "approved": approved,
-                    "content": f"User {'approved' if approved else 'denied'} tool call **{p['toolName']}**.",
-                }
-            )
-
-            # Clear confirmation state
-            st.session_state.confirmation_result = None
-            st.session_state.pending_confirmation = None
-
-            if not approved:
-                # User denied - end run
-                console.log("[red]User denied tool. Ending run.[/red]")
-                st.session_state.messages.append(
+            # Check max loops
+            if self.loop_count > MAX_AGENT_LOOPS:
+                console.log("[red]Max loops reached[/red]")
+                self._append(
                     {
                         "role": "assistant",
-                        "content": f"🛑 Tool execution cancelled. Run finished.",
+                        "content": "⚠️ I've reached the maximum number of steps. Please rephrase your question or break it into smaller parts.",
                     }
                 )
-                st.session_state.agent_state = AgentState.FINISHED
-                st.session_state.user_input = ""
-                save_conversation(
-                    st.session_state.conversation_id, st.session_state.messages
-                )
+                self._finish()
                 return
 
-            # User approved - execute tool
-            console.log(f"[green]Executing tool: {p['toolName']}[/green]")
+            # STATE: EXECUTING_TOOL - Process confirmation result
+            if self.agent_state == AgentState.EXECUTING_TOOL:
+                approved = self.confirmation_result
+                p = self.pending_confirmation
 
-            # Add the assistant message with tool_calls BEFORE tool result
-            assistant_tool_msg = {
-                "role": "assistant",
-                "content": "",
-                "tool_calls": [
-                    {
-                        "id": p["toolCallId"],
-                        "type": "function",
-                        "function": {
-                            "name": p["toolName"],
-                            "arguments": json.dumps(p["args"]),
-                        },
-                    }
-                ],
-            }
-
-            # Check if this assistant message is already in the messages
-            already_has_tool_call = False
-            for msg in st.session_state.messages:
-                if (
-                    msg.get("role") == "assistant"
-                    and msg.get("tool_calls")
-                    and msg["tool_calls"][0].get("id") == p["toolCallId"]
-                ):
-                    already_has_tool_call = True
-                    break
-
-            if not already_has_tool_call:
                 debug_log(
-                    "[cyan]Adding assistant tool_calls message to history[/cyan]"
+                    f"[blue]Processing confirmation (approved={approved})[/blue]"
                 )
-                st.session_state.messages.append(assistant_tool_msg)
 
-            # MAJOR FIX #6: Better error handling with try-except
-            try:
-                result_text, should_finish = execute_tool_safely(
-                    p["toolName"], p["args"]
-                )
-
-                # Add tool result to messages
-                st.session_state.messages.append(
+                # Record user decision
+                self._append(
                     {
-                        "role": "tool",
-                        "tool_call_id": p["toolCallId"],
-                        "tool_name": p["toolName"],
-                        "content": result_text,
+                        "role": "confirmation",
+                        "toolCallId": p["toolCallId"],
+                        "toolName": p["toolName"],
+                        "approved": approved,
+                        "content": f"User {'approved' if approved else 'denied'} tool call **{p['toolName']}**.",
                     }
                 )
 
-                # Check if this tool ends the run
-                if should_finish:
-                    console.log(
-                        "[green]Final query executed. Ending run.[/green]"
-                    )
-                    st.session_state.agent_state = AgentState.FINISHED
-                    st.session_state.user_input = ""
-                    save_conversation(
-                        st.session_state.conversation_id,
-                        st.session_state.messages,
+                # Clear confirmation state
+                self.confirmation_result = None
+                self.pending_confirmation = None
+
+                if not approved:
+                    # User denied - end run
+                    console.log("[red]User denied tool. Ending run.[/red]")
+                    self._append(
+                        {
+                            "role": "assistant",
+                            "content": f"🛑 Tool execution cancelled. Run finished.",
+                        }
                     )
+                    self._finish()
                     return
 
-                # Continue to next LLM call
-                st.session_state.agent_state = AgentState.THINKING
-                continue
-
-            except Exception as e:
-                # MAJOR FIX #6: Graceful error recovery
-                console.log(f"[red]Tool execution failed: {e}[/red]")
-                error_msg = f"Tool execution failed: {str(e)[:200]}"
-
-                # Add error as tool result so LLM can see it and potentially recover
-                st.session_state.messages.append(
-                    {
-                        "role": "tool",
-                        "tool_call_id": p["toolCallId"],
-                        "tool_name": p["toolName"],
-                        "content": f"ERROR: {error_msg}",
-                    }
-                )
+                # User approved - execute tool
+                console.log(f"[green]Executing tool: {p['toolName']}[/green]")
 
-                # Let the agent try to recover
-                st.session_state.agent_state = AgentState.THINKING
-                st.error(error_msg)
-                continue
+                # Add the assistant message with tool_calls BEFORE tool result
+                assistant_tool_msg = {
+                    "role": "assistant",
+                    "content": "",
+                    "tool_calls": [
+                        {
+                            "id": p["toolCallId"],
+                            "type": "function",
+                            "function": {
+                                "name": p["toolName"],
+                                "arguments": self.transcript.serialized_arguments(
+                                    p["toolCallId"], p["args"]
+                                ),
+                            },
+                        }
+                    ],
+                }
 
-        # STATE: THINKING - Make LLM call
-        elif st.session_state.agent_state == AgentState.THINKING:
-            # Rebuild LLM history
-            llm_messages = rebuild_llm_history(st.session_state.messages)
+                # Check if this assistant message is already in the messages
+                already_has_tool_call = False
+                for msg in self.messages:
+                    if (
+                        msg.get("role") == "assistant"
+                        and msg.get("tool_calls")
+                        and msg["tool_calls"][0].get("id") == p["toolCallId"]
+                    ):
+                        already_has_tool_call = True
+                        break
+
+                if not already_has_tool_call:
+                    debug_log(
+                        "[cyan]Adding assistant tool_calls message to history[/cyan]"
+                    )
+                    self._append(assistant_tool_msg)
 
-            # MAJOR FIX #6: Better error handling
-            try:
-                with st.spinner("🤔 Agent is thinking..."):
-                    updated_messages, needs_confirmation = agent.run_sync(
-                        llm_messages
+                # MAJOR FIX #6: Better error handling with try-except
+                try:
+                    result_text, should_finish = execute_tool_safely(
+                        p["toolName"], p["args"]
                     )
-            except Exception as e:
-                console.log(f"[red]LLM call failed: {e}[/red]")
-                st.session_state.messages.append(
-                    {
-                        "role": "assistant",
-                        "content": f"⚠️ I encountered an error while thinking: {str(e)[:200]}. Please try again or rephrase your question.",
-                    }
-                )
-                st.session_state.agent_state = AgentState.ERROR
-                st.session_state.user_input = ""
-                st.error(f"LLM Error: {str(e)[:200]}")
-                save_conversation(
-                    st.session_state.conversation_id, st.session_state.messages
-                )
-                return
 
-            if needs_confirmation:
-                # Extract tool call for confirmation
-                last_msg = updated_messages[-1]
-                if (
-                    last_msg.get("role") == "assistant"
-                    and "tool_calls" in last_msg
-                ):
-                    tc = last_msg["tool_calls"][0]  # Get first tool call
-
-                    try:
-                        args = json.loads(tc["function"]["arguments"])
-                    except:
-                        args = {}
-
-                    tool_call_id = tc["id"]
-                    tool_name = tc["function"]["name"]
-
-                    # Add tool_call_start to display
-                    st.session_state.messages.append(
+                    # Add tool result to messages
+                    self._append(
                         {
-                            "role": "tool_call_start",
-                            "tool_call_id": tool_call_id,
-                            "tool_name": tool_name,
-                            "args": args,
+                            "role": "tool",
+                            "tool_call_id": p["toolCallId"],
+                            "tool_name": p["toolName"],
+                            "content": result_text,
                         }
                     )
 
-                    # Set pending confirmation
-                    st.session_state.pending_confirmation = {
-                        "toolCallId": tool_call_id,
-                        "toolName": tool_name,
-                        "args": args,
-                        "prompt": f"Agent proposes to call `{tool_name}`. Please confirm.",
-                        "full_args": json.dumps(args, indent=2),
-                    }
-
-                    st.session_state.agent_state = (
-                        AgentState.AWAITING_CONFIRMATION
+                    # Check if this tool ends the run
+                    if should_finish:
+                        console.log(
+                            "[green]Final query executed. Ending run.[/green]"
+                        )
+                        self._finish()
+                        return
+
+                    # Continue to next LLM call
+                    self._set_state(AgentState.THINKING)
+                    continue
+
+                except Exception as e:
+                    # MAJOR FIX #6: Graceful error recovery
+                    console.log(f"[red]Tool execution failed: {e}[/red]")
+                    error_msg = f"Tool execution failed: {str(e)[:200]}"
+
+                    # Add error as tool result so LLM can see it and potentially recover
+                    self._append(
+                        {
+                            "role": "tool",
+                            "tool_call_id": p["toolCallId"],
+                            "tool_name": p["toolName"],
+                            "content": f"ERROR: {error_msg}",
+                        }
                     )
-                    debug_log(
-                        "[yellow]State -> AWAITING_CONFIRMATION[/yellow]"
+
+                    # Let the agent try to recover
+                    self._set_state(AgentState.THINKING)
+                    notify("error", error_msg)
+                    continue
+
+            # STATE: THINKING - Make LLM call
+            elif self.agent_state == AgentState.THINKING:
+                # Rebuild LLM history
+                llm_messages = self.transcript.sync(self.messages)
+
+                # MAJOR FIX #6: Better error handling
+                try:
+                    # run_sync appends to the list it gets: compact()
+                    # returns a copy
+                    updated_messages, needs_confirmation = self.agent.run_sync(
+                        self.history_compactor.compact(
+                            llm_messages, self.agent.model
+                        )
                     )
-                    return  # Exit to show confirmation UI
-            else:
-                # LLM finished with text response
-                debug_log("[green]LLM finished with text[/green]")
-                last_msg = updated_messages[-1]
-
-                if last_msg.get("role") == "assistant":
-                    # Check for duplicate before adding
-                    is_duplicate = (
-                        st.session_state.messages
-                        and st.session_state.messages[-1].get("content")
-                        == last_msg.get("content")
+                except Exception as e:
+                    console.log(f"[red]LLM call failed: {e}[/red]")
+                    self._append(
+                        {
+                            "role": "assistant",
+                            "content": f"⚠️ I encountered an error while thinking: {str(e)[:200]}. Please try again or rephrase your question.",
+                        }
                     )
+                    notify("error", f"LLM Error: {str(e)[:200]}")
+                    self._finish(AgentState.ERROR)
+                    return
 
-                    if not is_duplicate:
-                        st.session_state.messages.append(last_msg)
+                if needs_confirmation:
+                    # Extract tool call for confirmation
+                    last_msg = updated_messages[-1]
+                    if (
+                        last_msg.get("role") == "assistant"
+                        and "tool_calls" in last_msg
+                    ):
+                        tc = last_msg["tool_calls"][0]  # Get first tool call
+
+                        try:
+                            args = json.loads(tc["function"]["arguments"])
+                        except:
+                            args = {}
+
+                        tool_call_id = tc["id"]
+                        tool_name = tc["function"]["name"]
+
+                        # Add tool_call_start to display
+                        self._append(
+                            {
+                                "role": "tool_call_start",
+                                "tool_call_id": tool_call_id,
+                                "tool_name": tool_name,
+                                "args": args,
+                            }
+                        )
+
+                        # Set pending confirmation
+                        self.pending_confirmation = {
+                            "toolCallId": tool_call_id,
+                            "toolName": tool_name,
+                            "args": args,
+                            "prompt": f"Agent proposes to call `{tool_name}`. Please confirm.",
+                            "full_args": json.dumps(args, indent=2),
+                        }
 
-                st.session_state.agent_state = AgentState.FINISHED
-                st.session_state.user_input = ""
-                save_conversation(
-                    st.session_state.conversation_id, st.session_state.messages
-                )
+                        self._set_state(AgentState.AWAITING_CONFIRMATION)
+                        debug_log(
+                            "[yellow]State -> AWAITING_CONFIRMATION[/yellow]"
+                        )
+                        return  # Wait for the user decision
+                else:
+                    # LLM finished with text response
+                    debug_log("[green]LLM finished with text[/green]")
+                    last_msg = updated_messages[-1]
+
+                    if last_msg.get("role") == "assistant":
+                        # Check for duplicate before adding
+                        is_duplicate = self.messages and self.messages[-1].get(
+                            "content"
+                        ) == last_msg.get("content")
+
+                        if not is_duplicate:
+                            self._append(last_msg)
+
+                    self._finish()
+                    return
+
+            # STATE: AWAITING_CONFIRMATION - Transition handled by user button click
+            elif self.agent_state == AgentState.AWAITING_CONFIRMATION:
+                return  # Wait for user action
+
+            else:
+                # Unknown state - safety fallback
+                console.log(f"[red]Unknown state: {self.agent_state}[/red]")
+                self._set_state(AgentState.ERROR)
                 return
 
-        # STATE: AWAITING_CONFIRMATION - Transition handled by user button click
-        elif st.session_state.agent_state == AgentState.AWAITING_CONFIRMATION:
-            # When user clicks confirm/cancel, we transition to EXECUTING_TOOL
-            if st.session_state.confirmation_result is not None:
-                st.session_state.agent_state = AgentState.EXECUTING_TOOL
-                debug_log("[yellow]State -> EXECUTING_TOOL[/yellow]")
-            return  # Wait for user action
 
-        else:
-            # Unknown state - safety fallback
-            console.log(
-                f"[red]Unknown state: {st.session_state.agent_state}[/red]"
-            )
-            st.session_state.agent_state = AgentState.ERROR
-            return
+def new_agent_worker() -> AgentWorker:
+    """Start a worker for the session conversation, on its own cursor."""
+    return AgentWorker(
+        st.session_state.conversation_id,
+        st.session_state.messages,
+        st.session_state.llm_model,
+        get_database().cursor(),
+        shared_schema_catalog(),
+        shared_query_cache(),
+        get_history_compactor(),
+    )
+
+
+# ----------------------------
+# Streamlit UI Logic
+# ----------------------------
+
+migrate_conversation_store()
+
+# --- Session State Initialization ---
+# The worker owns the run state; these keys mirror what it reported
+if "messages" not in st.session_state:
+    st.session_state.messages = [
+        {
+            "role": "assistant",
+            "content": "Welcome! I'm your DuckDB SQL Agent. Ask me a question about the data in your database.",
+        }
+    ]
+if "conversation_id" not in st.session_state:
+    st.session_state.conversation_id = str(uuid.uuid4())
+if "pending_confirmation" not in st.session_state:
+    st.session_state.pending_confirmation = None
+# MAJOR FIX #7: Use state machine
+if "agent_state" not in st.session_state:
+    st.session_state.agent_state = AgentState.IDLE
+if "llm_model" not in st.session_state:
+    st.session_state.llm_model = os.getenv(
+        "LLM_MODEL", "gemini/gemini-2.0-flash"
+    )
+if "worker" not in st.session_state:
+    st.session_state.worker = new_agent_worker()
+
+
+st.set_page_config(page_title="AG-UI DuckDB Agent (Streamlit)")
+st.title("🦆 DuckDB SQL Agent (Streamlit)")
+
+
+# ----------------------------
+# Worker polling
+# ----------------------------
+@st.fragment(run_every=WORKER_POLL_SECONDS)
+def poll_agent_worker():
+    """
+    Pull the worker events into session state while a run is in flight.
+
+    Only this fragment reruns on the timer; the whole page reruns once the
+    worker added messages or changed state.
+    """
+    changed = False
+    for kind, payload in st.session_state.worker.drain():
+        if kind == "message":
+            st.session_state.messages.append(payload)
+            changed = True
+        elif kind == "state":
+            (
+                st.session_state.agent_state,
+                st.session_state.pending_confirmation,
+            ) = payload
+            changed = True
+        elif kind == "notify":
+            notification_kind, text = payload
+            st.toast(text, icon=NOTIFICATION_ICONS[notification_kind])
+
+    if changed:
+        st.rerun()
+
+    if st.session_state.agent_state == AgentState.THINKING:
+        st.caption("🤔 Agent is thinking...")
+    else:
+        st.caption("🔧 Running tool...")
 
 
 # ----------------------------
@@ -1134,12 +1588,21 @@ if st.session_state.pending_confirmation:
                 cancel_button = st.form_submit_button("❌ Cancel")
 
             if confirm_button or cancel_button:
-                st.session_state.confirmation_result = confirm_button
-                st.session_state.agent_state = AgentState.EXECUTING_TOOL
                 debug_log(f"Confirmation submitted: {confirm_button}")
+                st.session_state.worker.submit("confirm", confirm_button)
+                st.session_state.pending_confirmation = None
+                st.session_state.agent_state = AgentState.EXECUTING_TOOL
                 st.rerun()
 
 
+# --- Run Status ---
+if st.session_state.agent_state in [
+    AgentState.THINKING,
+    AgentState.EXECUTING_TOOL,
+]:
+    poll_agent_worker()
+
+
 # --- Input Area ---
 is_busy = st.session_state.agent_state not in [
     AgentState.IDLE,
@@ -1155,26 +1618,10 @@ user_input = st.chat_input(
 
 
 # --- Input Handler ---
-if user_input and st.session_state.agent_state in [
-    AgentState.IDLE,
-    AgentState.FINISHED,
-    AgentState.ERROR,
-]:
+if user_input and not is_busy:
     debug_log(f"[blue]New user input: {user_input[:50]}...[/blue]")
-    st.session_state.user_input = user_input
-    st.session_state.agent_state = (
-        AgentState.IDLE
-    )  # Reset to IDLE before processing
-    run_agent_logic()
-    st.rerun()
-
-# --- Confirmation Handler ---
-elif (
-    st.session_state.agent_state == AgentState.EXECUTING_TOOL
-    and st.session_state.confirmation_result is not None
-):
-    debug_log("[blue]Processing confirmation in main loop[/blue]")
-    run_agent_logic()
+    st.session_state.worker.submit("input", user_input)
+    st.session_state.agent_state = AgentState.THINKING
     st.rerun()
 
 
@@ -1192,10 +1639,11 @@ with st.sidebar:
                 "content": "Chat history cleared. Ready for a new query.",
             }
         ]
+        # The stored conversation is append-only: start a new one, with
+        # a new worker (a run in flight is dropped)
+        st.session_state.conversation_id = str(uuid.uuid4())
+        st.session_state.worker.stop()
+        st.session_state.worker = new_agent_worker()
         st.session_state.agent_state = AgentState.IDLE
         st.session_state.pending_confirmation = None
-        st.session_state.confirmation_result = None
-        st.session_state.run_id = None
-        st.session_state.user_input = ""
-        st.session_state.loop_count = 0
         st.rerun()
@@ -0,0 +1,35 @@
+import importlib.util
+import os
+import sys
+from pathlib import Path
+
+import pytest
+
+AG_UI_DIR = Path(__file__).resolve().parent.parent
+
+# fastapi.py and streamlit.py shadow the packages they import, so the app
+# directory goes last on the path: ``agent_support`` resolves to it while
+# ``fastapi`` and ``streamlit`` still resolve to site-packages.
+sys.path[:] = [
+    entry for entry in sys.path if Path(entry or ".").resolve() != AG_UI_DIR
+]
+sys.path.append(str(AG_UI_DIR))
+
+
+def load_script(name: str, filename: str):
+    spec = importlib.util.spec_from_file_location(name, AG_UI_DIR / filename)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+@pytest.fixture(scope="session")
+def server(tmp_path_factory):
+    """The FastAPI app module, with its DuckDB file in a temp directory."""
+    cwd = os.getcwd()
+    os.chdir(tmp_path_factory.mktemp("server"))
+    os.environ["LLM_CACHE"] = "off"
+    try:
+        yield load_script("agui_server", "fastapi.py")
+    finally:
+        os.chdir(cwd)
@@ -0,0 +1,247 @@
+import itertools
+import json
+import time
+
+import duckdb
+import litellm
+import pytest
+
+from agent_support import (
+    CompletionCache,
+    CompletionCacheMiss,
+    HistoryCompactor,
+    QueryResultCache,
+    SchemaCatalog,
+    is_ddl,
+    is_read_only_sql,
+    normalize_sql,
+)
+
+
+@pytest.mark.parametrize(
+    "sql, expected",
+    [
+        ("SELECT 1", True),
+        ("EXPLAIN SELECT 1; SELECT 2", True),
+        ("SELECT 1; DELETE FROM t", False),
+        ("", False),
+        ("SELEC nonsense", False),
+    ],
+)
+def test_is_read_only_sql(sql, expected):
+    assert is_read_only_sql(sql) is expected
+
+
+@pytest.mark.parametrize(
+    "sql, expected",
+    [
+        ("CREATE TABLE t (a INT)", True),
+        ("INSERT INTO t VALUES (1); DROP TABLE t", True),
+        ("INSERT INTO t VALUES (1)", False),
+        ("not sql at all", True),
+    ],
+)
+def test_is_ddl(sql, expected):
+    assert is_ddl(sql) is expected
+
+
+def test_schema_catalog_caches_until_invalidated():
+    con = duckdb.connect()
+    con.execute("CREATE TABLE Items (id INTEGER, name VARCHAR)")
+    catalog = SchemaCatalog()
+
+    assert catalog.tables(con) == ["Items"]
+    assert catalog.columns(con, "items") == [
+        ("id", "INTEGER"),
+        ("name", "VARCHAR"),
+    ]
+
+    con.execute("CREATE TABLE other (x DOUBLE)")
+    assert catalog.tables(con) == ["Items"]
+    assert catalog.describe_all(con) == {
+        "Items": [("id", "INTEGER"), ("name", "VARCHAR")],
+        "other": [("x", "DOUBLE")],
+    }
+
+    con.execute("DROP TABLE other")
+    catalog.invalidate()
+    assert catalog.tables(con) == ["Items"]
+
+
+def test_normalize_sql_keeps_string_literals():
+    assert normalize_sql(
+        "  SELECT *\n FROM  T WHERE a = 'Mixed  Case';; "
+    ) == ("select * from t where a = 'Mixed  Case'")
+    assert normalize_sql("select 'A'") != normalize_sql("select 'a'")
+
+
+def test_query_cache_shares_entries_across_spellings():
+    cache = QueryResultCache(max_entries=4, max_bytes=1000, ttl=60)
+    _, version = cache.get("SELECT 1")
+    cache.put("SELECT 1", version, "one", 10)
+
+    assert cache.get("  select   1 ;") == ("one", version)
+    assert (cache.hits, cache.misses) == (1, 1)
+
+
+def test_query_cache_bump_drops_entries_and_racing_puts():
+    cache = QueryResultCache(max_entries=4, max_bytes=1000, ttl=60)
+    _, version = cache.get("SELECT 1")
+    cache.put("SELECT 1", version, "one", 10)
+    _, racing_version = cache.get("SELECT 2")
+
+    cache.bump()
+    cache.put("SELECT 2", racing_version, "stale", 10)
+
+    assert cache.get("SELECT 1") == (None, version + 1)
+    assert cache.get("SELECT 2") == (None, version + 1)
+
+
+def test_query_cache_evicts_least_recently_used():
+    cache = QueryResultCache(max_entries=2, max_bytes=25, ttl=60)
+    for sql in ("SELECT 1", "SELECT 2"):
+        cache.put(sql, 0, sql, 10)
+    cache.get("SELECT 1")
+    cache.put("SELECT 3", 0, "SELECT 3", 10)
+
+    assert cache.get("SELECT 2")[0] is None
+    assert cache.get("SELECT 1")[0] == "SELECT 1"
+
+    cache.put("SELECT 4", 0, "SELECT 4", 15)
+    assert cache.get("SELECT 3")[0] is None
+    assert cache.get("SELECT 1")[0] == "SELECT 1"
+    assert "entries=2 bytes=25" in cache.stats()
+
+    cache.put("SELECT 5", 0, "SELECT 5", 12)
+    assert cache.get("SELECT 4")[0] is None
+    assert "entries=2 bytes=22" in cache.stats()
+
+
+def test_query_cache_skips_oversized_results():
+    cache = QueryResultCache(max_entries=2, max_bytes=10, ttl=60)
+    cache.put("SELECT 1", 0, "big", 11)
+    assert cache.get("SELECT 1")[0] is None
+
+
+def test_query_cache_expires_entries_after_ttl():
+    cache = QueryResultCache(max_entries=2, max_bytes=100, ttl=0)
+    cache.put("SELECT 1", 0, "one", 10)
+    assert cache.get("SELECT 1")[0] is None
+    assert "entries=0 bytes=0" in cache.stats()
+
+
+@pytest.fixture
+def char_tokens(monkeypatch):
+    """One token per character of content."""
+
+    def token_counter(model, messages):
+        return sum(len(str(msg.get("content") or "")) for msg in messages)
+
+    monkeypatch.setattr(litellm, "token_counter", token_counter)
+
+
+def tool_turn(call_id, name, result, **args):
+    call = {
+        "id": call_id,
+        "type": "function",
+        "function": {"name": name, "arguments": json.dumps(args)},
+    }
+    return [
+        {"role": "assistant", "content": "", "tool_calls": [call]},
+        {"role": "tool", "tool_call_id": call_id, "content": result},
+    ]
+
+
+def test_compactor_stubs_superseded_schema_lookups(char_tokens):
+    history = (
+        [{"role": "user", "content": "q"}]
+        + tool_turn("a", "describe_table", "old", table_name="Users")
+        + tool_turn("b", "describe_table", "orders", table_name="orders")
+        + tool_turn("c", "describe_table", "new", table_name="users")
+    )
+    compacted = HistoryCompactor(budget=10_000, keep_recent=0).compact(
+        history, "model"
+    )
+
+    assert "superseded" in compacted[2]["content"]
+    assert compacted[4]["content"] == "orders"
+    assert compacted[6]["content"] == "new"
+    assert history[2]["content"] == "old"
+
+    history += tool_turn("d", "describe_all", "everything")
+    compacted = HistoryCompactor(budget=10_000, keep_recent=0).compact(
+        history, "model"
+    )
+    assert all("superseded" in compacted[i]["content"] for i in (2, 4, 6))
+    assert compacted[8]["content"] == "everything"
+
+
+def test_compactor_summarizes_old_tool_results_first(char_tokens):
+    history = (
+        [{"role": "system", "content": "s"}, {"role": "user", "content": "q"}]
+        + tool_turn("a", "run_test_sql_query", "x" * 500, sql_query="1")
+        + tool_turn("b", "run_test_sql_query", "y" * 500, sql_query="2")
+    )
+    compacted = HistoryCompactor(budget=800, keep_recent=2).compact(
+        history, "model"
+    )
+
+    assert len(compacted) == len(history)
+    assert compacted[3]["content"].startswith(
+        "[run_test_sql_query result compacted, 500 chars] xxx"
+    )
+    assert compacted[5]["content"] == "y" * 500
+
+
+def test_compactor_drops_oldest_turns_with_their_results(char_tokens):
+    history = (
+        [{"role": "system", "content": "s"}, {"role": "user", "content": "q"}]
+        + tool_turn("a", "run_test_sql_query", "x" * 500, sql_query="1")
+        + tool_turn("b", "run_test_sql_query", "y" * 500, sql_query="2")
+        + tool_turn("c", "run_test_sql_query", "z" * 500, sql_query="3")
+    )
+    compacted = HistoryCompactor(budget=600, keep_recent=2).compact(
+        history, "model"
+    )
+
+    assert [msg["role"] for msg in compacted] == [
+        "system",
+        "user",
+        "assistant",
+        "tool",
+    ]
+    assert compacted[2]["tool_calls"][0]["id"] == "c"
+    assert compacted[3]["content"] == "z" * 500
+
+
+def test_completion_key_is_canonical():
+    messages = [{"role": "user", "content": "hi"}]
+    key = CompletionCache.key("m", messages, tools=[{"b": 1, "a": 2}])
+
+    assert key == CompletionCache.key("m", messages, [{"a": 2, "b": 1}])
+    assert key != CompletionCache.key("m", messages, temperature=0.0)
+
+
+def test_completion_cache_replay_fails_on_miss(tmp_path):
+    path = str(tmp_path / "completions.sqlite")
+    CompletionCache(path, max_bytes=10_000).put("hit", {"content": "ok"})
+    cache = CompletionCache(path, max_bytes=10_000, mode="replay")
+
+    assert cache.get("hit") == {"content": "ok"}
+    with pytest.raises(CompletionCacheMiss, match="LLM_CACHE=replay"):
+        cache.get("miss")
+    assert CompletionCache(path, max_bytes=10_000).get("miss") is None
+
+
+def test_completion_cache_evicts_least_recently_used(tmp_path, monkeypatch):
+    clock = itertools.count()
+    monkeypatch.setattr(time, "time", lambda: next(clock))
+    cache = CompletionCache(str(tmp_path / "c.sqlite"), max_bytes=40)
+    cache.put("a", {"v": "a" * 10})
+    cache.put("b", {"v": "b" * 10})
+    assert cache.get("a") is not None
+    cache.put("c", {"v": "c" * 10})
+
+    assert cache.get("b") is None
+    assert cache.get("a") is not None
+    assert cache.get("c") is not None
@@ -0,0 +1,62 @@
+import asyncio
+
+import pytest
+
+
+@pytest.mark.parametrize(
+    "tool_name, args, expected",
+    [
+        ("list_tables", {}, False),
+        ("describe_table", {"table_name": "users"}, False),
+        ("run_test_sql_query", {"sql_query": "SELECT 1"}, False),
+        ("run_test_sql_query", {"sql_query": "SELECT 1; DROP TABLE t"}, True),
+        ("run_final_sql_query", {"sql_query": "DELETE FROM users"}, True),
+        ("run_final_sql_query", {}, True),
+        ("unknown_tool", {}, True),
+    ],
+)
+def test_policy_auto_approves_read_only_calls(
+    server, tool_name, args, expected
+):
+    policy = server.ApprovalPolicy(auto_approve_read_only=True)
+    assert policy.requires_confirmation(tool_name, args) is expected
+
+
+def test_policy_can_require_confirmation_for_everything(server):
+    policy = server.ApprovalPolicy(auto_approve_read_only=False)
+    assert policy.requires_confirmation("list_tables", {})
+    assert policy.requires_confirmation(
+        "run_test_sql_query", {"sql_query": "SELECT 1"}
+    )
+
+
+def test_expand_decisions_applies_default_to_unlisted_calls(server):
+    ids = ["call_0", "call_1", "call_2"]
+
+    assert server.expand_decisions(ids, True, {"call_1": False}) == {
+        "call_0": True,
+        "call_1": False,
+        "call_2": True,
+    }
+    assert server.expand_decisions(ids, None, {"call_2": True}) == {
+        "call_0": False,
+        "call_1": False,
+        "call_2": True,
+    }
+    assert server.expand_decisions(
+        ids, False, {"other": True}
+    ) == dict.fromkeys(ids, False)
+
+
+def test_batch_resolves_once_with_per_call_decisions(server):
+    registry = server.ConfirmationRegistry(ttl=60, max_pending=4)
+
+    async def scenario():
+        wait = asyncio.create_task(registry.wait("c", ["call_0", "call_1"]))
+        await asyncio.sleep(0)
+        resolved = registry.resolve("c", True, {"call_1": False})
+        assert registry.resolve("c", True) is None
+        return resolved, await wait
+
+    resolved, decisions = asyncio.run(scenario())
+    assert resolved == decisions == {"call_0": True, "call_1": False}
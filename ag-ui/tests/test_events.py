@@ -0,0 +1,99 @@
+import asyncio
+import json
+
+import pytest
+
+
+def text_events(server, count: int):
+    return [
+        server.make_event(server.AGEventType.TEXT_CONTENT, {"delta": str(i)})
+        for i in range(count)
+    ]
+
+
+async def burst(events):
+    for event in events:
+        yield event
+
+
+def collect(writer, events):
+    async def scenario():
+        return [chunk async for chunk in writer.write(events)]
+
+    return asyncio.run(scenario())
+
+
+def deltas(chunk: bytes):
+    return [
+        json.loads(line)["payload"]["delta"] for line in chunk.splitlines()
+    ]
+
+
+def test_unbatched_writer_yields_one_chunk_per_event(server):
+    writer = server.EventWriter(server.EventEncoder("ndjson"))
+    chunks = collect(writer, burst(text_events(server, 3)))
+
+    assert [deltas(chunk) for chunk in chunks] == [["0"], ["1"], ["2"]]
+
+
+def test_queued_events_are_coalesced_up_to_max_batch(server):
+    writer = server.EventWriter(server.EventEncoder("ndjson"), max_batch=4)
+    chunks = collect(writer, burst(text_events(server, 10)))
+
+    assert [len(deltas(chunk)) for chunk in chunks] == [4, 4, 2]
+    assert sum((deltas(chunk) for chunk in chunks), []) == [
+        str(i) for i in range(10)
+    ]
+
+
+def test_batches_stop_at_max_batch_bytes(server):
+    encoder = server.EventEncoder("ndjson")
+    writer = server.EventWriter(encoder, max_batch=100, max_batch_bytes=1)
+    chunks = collect(writer, burst(text_events(server, 3)))
+
+    assert [len(deltas(chunk)) for chunk in chunks] == [1, 1, 1]
+
+
+def test_writer_does_not_wait_to_fill_a_batch(server):
+    writer = server.EventWriter(server.EventEncoder("ndjson"), max_batch=8)
+    events = text_events(server, 3)
+
+    async def scenario():
+        gate = asyncio.Event()
+
+        async def slow():
+            yield events[0]
+            await gate.wait()
+            yield events[1]
+            yield events[2]
+
+        chunks = writer.write(slow())
+        first = await chunks.__anext__()
+        gate.set()
+        return [first] + [chunk async for chunk in chunks]
+
+    chunks = asyncio.run(scenario())
+    assert deltas(chunks[0]) == ["0"]
+    assert sum((deltas(chunk) for chunk in chunks[1:]), []) == ["1", "2"]
+
+
+def test_producer_errors_reach_the_stream(server):
+    writer = server.EventWriter(server.EventEncoder("ndjson"), max_batch=8)
+
+    async def failing():
+        yield text_events(server, 1)[0]
+        raise RuntimeError("boom")
+
+    with pytest.raises(RuntimeError, match="boom"):
+        collect(writer, failing())
+
+
+def test_sse_frames_carry_sequential_ids(server):
+    encoder = server.EventEncoder("sse")
+    writer = server.EventWriter(encoder, max_batch=8)
+    (chunk,) = collect(writer, burst(text_events(server, 2)))
+
+    frames = chunk.decode().split("\n\n")[:-1]
+    ids = [frame.splitlines()[0] for frame in frames]
+    assert ids == [f"id: {encoder._prefix}-1", f"id: {encoder._prefix}-2"]
+    assert all("event: TextMessageContent" in frame for frame in frames)
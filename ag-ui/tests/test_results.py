@@ -0,0 +1,78 @@
+import duckdb
+import pytest
+
+
+@pytest.fixture
+def cursor():
+    connection = duckdb.connect()
+    try:
+        yield connection.cursor()
+    finally:
+        connection.close()
+
+
+def test_encode_result_stops_at_row_budget(server, cursor):
+    cursor.execute("SELECT i, 'x' || i AS label FROM range(10) t(i)")
+    text = server.encode_result(
+        cursor, max_rows=3, max_bytes=10_000, result_format="csv"
+    )
+
+    assert text.splitlines() == [
+        "i,label",
+        "0,x0",
+        "1,x1",
+        "2,x2",
+        "... truncated after 3 rows (budget: 3 rows / 10000 bytes)",
+    ]
+
+
+def test_encode_result_stops_at_byte_budget(server, cursor):
+    cursor.execute("SELECT repeat('a', 20) AS s FROM range(10)")
+    text = server.encode_result(
+        cursor, max_rows=100, max_bytes=50, result_format="csv"
+    )
+
+    lines = text.splitlines()
+    assert lines[:3] == ["s", "a" * 20, "a" * 20]
+    assert lines[3].startswith("... truncated after 2 rows")
+    assert sum(len(line) + 1 for line in lines[:3]) <= 50
+
+
+def test_encode_result_markdown_escapes_cells(server, cursor):
+    cursor.execute("SELECT 'a|b' AS v, NULL AS n")
+    text = server.encode_result(cursor, result_format="markdown")
+
+    assert text.splitlines() == ["| v | n |", "|---|---|", "| a\\|b | NULL |"]
+
+
+def test_encode_result_reads_prefetched_rows_first(server, cursor):
+    cursor.execute("SELECT * FROM range(4)")
+    prefetched = cursor.fetchmany(2)
+    text = server.encode_result(
+        cursor, result_format="csv", prefetched=prefetched
+    )
+
+    assert text.splitlines() == ["range", "0", "1", "2", "3"]
+
+
+def test_summarize_small_result_returns_rows(server, cursor):
+    sql = "SELECT * FROM range(3)"
+    cursor.execute(sql)
+    text = server.summarize_test_query(cursor, sql, result_format="csv")
+
+    assert text.splitlines()[1:] == ["0", "1", "2"]
+
+
+def test_summarize_large_result_returns_statistics(server, cursor):
+    sql = "SELECT i, i % 7 AS bucket FROM range(1000) t(i);"
+    cursor.execute(sql)
+    text = server.summarize_test_query(cursor, sql, result_format="csv")
+    lines = text.splitlines()
+
+    assert lines[0] == "rows: 1000"
+    assert lines[1] == "column summary:"
+    assert lines[2] == ",".join(server.SUMMARY_COLUMNS)
+    assert lines[3].startswith("i,BIGINT,0,999,")
+    assert lines[4].startswith("bucket,BIGINT,0,6,")
+    preview = lines[lines.index("preview (first 5 rows):") + 1 :]
+    assert preview == ["i,bucket", "0,0", "1,1", "2,2", "3,3", "4,4"]
@@ -0,0 +1,142 @@
+import asyncio
+import json
+import time
+
+import pytest
+
+
+@pytest.fixture
+def run_store(server, monkeypatch):
+    store = server.RunStore(ttl=60, max_runs=2)
+    monkeypatch.setattr(server, "run_store", store)
+    return store
+
+
+def make_state(server, run_id: str, **kwargs):
+    return server.RunState(run_id=run_id, messages=[], **kwargs)
+
+
+def test_expire_skips_active_runs(server, run_store):
+    live = make_state(server, "live", active=True)
+    run_store.save(live)
+    for run_id in ("a", "b", "c"):
+        run_store.save(make_state(server, run_id))
+
+    assert run_store.get("live") is live
+    assert run_store.get("a") is None
+    assert run_store.get("c") is not None
+
+    live.updated_at = time.monotonic() - 3600
+    assert run_store.get("live") is live
+
+
+def test_expire_drops_idle_runs_after_ttl(server, run_store):
+    run_store.save(make_state(server, "old"))
+    run_store.ttl = 0
+    assert run_store.get("old") is None
+
+
+def test_claim_is_exclusive_until_released(server, run_store):
+    state = make_state(server, "run")
+    run_store.save(state)
+
+    assert run_store.claim("run") is state
+    assert run_store.claim("run") is None
+    run_store.release(state)
+    assert run_store.claim("run") is state
+    assert run_store.claim("missing") is None
+
+
+def test_resume_endpoint_releases_claim_from_background(server, run_store):
+    run_store.save(make_state(server, "run"))
+    response = asyncio.run(server.resume_run("run"))
+
+    assert run_store.get("run").active
+    asyncio.run(response.background())
+    assert not run_store.get("run").active
+
+
+def test_resume_does_not_rerun_recorded_tool_calls(server, run_store):
+    executed = []
+    gate = asyncio.Event()
+
+    class Agent(server.AGUIAgent):
+        async def execute_tool(self, tool_name, args):
+            executed.append(args["sql_query"])
+            await gate.wait()
+            return f"ran {args['sql_query']}"
+
+    calls = [
+        {
+            "id": f"call_{i}",
+            "name": "run_final_sql_query",
+            "arguments": json.dumps({"sql_query": sql}),
+        }
+        for i, sql in enumerate(["INSERT 1", "INSERT 2"])
+    ]
+    state = make_state(
+        server,
+        "run",
+        pending_tool_calls=calls,
+        decisions={"call_0": True, "call_1": True},
+    )
+
+    async def scenario():
+        async def consume():
+            return [event async for event in Agent()._drive(state)]
+
+        # The stream drops while both approved calls are executing
+        run_store.save(state)
+        consumer = asyncio.create_task(consume())
+        await asyncio.sleep(0.05)
+        consumer.cancel()
+        await asyncio.gather(consumer, return_exceptions=True)
+        assert executed == ["INSERT 1", "INSERT 2"]
+        assert run_store.get("run").pending_tool_calls == calls
+
+        gate.set()
+        await asyncio.sleep(0.05)
+        assert sorted(state.results) == ["call_0", "call_1"]
+
+        claimed = run_store.claim("run")
+        events = [event async for event in Agent().resume(claimed)]
+        return events
+
+    events = asyncio.run(scenario())
+    assert executed == ["INSERT 1", "INSERT 2"]
+    results = [
+        event["payload"]["content"]
+        for event in events
+        if event["type"] == server.AGEventType.TOOL_RESULT.value
+    ]
+    assert results == ["ran INSERT 1", "ran INSERT 2"]
+    assert events[-1]["type"] == server.AGEventType.RUN_FINISHED.value
+    assert run_store.get("run") is None
+
+
+def test_confirmation_expires_after_ttl(server):
+    registry = server.ConfirmationRegistry(ttl=0.01, max_pending=4)
+
+    with pytest.raises(server.ConfirmationExpired, match="expired"):
+        asyncio.run(registry.wait("c1", ["call_0"]))
+    assert registry.resolve("c1", True) is None
+
+
+def test_confirmation_evicted_by_newer_ones(server):
+    registry = server.ConfirmationRegistry(ttl=60, max_pending=2)
+
+    async def scenario():
+        waits = [
+            asyncio.create_task(registry.wait(f"c{i}", [f"call_{i}"]))
+            for i in range(3)
+        ]
+        await asyncio.sleep(0)
+        assert registry.resolve("c2", True) == {"call_2": True}
+        assert registry.resolve("c1", False) == {"call_1": False}
+        return await asyncio.gather(*waits, return_exceptions=True)
+
+    oldest, second, newest = asyncio.run(scenario())
+    assert isinstance(oldest, server.ConfirmationExpired)
+    assert "evicted" in str(oldest)
+    assert second == {"call_1": False}
+    assert newest == {"call_2": True}
@@ -2,8 +2,12 @@
 import litellm
 from rich.console import Console
 
+from llm_cache import enable_llm_cache
+
 console = Console()
 
+enable_llm_cache()
+
 messages = [
     {"role": "system", "content": "You're a helpful assistant."},
     {
@@ -3,8 +3,12 @@ import litellm
 from pydantic import BaseModel
 from rich.console import Console
 
+from llm_cache import enable_llm_cache
+
 console = Console()
 
+enable_llm_cache()
+
 
 class CalendarEvent(BaseModel):
     name: str
@@ -5,8 +5,12 @@ import litellm
 from pydantic import BaseModel, Field
 from rich.console import Console
 
+from llm_cache import enable_llm_cache
+
 console = Console()
 
+enable_llm_cache()
+
 
 def search_kb(question: str):
     return str(
@@ -12,8 +12,12 @@ import litellm
 from pydantic import BaseModel, Field
 from rich.console import Console
 
+from llm_cache import enable_llm_cache
+
 console = Console()
 
+enable_llm_cache()
+
 
 class EventExtraction(BaseModel):
     """Extract basic event information from a text message."""
@@ -11,8 +11,12 @@ from pydantic import BaseModel, Field
 from rich.console import Console
 from typing_extensions import Literal
 
+from llm_cache import enable_llm_cache
+
 console = Console()
 
+enable_llm_cache()
+
 
 class CalendarRequestType(BaseModel):
     """Router LLM call: Determine the type of calendar request."""
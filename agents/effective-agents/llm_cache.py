@@ -0,0 +1,55 @@
+"""
+Opt-in on-disk cache for the litellm calls of the example scripts.
+
+``LLM_CACHE=on`` stores completions in ``LLM_CACHE_DIR`` (default
+``.litellm_cache``) and serves repeated requests from it. ``LLM_CACHE=replay``
+only answers from that cache: a request that is not cached raises
+``CacheMiss`` instead of calling the model, for deterministic runs without
+network access.
+"""
+
+import functools
+import inspect
+import os
+
+import litellm
+
+LLM_CACHE_DIR = ".litellm_cache"
+
+
+class CacheMiss(Exception):
+    pass
+
+
+def enable_llm_cache() -> None:
+    """Configure litellm from ``LLM_CACHE`` (off, on or replay)."""
+    mode = os.getenv("LLM_CACHE", "off").lower()
+    if mode == "off":
+        return
+    if mode not in ("on", "replay"):
+        raise ValueError(f"LLM_CACHE must be off, on or replay, not {mode!r}")
+
+    litellm.enable_cache(
+        type="disk",
+        disk_cache_dir=os.getenv("LLM_CACHE_DIR", LLM_CACHE_DIR),
+    )
+    if mode == "replay" and not getattr(litellm.completion, "replay", False):
+        litellm.completion = replay_only(litellm.completion)
+
+
+def replay_only(completion):
+    """Wrap ``completion`` so that it fails on a cache miss."""
+    signature = inspect.signature(completion)
+
+    @functools.wraps(completion)
+    def wrapper(*args, **kwargs):
+        call = signature.bind_partial(*args, **kwargs)
+        params = {**call.arguments, **call.arguments.pop("kwargs", {})}
+        if litellm.cache.get_cache(**params) is None:
+            raise CacheMiss(
+                f"No cached completion for {params.get('model')}" " (LLM_CACHE=replay)"
+            )
+        return completion(*args, **kwargs)
+
+    wrapper.replay = True
+    return wrapper
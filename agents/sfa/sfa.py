@@ -3,11 +3,15 @@
 # /// script
 # requires-python = ">=3.12"
 # dependencies = [
+#     "agent-support",
 #     "duckdb>=1.3.1",
 #     "litellm>=1.72.6.post1",
 #     "python-dotenv>=1.1.0",
 #     "rich>=14.0.0",
 # ]
+#
+# [tool.uv.sources]
+# agent-support = { path = "../../ag-ui", editable = true }
 # ///
 
 """
@@ -17,10 +21,12 @@ Usage:
 """
 
 import argparse
+import csv
+import io
 import json
 import os
 from enum import Enum
-from typing import Any, Dict, List
+from typing import Any, Dict, Iterable, Iterator, List
 
 import duckdb
 import litellm
@@ -28,6 +34,16 @@ from dotenv import load_dotenv
 from rich.console import Console
 from rich.panel import Panel
 
+from agent_support import (
+    CompletionCache,
+    CompletionCacheMiss,
+    HistoryCompactor,
+    QueryResultCache,
+    SchemaCatalog,
+    is_ddl,
+    is_read_only_sql,
+)
+
 ToolCall = Dict[str, Any]
 
 load_dotenv()
@@ -36,6 +52,167 @@ console = Console()
 
 con = duckdb.connect(":default:")
 
+MODEL = "gemini/gemini-2.0-flash"
+
+schema_catalog = SchemaCatalog()
+
+
+# ---- Query result cache ----
+
+QUERY_CACHE_MAX_ENTRIES = int(os.getenv("QUERY_CACHE_MAX_ENTRIES", "256"))
+QUERY_CACHE_MAX_BYTES = int(
+    os.getenv("QUERY_CACHE_MAX_BYTES", str(16 * 1024 * 1024))
+)
+QUERY_CACHE_TTL_SECONDS = float(os.getenv("QUERY_CACHE_TTL_SECONDS", "300"))
+
+query_cache = QueryResultCache(
+    QUERY_CACHE_MAX_ENTRIES, QUERY_CACHE_MAX_BYTES, QUERY_CACHE_TTL_SECONDS
+)
+
+
+# ---- LLM completion cache ----
+
+LLM_CACHE = os.getenv("LLM_CACHE", "off").lower()
+LLM_CACHE_PATH = os.getenv("LLM_CACHE_PATH", ".llm_cache.sqlite")
+LLM_CACHE_MAX_BYTES = int(
+    os.getenv("LLM_CACHE_MAX_BYTES", str(64 * 1024 * 1024))
+)
+
+completion_cache = (
+    CompletionCache(LLM_CACHE_PATH, LLM_CACHE_MAX_BYTES, LLM_CACHE)
+    if LLM_CACHE in ("on", "replay")
+    else None
+)
+
+
+# ---- History compaction ----
+
+CONTEXT_TOKEN_BUDGET = int(os.getenv("CONTEXT_TOKEN_BUDGET", "24000"))
+KEEP_RECENT_MESSAGES = int(os.getenv("KEEP_RECENT_MESSAGES", "6"))
+
+history_compactor = HistoryCompactor(
+    CONTEXT_TOKEN_BUDGET, KEEP_RECENT_MESSAGES
+)
+
+
+# ---- Tool result encoding ----
+
+RESULT_FORMAT = os.getenv("RESULT_FORMAT", "csv")
+RESULT_MAX_ROWS = int(os.getenv("RESULT_MAX_ROWS", "50"))
+RESULT_MAX_BYTES = int(os.getenv("RESULT_MAX_BYTES", "8192"))
+FINAL_RESULT_MAX_ROWS = int(os.getenv("FINAL_RESULT_MAX_ROWS", "1000"))
+FINAL_RESULT_MAX_BYTES = int(
+    os.getenv("FINAL_RESULT_MAX_BYTES", str(1024 * 1024))
+)
+TEST_PREVIEW_ROWS = int(os.getenv("TEST_PREVIEW_ROWS", "5"))
+RESULT_FETCH_SIZE = 256
+SUMMARY_COLUMNS = [
+    "column_name",
+    "column_type",
+    "min",
+    "max",
+    "approx_unique",
+    "null_percentage",
+]
+
+
+def format_row(values: Iterable[Any], result_format: str) -> str:
+    cells = ["NULL" if value is None else str(value) for value in values]
+    if result_format == "markdown":
+        escaped = [cell.replace("|", "\\|") for cell in cells]
+        return "| " + " | ".join(escaped) + " |"
+    buffer = io.StringIO()
+    csv.writer(buffer, lineterminator="").writerow(cells)
+    return buffer.getvalue()
+
+
+def format_header(columns: List[str], result_format: str) -> List[str]:
+    header = format_row(columns, result_format)
+    if result_format == "markdown":
+        return [header, "|" + "---|" * len(columns)]
+    return [header]
+
+
+def iter_rows(
+    cursor: duckdb.DuckDBPyConnection, prefetched: Iterable[tuple] = ()
+) -> Iterator[tuple]:
+    yield from prefetched
+    while batch := cursor.fetchmany(RESULT_FETCH_SIZE):
+        yield from batch
+
+
+def encode_result(
+    cursor: duckdb.DuckDBPyConnection,
+    max_rows: int = RESULT_MAX_ROWS,
+    max_bytes: int = RESULT_MAX_BYTES,
+    result_format: str = RESULT_FORMAT,
+    prefetched: Iterable[tuple] = (),
+) -> str:
+    """
+    Encode a result with the header once and one compact line per row,
+    fetching in batches and stopping at the row or byte budget.
+    """
+    if cursor.description is None:
+        return "Statement executed successfully."
+    columns = [column[0] for column in cursor.description]
+    lines = format_header(columns, result_format)
+    size = sum(len(line) + 1 for line in lines)
+    shown = 0
+    for row in iter_rows(cursor, prefetched):
+        line = format_row(row, result_format)
+        if shown >= max_rows or size + len(line) + 1 > max_bytes:
+            lines.append(
+                f"... truncated after {shown} rows"
+                f" (budget: {max_rows} rows / {max_bytes} bytes)"
+            )
+            break
+        lines.append(line)
+        size += len(line) + 1
+        shown += 1
+    return "\n".join(lines)
+
+
+def summarize_test_query(
+    cursor: duckdb.DuckDBPyConnection,
+    sql_query: str,
+    result_format: str = RESULT_FORMAT,
+) -> str:
+    """
+    Small results come back as rows. Larger read-only results come back as
+    the row count, per-column SUMMARIZE statistics and a short preview, so a
+    test query never pulls its full result into the agent context.
+    """
+    if cursor.description is None:
+        return "Statement executed successfully."
+    preview = cursor.fetchmany(TEST_PREVIEW_ROWS + 1)
+    if len(preview) <= TEST_PREVIEW_ROWS or not is_read_only_sql(sql_query):
+        return encode_result(cursor, prefetched=preview)
+
+    columns = [column[0] for column in cursor.description]
+    preview_lines = format_header(columns, result_format) + [
+        format_row(row, result_format) for row in preview[:TEST_PREVIEW_ROWS]
+    ]
+    try:
+        cursor.execute(f"SUMMARIZE ({sql_query.strip().rstrip(';')})")
+        summary_columns = [column[0] for column in cursor.description]
+        stats = [dict(zip(summary_columns, row)) for row in cursor.fetchall()]
+    except Exception:
+        return "\n".join(
+            preview_lines + [f"... more than {TEST_PREVIEW_ROWS} rows"]
+        )
+
+    stats_lines = format_header(SUMMARY_COLUMNS, result_format) + [
+        format_row([stat[key] for key in SUMMARY_COLUMNS], result_format)
+        for stat in stats
+    ]
+    row_count = stats[0]["count"] if stats else "unknown"
+    return "\n".join(
+        [f"rows: {row_count}", "column summary:"]
+        + stats_lines
+        + [f"preview (first {TEST_PREVIEW_ROWS} rows):"]
+        + preview_lines
+    )
+
 
 class FileTypes(Enum):
     CSV = "csv"
@@ -69,6 +246,8 @@ def ingest_csv_dataset(con: duckdb.DuckDBPyConnection, file_path: str) -> None:
         f"CREATE OR REPLACE TABLE {file_name}"
         f" AS SELECT * FROM read_csv_auto('{file_path}')"
     )
+    schema_catalog.invalidate()
+    query_cache.bump()
 
 
 def get_ingestion_function(file_type: FileTypes):
@@ -96,9 +275,7 @@ def list_tables(reasoning: str) -> List[str]:
         List[str]: A list of table names in the DuckDB database.
     """
     try:
-        con.execute("SHOW TABLES")
-        tables = con.fetchall()
-        result = [table[0] for table in tables]
+        result = schema_catalog.tables(con)
         console.log(f"[blue]List Tables Tool[/blue] - Reasoning: {reasoning}")
         return result
     except Exception as e:
@@ -120,8 +297,7 @@ def describe_table(reasoning: str, table_name: str) -> str:
 
     """
     try:
-        con.execute(f"DESCRIBE {table_name}")
-        schema = con.fetchall()
+        schema = schema_catalog.columns(con, table_name)
         result = "\n".join([f"{col[0]}: {col[1]}" for col in schema])
         console.log(
             f"[blue]Describe Table Tool[/blue] - Table: {table_name} - Reasoning: {reasoning}"
@@ -132,6 +308,31 @@ def describe_table(reasoning: str, table_name: str) -> str:
         return f"Error describing table {table_name}: {str(e)}"
 
 
+def describe_all(reasoning: str) -> str:
+    """Returns schema information about every table in a single call.
+
+    The agent uses this instead of listing and describing tables one by one.
+
+    Args:
+        reasoning (str): Explanation of why we need the full schema.
+
+    Returns:
+        str: Each table name followed by its columns and types.
+    """
+    try:
+        catalog = schema_catalog.describe_all(con)
+        result = "\n\n".join(
+            f"{table_name}\n"
+            + "\n".join([f"{col[0]}: {col[1]}" for col in columns])
+            for table_name, columns in catalog.items()
+        )
+        console.log(f"[blue]Describe All Tool[/blue] - Reasoning: {reasoning}")
+        return result
+    except Exception as e:
+        console.log(f"[red]Error in Describe All Tool: {str(e)}[/red]")
+        return f"Error describing tables: {str(e)}"
+
+
 def sample_table(reasoning: str, table_name: str, row_sample_size: int) -> str:
     """Returns a sample of rows from the specified table.
 
@@ -147,8 +348,7 @@ def sample_table(reasoning: str, table_name: str, row_sample_size: int) -> str:
     """
     try:
         con.execute(f"SELECT * FROM {table_name} LIMIT {row_sample_size};")
-        sample = con.fetchall()
-        result = "\n".join([str(row) for row in sample])
+        result = encode_result(con)
         console.log(
             f"[blue]Sample Table Tool[/blue] - Table: {table_name} - Reasoning: {reasoning}"
         )
@@ -174,12 +374,29 @@ def run_test_sql_query(reasoning: str, sql_query: str) -> str:
     console.print(f"[dim]Query: {sql_query}[/dim]")
 
     try:
-        con.execute(sql_query)
-        result = con.fetchall()
+        cacheable = is_read_only_sql(sql_query)
+        if cacheable:
+            cached, version = query_cache.get(sql_query)
+            console.log(
+                f"[cyan]Query cache {'miss' if cached is None else 'hit'}"
+                f"[/cyan] - {query_cache.stats()}"
+            )
+            if cached is not None:
+                return cached
+        try:
+            con.execute(sql_query)
+        finally:
+            if not cacheable:
+                query_cache.bump()
+        if is_ddl(sql_query):
+            schema_catalog.invalidate()
         console.log(
             f"[blue]Run Test SQL Query Tool[/blue] - Query: {sql_query} - Reasoning: {reasoning}"
         )
-        return "\n".join([str(row) for row in result])
+        result = summarize_test_query(con, sql_query)
+        if cacheable:
+            query_cache.put(sql_query, version, result, len(result))
+        return result
     except Exception as e:
         console.log(f"[red]Error in Run Test SQL Query Tool: {str(e)}[/red]")
         return f"Error executing query: {str(e)}"
@@ -200,14 +417,21 @@ def run_final_sql_query(reasoning: str, sql_query: str) -> str:
     console.print(f"[dim]Query: {sql_query}[/dim]")
 
     try:
-        con.execute(sql_query)
-        result = con.fetchall()
+        try:
+            con.execute(sql_query)
+        finally:
+            if not is_read_only_sql(sql_query):
+                query_cache.bump()
+        if is_ddl(sql_query):
+            schema_catalog.invalidate()
         console.log(
             Panel(
                 f"[green]Final Query Tool[/green]\nReasoning: {reasoning}\nQuery: {sql_query}"
             )
         )
-        return "\n".join([str(row) for row in result])
+        return encode_result(
+            con, FINAL_RESULT_MAX_ROWS, FINAL_RESULT_MAX_BYTES
+        )
     except Exception as e:
         console.log(f"[red]Error in Run Final SQL Query Tool: {str(e)}[/red]")
         return f"Error executing final query: {str(e)}"
@@ -224,6 +448,7 @@ AGENT_PROMPT = """<purpose>
     <instruction>Use the provided tools to explore the database and construct the perfect query.</instruction>
     <instruction>Start by listing tables to understand what's available.</instruction>
     <instruction>Describe tables to understand their schema and columns.</instruction>
+    <instruction>Prefer describe_all over describing tables one at a time when you need several schemas.</instruction>
     <instruction>Sample tables to see actual data patterns.</instruction>
     <instruction>Test queries before finalizing them.</instruction>
     <instruction>Only call run_final_sql_query when you're confident the query is perfect.</instruction>
@@ -268,6 +493,19 @@ AGENT_PROMPT = """<purpose>
         </parameters>
     </tool>
 
+    <tool>
+        <name>describe_all</name>
+        <description>Returns schema info for every table in a single call</description>
+        <parameters>
+            <parameter>
+                <name>reasoning</name>
+                <type>string</type>
+                <description>Why we need the schema of all tables</description>
+                <required>true</required>
+            </parameter>
+        </parameters>
+    </tool>
+
     <tool>
         <name>sample_table</name>
         <description>Returns sample rows from specified table, always specify row_sample_size</description>
@@ -378,6 +616,23 @@ tools = [
             },
         },
     },
+    {
+        "type": "function",
+        "function": {
+            "name": "describe_all",
+            "description": "Returns schema info for every table in a single call",
+            "parameters": {
+                "type": "object",
+                "properties": {
+                    "reasoning": {
+                        "type": "string",
+                        "description": "Why we need the schema of all tables",
+                    }
+                },
+                "required": ["reasoning"],
+            },
+        },
+    },
     {
         "type": "function",
         "function": {
@@ -492,6 +747,7 @@ def main():
     available_functions = {
         "list_tables": list_tables,
         "describe_table": describe_table,
+        "describe_all": describe_all,
         "sample_table": sample_table,
         "run_test_sql_query": run_test_sql_query,
         "run_final_sql_query": run_final_sql_query,
@@ -508,12 +764,27 @@ def main():
             console.print(f"[yellow]Reached max compute loops[/yellow]")
             break
 
-        response = litellm.completion(
-            model="gemini/gemini-2.0-flash",
-            messages=messages,
-            tools=tools,
-            # tool_choice="required",
-        )
+        prompt_messages = history_compactor.compact(messages, MODEL)
+        cache_key = cached = None
+        if completion_cache is not None:
+            cache_key = CompletionCache.key(MODEL, prompt_messages, tools)
+            try:
+                cached = completion_cache.get(cache_key)
+            except CompletionCacheMiss as e:
+                console.print(f"[red]{e}[/red]")
+                break
+        if cached is not None:
+            console.log("[cyan]Completion cache hit[/cyan]")
+            response = litellm.ModelResponse(**cached)
+        else:
+            response = litellm.completion(
+                model=MODEL,
+                messages=prompt_messages,
+                tools=tools,
+                # tool_choice="required",
+            )
+            if cache_key is not None:
+                completion_cache.put(cache_key, response.model_dump())
 
         choice = response.choices[0].message
         tool_calls = getattr(choice, "tool_calls", None)
@@ -0,0 +1,72 @@
+"""
+Compares per-request graph overhead: compiling a graph on every request
+(previous behaviour) against reusing the graph cached by GraphFactory.
+
+Usage:
+
+uv run python -m scripts.benchmark_graph_factory
+"""
+
+import time
+from typing import List
+
+from langchain_core.tools import BaseTool, StructuredTool
+from langgraph.checkpoint.memory import InMemorySaver
+from src.application.graph_node_service import GraphNodeServiceImpl
+from src.infrastructure.graph.graph_factory import GraphFactory
+from src.infrastructure.llm.service import LLMServiceImpl
+
+REQUESTS = 200
+
+
+class StaticToolPool:
+    """Stands in for MCPSessionPool with a fixed tool list."""
+
+    def __init__(self, tools: List[BaseTool]):
+        self._tools = tools
+
+    def get_tools(self) -> List[BaseTool]:
+        return self._tools
+
+    def add_tools_listener(self, listener) -> None:
+        pass
+
+
+def make_tools(count: int) -> List[BaseTool]:
+    def add(a: int, b: int) -> int:
+        return a + b
+
+    return [
+        StructuredTool.from_function(
+            add, name=f"tool_{index}", description=f"Tool number {index}"
+        )
+        for index in range(count)
+    ]
+
+
+def measure(label: str, get_graph) -> float:
+    started_at = time.perf_counter()
+    for _ in range(REQUESTS):
+        get_graph()
+    elapsed_ms = (time.perf_counter() - started_at) * 1000 / REQUESTS
+    print(f"{label:<28} {elapsed_ms:8.3f} ms/request")
+    return elapsed_ms
+
+
+def main():
+    tools = make_tools(7)
+    factory = GraphFactory(
+        GraphNodeServiceImpl(LLMServiceImpl()),
+        InMemorySaver(),
+        StaticToolPool(tools),
+    )
+
+    uncached = measure(
+        "compile per request", lambda: factory.create_graph(tools)
+    )
+    cached = measure("cached graph", factory.get_graph)
+    print(f"speedup: {uncached / cached:.0f}x")
+
+
+if __name__ == "__main__":
+    main()
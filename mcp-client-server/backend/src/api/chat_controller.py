@@ -1,8 +1,26 @@
+import json
 import uuid
+from typing import AsyncIterator
 
-from fastapi import APIRouter
+from fastapi import APIRouter, WebSocket, WebSocketDisconnect
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import StreamingResponse
+from pydantic import ValidationError
 from src.domain.chat.interfaces import ChatService
-from src.dto import ChatRequest, FeedbackRequest, UpdateRequest
+from src.dto import ChatRequest, FeedbackRequest, ResumeRequest, UpdateRequest
+
+SSE_HEADERS = {"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+
+
+def encode_event(event: dict) -> str:
+    return json.dumps(jsonable_encoder(event), ensure_ascii=False)
+
+
+async def to_server_sent_events(
+    events: AsyncIterator[dict],
+) -> AsyncIterator[str]:
+    async for event in events:
+        yield f"event: {event['type']}\ndata: {encode_event(event)}\n\n"
 
 
 class ChatApiAdapter:
@@ -36,6 +54,21 @@ class ChatApiAdapter:
             methods=["GET"],
             tags=["chat"],
         )
+        self.router.add_api_route(
+            "/chat/thread/{thread_id}/ask/stream",
+            self.chat_stream,
+            methods=["POST"],
+            tags=["chat"],
+        )
+        self.router.add_api_route(
+            "/chat/thread/{thread_id}/resume/stream",
+            self.resume_stream,
+            methods=["POST"],
+            tags=["chat"],
+        )
+        self.router.add_api_websocket_route(
+            "/chat/thread/{thread_id}/ws", self.chat_websocket
+        )
 
     async def create_thread(self):
         thread_id = str(uuid.uuid4())
@@ -64,3 +97,63 @@ class ChatApiAdapter:
     async def continue_chat(self, thread_id: str):
         response = await self._chat_service.continue_chat(thread_id)
         return response
+
+    async def chat_stream(self, thread_id: str, request: ChatRequest):
+        events = self._chat_service.stream_chat(thread_id, request.messages)
+        return StreamingResponse(
+            to_server_sent_events(events),
+            media_type="text/event-stream",
+            headers=SSE_HEADERS,
+        )
+
+    async def resume_stream(self, thread_id: str, request: ResumeRequest):
+        events = self._chat_service.stream_resume(
+            thread_id, request.model_dump()
+        )
+        return StreamingResponse(
+            to_server_sent_events(events),
+            media_type="text/event-stream",
+            headers=SSE_HEADERS,
+        )
+
+    async def chat_websocket(self, websocket: WebSocket, thread_id: str):
+        """
+        Accepts ``{"type": "ask", "messages": [...]}`` or
+        ``{"type": "resume", "action": ..., "data": ...}`` frames and streams
+        the resulting events back as JSON frames.
+        """
+        await websocket.accept()
+        try:
+            while True:
+                frame = await websocket.receive_text()
+                try:
+                    # Malformed frames get an error frame, not a closed socket
+                    payload = json.loads(frame)
+                    events = self._websocket_events(thread_id, payload)
+                except (ValidationError, ValueError) as e:
+                    await websocket.send_text(
+                        encode_event({"type": "error", "message": str(e)})
+                    )
+                    continue
+                async for event in events:
+                    await websocket.send_text(encode_event(event))
+        except WebSocketDisconnect:
+            pass
+
+    def _websocket_events(
+        self, thread_id: str, payload: dict
+    ) -> AsyncIterator[dict]:
+        if not isinstance(payload, dict):
+            raise ValueError("Frames must be JSON objects")
+        message_type = payload.get("type")
+        if message_type == "ask":
+            request = ChatRequest.model_validate(
+                {"messages": payload.get("messages", [])}
+            )
+            return self._chat_service.stream_chat(thread_id, request.messages)
+        if message_type == "resume":
+            request = ResumeRequest.model_validate(payload)
+            return self._chat_service.stream_resume(
+                thread_id, request.model_dump()
+            )
+        raise ValueError(f"Unknown message type: {message_type}")
@@ -0,0 +1,17 @@
+from fastapi import APIRouter
+from src.infrastructure.mcp.session_pool import MCPSessionPool
+
+
+class McpApiAdapter:
+    def __init__(self, mcp_pool: MCPSessionPool) -> None:
+        self._mcp_pool = mcp_pool
+        self.router = APIRouter()
+        self.router.add_api_route(
+            "/mcp/pool/metrics",
+            self.pool_metrics,
+            methods=["GET"],
+            tags=["mcp"],
+        )
+
+    async def pool_metrics(self):
+        return self._mcp_pool.metrics()
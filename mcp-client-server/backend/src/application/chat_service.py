@@ -1,5 +1,6 @@
-from contextlib import AsyncExitStack
+from typing import Any, AsyncIterator
 
+from langchain_core.messages import AIMessageChunk, BaseMessage
 from langgraph.types import Command
 from src.domain.chat.interfaces import ChatService
 from src.infrastructure.graph.graph_factory import GraphFactory
@@ -11,13 +12,13 @@ class ChatServiceImpl(ChatService):
 
     async def process_chat(self, thread_id: str, messages: list) -> dict:
         config = {"configurable": {"thread_id": thread_id}}
-        graph = await self._graph_factory.create_graph()
+        graph = self._graph_factory.get_graph()
         response = await graph.ainvoke({"messages": messages}, config=config)
         return response
 
     async def update_tool_call(self, thread_id: str, args: dict) -> dict:
         config = {"configurable": {"thread_id": thread_id}}
-        graph = await self._graph_factory.create_graph()
+        graph = self._graph_factory.get_graph()
         response = await graph.ainvoke(
             Command(resume={"action": "update", "data": args}),
             config=config,
@@ -26,7 +27,7 @@ class ChatServiceImpl(ChatService):
 
     async def provide_feedback(self, thread_id: str, feedback: str) -> dict:
         config = {"configurable": {"thread_id": thread_id}}
-        graph = await self._graph_factory.create_graph()
+        graph = self._graph_factory.get_graph()
         response = await graph.ainvoke(
             Command(resume={"action": "feedback", "data": feedback}),
             config=config,
@@ -35,9 +36,91 @@ class ChatServiceImpl(ChatService):
 
     async def continue_chat(self, thread_id: str) -> dict:
         config = {"configurable": {"thread_id": thread_id}}
-        graph = await self._graph_factory.create_graph()
+        graph = self._graph_factory.get_graph()
         response = await graph.ainvoke(
             Command(resume={"action": "continue"}),
             config=config,
         )
         return response
+
+    def stream_chat(
+        self, thread_id: str, messages: list
+    ) -> AsyncIterator[dict]:
+        return self._stream(thread_id, {"messages": messages})
+
+    def stream_resume(
+        self, thread_id: str, resume: dict
+    ) -> AsyncIterator[dict]:
+        return self._stream(thread_id, Command(resume=resume))
+
+    async def _stream(self, thread_id: str, graph_input: Any):
+        """
+        Streams LLM tokens, tool activity and interrupts as they happen.
+
+        @see https://langchain-ai.github.io/langgraph/how-tos/streaming
+        """
+        config = {"configurable": {"thread_id": thread_id}}
+        graph = self._graph_factory.get_graph()
+        try:
+            async for mode, chunk in graph.astream(
+                graph_input,
+                config=config,
+                stream_mode=["messages", "updates"],
+            ):
+                if mode == "messages":
+                    for event in _message_events(*chunk):
+                        yield event
+                else:
+                    for event in _update_events(chunk):
+                        yield event
+        except Exception as e:
+            yield {"type": "error", "message": str(e)}
+            return
+        yield {"type": "end", "thread_id": thread_id}
+
+
+def _message_events(message: BaseMessage, metadata: dict):
+    if not isinstance(message, AIMessageChunk):
+        return
+    node = metadata.get("langgraph_node")
+    if message.content:
+        yield {
+            "type": "token",
+            "id": message.id,
+            "node": node,
+            "content": message.content,
+        }
+    for tool_call_chunk in message.tool_call_chunks:
+        yield {
+            "type": "tool_call_chunk",
+            "id": tool_call_chunk.get("id"),
+            "index": tool_call_chunk.get("index"),
+            "name": tool_call_chunk.get("name"),
+            "args": tool_call_chunk.get("args"),
+        }
+
+
+def _update_events(update: dict):
+    for node, node_update in update.items():
+        if node == "__interrupt__":
+            for pending in node_update:
+                yield {"type": "interrupt", "value": pending.value}
+            continue
+
+        messages = (node_update or {}).get("messages", [])
+        if not isinstance(messages, list):
+            messages = [messages]
+        for message in messages:
+            if node == "run_tool":
+                yield {
+                    "type": "tool_result",
+                    "name": message["name"],
+                    "tool_call_id": message["tool_call_id"],
+                    "content": message["content"],
+                }
+            elif getattr(message, "tool_calls", None):
+                yield {
+                    "type": "tool_calls",
+                    "node": node,
+                    "tool_calls": message.tool_calls,
+                }
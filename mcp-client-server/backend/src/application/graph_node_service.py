@@ -1,5 +1,6 @@
+import asyncio
 import json
-from typing import Literal, Protocol
+from typing import Any, Dict, List, Literal, Optional, Protocol
 
 from langgraph.types import Command, interrupt
 from loguru import logger
@@ -65,10 +66,21 @@ def get_review_action_strategy_class(review_action: str):
 
 
 class GraphNodeServiceImpl(GraphNodeService):
-    def __init__(self, llm_service: LLMService):
+    def __init__(
+        self,
+        llm_service: LLMService,
+        max_tool_concurrency: int = 4,
+        tool_timeout: float = 30.0,
+        tool_timeouts: Optional[Dict[str, float]] = None,
+    ):
         self._llm_service = llm_service
         self._tools = None
         self._frontend_actions = None
+        self._max_tool_concurrency = max_tool_concurrency
+        self._tool_timeout = tool_timeout
+        self._tool_timeouts = tool_timeouts or {}
+        self._tool_index_source = None
+        self._tool_index: Dict[str, Any] = {}
 
     def get_frontend_actions(self, state: GraphState):
         if self._frontend_actions is not None:
@@ -79,13 +91,13 @@ class GraphNodeServiceImpl(GraphNodeService):
         return self._frontend_actions
 
     def call_llm(self, state: GraphState, tools) -> GraphState:
-        llm = self._llm_service.get_chat_model(LLMProvider.GOOGLE)
-        self._tools = tools
-
         copilotkit_actions = self.get_frontend_actions(state)
         self._tools = [*copilotkit_actions, *tools]
 
-        response = llm.bind_tools(self._tools).invoke(state["messages"])
+        llm = self._llm_service.get_bound_model(
+            LLMProvider.GOOGLE, self._tools
+        )
+        response = llm.invoke(state["messages"])
         return {"messages": response}
 
     def human_review_node(
@@ -123,24 +135,68 @@ class GraphNodeServiceImpl(GraphNodeService):
         return strategy.execute()
 
     async def run_tool(self, state: GraphState, tools):
-        new_messages = []
+        """
+        Runs every tool call of the last AI message concurrently, bounded by
+        ``max_tool_concurrency``. Results keep the order of the tool calls.
+        """
         tool_calls = state["messages"][-1].tool_calls
+        tools_by_name = self._index_tools(tools)
+        semaphore = asyncio.Semaphore(self._max_tool_concurrency)
 
-        for tool_call in tool_calls:
-            tool = next(
-                (tool for tool in tools if tool.name == tool_call["name"]),
-                None,
-            )
-            result = await tool.ainvoke(tool_call["args"])
-            new_messages.append(
-                {
-                    "role": "tool",
-                    "name": tool_call["name"],
-                    "content": result,
-                    "tool_call_id": tool_call["id"],
-                }
+        async def run_one(tool_call: dict) -> dict:
+            async with semaphore:
+                return await self._invoke_tool(tools_by_name, tool_call)
+
+        new_messages = await asyncio.gather(
+            *(run_one(tool_call) for tool_call in tool_calls)
+        )
+        return {"messages": list(new_messages)}
+
+    async def _invoke_tool(
+        self, tools_by_name: Dict[str, Any], tool_call: dict
+    ) -> dict:
+        tool_name = tool_call["name"]
+        message = {
+            "role": "tool",
+            "name": tool_name,
+            "tool_call_id": tool_call["id"],
+        }
+
+        tool = tools_by_name.get(tool_name)
+        if tool is None:
+            return {
+                **message,
+                "content": f"Error: unknown tool {tool_name}",
+                "status": "error",
+            }
+
+        timeout = self._tool_timeouts.get(tool_name, self._tool_timeout)
+        try:
+            result = await asyncio.wait_for(
+                tool.ainvoke(tool_call["args"]), timeout=timeout
             )
-        return {"messages": new_messages}
+        except asyncio.TimeoutError:
+            logger.warning(f"Tool {tool_name} timed out after {timeout}s")
+            return {
+                **message,
+                "content": f"Error: {tool_name} timed out after {timeout}s",
+                "status": "error",
+            }
+        except Exception as e:
+            logger.exception(f"Tool {tool_name} failed")
+            return {
+                **message,
+                "content": f"Error: {str(e)}",
+                "status": "error",
+            }
+        return {**message, "content": result}
+
+    def _index_tools(self, tools: List[Any]) -> Dict[str, Any]:
+        # Compiled graphs reuse the same tools list, so index it once.
+        if self._tool_index_source is not tools:
+            self._tool_index = {tool.name: tool for tool in tools}
+            self._tool_index_source = tools
+        return self._tool_index
 
     def route_after_llm(self, state):
         if len(state["messages"][-1].tool_calls) == 0:
@@ -159,6 +215,7 @@ class GraphNodeServiceImpl(GraphNodeService):
         if state["messages"][-1].tool_calls[-1]["name"] in [
             "create_table",
             "insert_data",
+            "bulk_insert",
         ]:
             return "human_review_node"
         return "run_tool"
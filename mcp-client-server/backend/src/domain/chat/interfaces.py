@@ -1,5 +1,5 @@
 from abc import ABC, abstractmethod
-from typing import AsyncGenerator
+from typing import AsyncGenerator, AsyncIterator
 
 from langgraph.types import Command
 from src.type_definitions import GraphState
@@ -22,6 +22,18 @@ class ChatService(ABC):
     async def continue_chat(self, thread_id: str) -> dict:
         pass
 
+    @abstractmethod
+    def stream_chat(
+        self, thread_id: str, messages: list
+    ) -> AsyncIterator[dict]:
+        pass
+
+    @abstractmethod
+    def stream_resume(
+        self, thread_id: str, resume: dict
+    ) -> AsyncIterator[dict]:
+        pass
+
 
 class GraphNodeService(ABC):
     @abstractmethod
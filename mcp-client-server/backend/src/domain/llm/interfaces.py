@@ -1,8 +1,10 @@
 # src/domain/llm/interfaces.py
 from abc import ABC, abstractmethod
 from enum import Enum
+from typing import Any, Sequence
 
 from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.runnables import Runnable
 
 
 class LLMProvider(Enum):
@@ -15,3 +17,9 @@ class LLMService(ABC):
     @abstractmethod
     def get_chat_model(self, provider: LLMProvider) -> BaseChatModel:
         pass
+
+    @abstractmethod
+    def get_bound_model(
+        self, provider: LLMProvider, tools: Sequence[Any]
+    ) -> Runnable:
+        pass
@@ -1,5 +1,5 @@
 import uuid
-from typing import List, Optional, Union
+from typing import Any, List, Literal, Optional, Union
 
 from langchain_core.messages import AIMessage, HumanMessage, SystemMessage
 from pydantic import BaseModel, ConfigDict
@@ -36,3 +36,8 @@ class UpdateRequest(BaseModel):
 
 class FeedbackRequest(BaseModel):
     feedback: str
+
+
+class ResumeRequest(BaseModel):
+    action: Literal["continue", "update", "feedback"]
+    data: Optional[Any] = None
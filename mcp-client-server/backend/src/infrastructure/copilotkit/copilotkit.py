@@ -1,8 +1,8 @@
 from copilotkit import LangGraphAgent
 
 
-async def build_agents(context, graph_factory):
-    graph = await graph_factory.create_graph()
+def build_agents(context, graph_factory):
+    graph = graph_factory.get_graph()
     return [
         LangGraphAgent(
             name="agent",
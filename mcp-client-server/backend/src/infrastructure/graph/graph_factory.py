@@ -1,31 +1,53 @@
 # src/infrastructure/graph/graph_factory.py
 import functools
-from contextlib import AsyncExitStack
+from typing import Dict, Hashable, List, Tuple
 
+from langchain_core.tools import BaseTool
 from langgraph.checkpoint.memory import InMemorySaver
 from langgraph.checkpoint.sqlite.aio import AsyncSqliteSaver
 from langgraph.graph import START, StateGraph
 from langgraph.graph.graph import CompiledGraph
+from loguru import logger
 from src.domain.chat.interfaces import GraphNodeService
-from src.infrastructure.graph.utils import get_tools
+from src.infrastructure.mcp.session_pool import MCPSessionPool
 from src.type_definitions import GraphState
 
 
 class GraphFactory:
+    """
+    Builds the chat graph and caches the compiled result.
+
+    Graphs are keyed by the tool set and node configuration, so requests reuse
+    the same compiled graph until the MCP pool reports a new tool list.
+    """
 
     def __init__(
         self,
         node_service: GraphNodeService,
         checkpointer: AsyncSqliteSaver,
-        stack: AsyncExitStack,
+        mcp_pool: MCPSessionPool,
     ):
         self._node_service = node_service
         self._checkpointer = checkpointer
-        self._stack = stack
+        self._mcp_pool = mcp_pool
+        self._graphs: Dict[Hashable, CompiledGraph] = {}
+        self._mcp_pool.add_tools_listener(self.invalidate)
+
+    def get_graph(self) -> CompiledGraph:
+        tools = self._mcp_pool.get_tools()
+        key = self._graph_key(tools)
+        graph = self._graphs.get(key)
+        if graph is None:
+            logger.info(f"Compiling graph for {len(tools)} tools")
+            graph = self.create_graph(tools)
+            self._graphs[key] = graph
+        return graph
 
-    async def create_graph(self) -> CompiledGraph:
-        tools = await get_tools(self._stack)
+    def invalidate(self, *_) -> None:
+        """Drop every cached graph; the next request compiles a fresh one."""
+        self._graphs.clear()
 
+    def create_graph(self, tools: List[BaseTool]) -> CompiledGraph:
         call_llm_bound = lambda state: self._node_service.call_llm(
             state, tools
         )
@@ -48,3 +70,9 @@ class GraphFactory:
 
         graph = builder.compile(checkpointer=self._checkpointer)
         return graph
+
+    def _graph_key(self, tools: List[BaseTool]) -> Tuple[Hashable, ...]:
+        tool_set = tuple(
+            sorted((tool.name, tool.description) for tool in tools)
+        )
+        return (tool_set, id(self._node_service), id(self._checkpointer))
@@ -1,4 +1,11 @@
+import hashlib
+import json
+from collections import OrderedDict
+from typing import Any, Dict, Sequence, Tuple
+
 from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.runnables import Runnable
+from langchain_core.tools import BaseTool
 from src.domain.llm.interfaces import LLMProvider, LLMService
 from src.domain.llm.models import LLMConfig
 from src.infrastructure.llm.strategies import (
@@ -6,6 +13,9 @@ from src.infrastructure.llm.strategies import (
     GoogleLLMStrategy,
 )
 
+MAX_BOUND_MODELS = 32
+MAX_TOOL_FINGERPRINTS = 256
+
 
 class LLMServiceImpl(LLMService):
     def __init__(self):
@@ -22,10 +32,67 @@ class LLMServiceImpl(LLMService):
                 max_retries=2,
             )
         }
+        self._models: Dict[Tuple[LLMProvider, LLMConfig], BaseChatModel] = {}
+        self._bound_models: OrderedDict[Tuple[Any, ...], Runnable] = (
+            OrderedDict()
+        )
+        # Keyed by id(); the stored tool guards against a reused id(). LRU
+        # capped because the session pool rebuilds its proxy tools.
+        self._tool_fingerprints: OrderedDict[int, Tuple[BaseTool, str]] = (
+            OrderedDict()
+        )
 
     def get_chat_model(self, provider: LLMProvider) -> BaseChatModel:
         strategy = self._strategies.get(provider)
         config = self._configs.get(provider)
         if not strategy or not config:
             raise ValueError(f"Unsupported provider: {provider}")
-        return strategy.create_model(config)
+
+        key = (provider, config)
+        model = self._models.get(key)
+        if model is None:
+            model = strategy.create_model(config)
+            self._models[key] = model
+        return model
+
+    def get_bound_model(
+        self, provider: LLMProvider, tools: Sequence[Any]
+    ) -> Runnable:
+        """Returns the model bound to ``tools``, memoized per tool set."""
+        key = (provider, self._configs.get(provider), self._hash_tools(tools))
+        bound_model = self._bound_models.get(key)
+        if bound_model is not None:
+            self._bound_models.move_to_end(key)
+            return bound_model
+
+        bound_model = self.get_chat_model(provider).bind_tools(list(tools))
+        self._bound_models[key] = bound_model
+        if len(self._bound_models) > MAX_BOUND_MODELS:
+            self._bound_models.popitem(last=False)
+        return bound_model
+
+    def _hash_tools(self, tools: Sequence[Any]) -> str:
+        digest = hashlib.sha256()
+        for tool in tools:
+            digest.update(self._fingerprint(tool).encode())
+        return digest.hexdigest()
+
+    def _fingerprint(self, tool: Any) -> str:
+        if not isinstance(tool, BaseTool):
+            # CopilotKit frontend actions arrive as plain dicts per request.
+            return json.dumps(tool, sort_keys=True, default=str)
+
+        cached = self._tool_fingerprints.get(id(tool))
+        if cached is not None and cached[0] is tool:
+            self._tool_fingerprints.move_to_end(id(tool))
+            return cached[1]
+        fingerprint = json.dumps(
+            [tool.name, tool.description, tool.args],
+            sort_keys=True,
+            default=str,
+        )
+        self._tool_fingerprints[id(tool)] = (tool, fingerprint)
+        self._tool_fingerprints.move_to_end(id(tool))
+        if len(self._tool_fingerprints) > MAX_TOOL_FINGERPRINTS:
+            self._tool_fingerprints.popitem(last=False)
+        return fingerprint
@@ -0,0 +1,293 @@
+# src/infrastructure/mcp/session_pool.py
+import asyncio
+import time
+from contextlib import asynccontextmanager
+from dataclasses import dataclass, field
+from typing import (
+    Any,
+    AsyncIterator,
+    Callable,
+    Dict,
+    List,
+    Optional,
+    Set,
+)
+
+from langchain_core.tools import BaseTool, StructuredTool
+from langchain_mcp_adapters.client import MultiServerMCPClient
+from loguru import logger
+
+
+@dataclass
+class PoolMetrics:
+    size: int
+    created: int = 0
+    restarts: int = 0
+    failed_health_checks: int = 0
+    acquisitions: int = 0
+    total_wait_ms: float = 0.0
+    in_use: int = 0
+
+    def to_dict(self, idle: int) -> Dict[str, Any]:
+        return {
+            "size": self.size,
+            "idle": idle,
+            "in_use": self.in_use,
+            "created": self.created,
+            "restarts": self.restarts,
+            "failed_health_checks": self.failed_health_checks,
+            "acquisitions": self.acquisitions,
+            "avg_wait_ms": (
+                self.total_wait_ms / self.acquisitions
+                if self.acquisitions
+                else 0.0
+            ),
+        }
+
+
+@dataclass(eq=False)
+class PooledSession:
+    """
+    A warm stdio connection to a single MCP server.
+
+    The client context is entered and exited by ``runner`` because the
+    underlying anyio task groups must be closed from the task that opened them.
+    """
+
+    server_name: str
+    client: MultiServerMCPClient
+    runner: asyncio.Task
+    shutdown: asyncio.Event
+    tools: Dict[str, BaseTool] = field(default_factory=dict)
+    last_used: float = field(default_factory=time.monotonic)
+    closed: bool = False
+
+    async def ping(self, timeout: float) -> None:
+        if self.runner.done():
+            raise ConnectionError("MCP session runner has exited")
+        session = self.client.sessions[self.server_name]
+        await asyncio.wait_for(session.send_ping(), timeout=timeout)
+
+    async def close(self) -> None:
+        self.closed = True
+        self.shutdown.set()
+        await asyncio.gather(self.runner, return_exceptions=True)
+
+
+class MCPSessionPool:
+    """
+    Keeps ``size`` warm sessions per MCP server for the application lifetime.
+
+    Tools handed out by ``get_tools`` are stable proxies: every invocation
+    borrows an idle session of the owning server, so subprocesses are spawned
+    once at startup instead of once per request.
+
+    Sessions idle for more than ``health_check_interval`` seconds are pinged
+    before reuse. A slot whose session died and could not be reopened stays
+    in the pool empty and is reopened by the next borrower, so the pool
+    keeps its size through server outages.
+    """
+
+    def __init__(
+        self,
+        connections: Dict[str, Dict[str, Any]],
+        size: int = 2,
+        health_check_timeout: float = 5.0,
+        health_check_interval: float = 30.0,
+    ):
+        self._connections = connections
+        self._size = size
+        self._health_check_timeout = health_check_timeout
+        self._health_check_interval = health_check_interval
+        # None marks a slot whose session has to be (re)opened
+        self._idle: Dict[str, asyncio.Queue[Optional[PooledSession]]] = {}
+        # Every open session, idle or checked out, so close() reaches all
+        self._sessions: Set[PooledSession] = set()
+        self._metrics: Dict[str, PoolMetrics] = {}
+        self._server_tools: Dict[str, Dict[str, BaseTool]] = {}
+        self._tools: List[BaseTool] = []
+        self._listeners: List[Callable[[List[BaseTool]], None]] = []
+
+    async def __aenter__(self) -> "MCPSessionPool":
+        await self.start()
+        return self
+
+    async def __aexit__(self, *exc_info) -> None:
+        await self.close()
+
+    async def start(self) -> None:
+        for server_name in self._connections:
+            self._idle[server_name] = asyncio.Queue()
+            self._metrics[server_name] = PoolMetrics(size=self._size)
+            results = await asyncio.gather(
+                *[self._open(server_name) for _ in range(self._size)],
+                return_exceptions=True,
+            )
+            errors = [r for r in results if isinstance(r, BaseException)]
+            for result in results:
+                if not isinstance(result, BaseException):
+                    self._sessions.add(result)
+                    self._idle[server_name].put_nowait(result)
+            if errors:
+                # __aexit__ won't run: close what was opened so far
+                await self.close()
+                raise errors[0]
+        self._refresh_tools()
+        logger.info(f"MCP session pool started: {self.metrics()}")
+
+    async def close(self) -> None:
+        # Checked-out sessions are closed too: their callers are being
+        # shut down with the app and must not keep subprocesses alive.
+        sessions, self._sessions = self._sessions, set()
+        await asyncio.gather(
+            *[pooled.close() for pooled in sessions], return_exceptions=True
+        )
+        for queue in self._idle.values():
+            while not queue.empty():
+                queue.get_nowait()
+
+    def get_tools(self) -> List[BaseTool]:
+        return list(self._tools)
+
+    def add_tools_listener(
+        self, listener: Callable[[List[BaseTool]], None]
+    ) -> None:
+        """Register a callback fired when the exposed tool list changes."""
+        self._listeners.append(listener)
+
+    def metrics(self) -> Dict[str, Dict[str, Any]]:
+        return {
+            server_name: metrics.to_dict(self._idle[server_name].qsize())
+            for server_name, metrics in self._metrics.items()
+        }
+
+    @asynccontextmanager
+    async def acquire(self, server_name: str) -> AsyncIterator[PooledSession]:
+        metrics = self._metrics[server_name]
+        started_at = time.perf_counter()
+        pooled = await self._idle[server_name].get()
+        metrics.acquisitions += 1
+        metrics.total_wait_ms += (time.perf_counter() - started_at) * 1000
+        metrics.in_use += 1
+
+        # The slot goes back in every case (failed restart, cancellation),
+        # empty if its session was closed.
+        try:
+            pooled = await self._ensure_healthy(server_name, pooled)
+            try:
+                yield pooled
+                pooled.last_used = time.monotonic()
+            except Exception:
+                # The session may be broken mid-call; check it before reuse.
+                try:
+                    pooled = await self._ensure_healthy(
+                        server_name, pooled, force=True
+                    )
+                except Exception as e:
+                    logger.warning(f"Could not reopen {server_name}: {e}")
+                raise
+        finally:
+            metrics.in_use -= 1
+            if pooled is not None and pooled.closed:
+                pooled = None
+            self._idle[server_name].put_nowait(pooled)
+
+    async def _open(self, server_name: str) -> PooledSession:
+        connection = self._connections[server_name]
+        ready = asyncio.get_running_loop().create_future()
+        shutdown = asyncio.Event()
+
+        async def run_session() -> None:
+            try:
+                async with MultiServerMCPClient(
+                    {server_name: connection}
+                ) as client:
+                    ready.set_result(client)
+                    await shutdown.wait()
+            except Exception as e:
+                if not ready.done():
+                    ready.set_exception(e)
+                else:
+                    logger.warning(f"MCP session for {server_name} ended: {e}")
+
+        runner = asyncio.create_task(
+            run_session(), name=f"mcp-session-{server_name}"
+        )
+        try:
+            client = await ready
+        except BaseException:
+            # Failed or cancelled while starting: don't leave it running
+            runner.cancel()
+            raise
+        self._metrics[server_name].created += 1
+        tools = {tool.name: tool for tool in client.get_tools()}
+        self._server_tools[server_name] = tools
+        return PooledSession(
+            server_name=server_name,
+            client=client,
+            runner=runner,
+            shutdown=shutdown,
+            tools=tools,
+        )
+
+    async def _ensure_healthy(
+        self,
+        server_name: str,
+        pooled: Optional[PooledSession],
+        force: bool = False,
+    ) -> PooledSession:
+        """
+        Return ``pooled`` if it is alive, else a newly opened session.
+
+        Only sessions idle for more than ``health_check_interval`` (or
+        ``force``) are pinged, so busy sessions skip the round-trip.
+        """
+        if pooled is not None:
+            idle_for = time.monotonic() - pooled.last_used
+            if (
+                not force
+                and not pooled.runner.done()
+                and idle_for < self._health_check_interval
+            ):
+                return pooled
+            try:
+                await pooled.ping(self._health_check_timeout)
+                return pooled
+            except Exception as e:
+                logger.warning(f"MCP session for {server_name} is dead: {e}")
+                self._metrics[server_name].failed_health_checks += 1
+                self._sessions.discard(pooled)
+                await pooled.close()
+
+        previous_tools = self._server_tools.get(server_name, {})
+        restarted = await self._open(server_name)
+        self._sessions.add(restarted)
+        self._metrics[server_name].restarts += 1
+        if restarted.tools.keys() != previous_tools.keys():
+            self._refresh_tools()
+        return restarted
+
+    def _refresh_tools(self) -> None:
+        self._tools = [
+            self._make_proxy_tool(server_name, tool)
+            for server_name, tools in self._server_tools.items()
+            for tool in tools.values()
+        ]
+        for listener in self._listeners:
+            listener(self.get_tools())
+
+    def _make_proxy_tool(
+        self, server_name: str, template: BaseTool
+    ) -> BaseTool:
+        tool_name = template.name
+
+        async def call_tool(**arguments: Any) -> Any:
+            async with self.acquire(server_name) as pooled:
+                return await pooled.tools[tool_name].ainvoke(arguments)
+
+        return StructuredTool(
+            name=tool_name,
+            description=template.description,
+            args_schema=template.args_schema,
+            coroutine=call_tool,
+        )
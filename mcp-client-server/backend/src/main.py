@@ -1,4 +1,6 @@
+import os
 from contextlib import AsyncExitStack, asynccontextmanager
+from typing import Dict
 
 from copilotkit import CopilotKitRemoteEndpoint
 from copilotkit.integrations.fastapi import add_fastapi_endpoint
@@ -7,16 +9,32 @@ from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from langgraph.checkpoint.sqlite.aio import AsyncSqliteSaver
 from src.api.chat_controller import ChatApiAdapter
+from src.api.mcp_controller import McpApiAdapter
 from src.application.chat_service import ChatServiceImpl
 from src.application.graph_node_service import GraphNodeServiceImpl
 from src.infrastructure.copilotkit.copilotkit import build_agents
 from src.infrastructure.graph.graph_factory import GraphFactory
+from src.infrastructure.graph.utils import get_mcp_connections
 from src.infrastructure.llm.service import LLMServiceImpl
+from src.infrastructure.mcp.session_pool import MCPSessionPool
 from src.instrumentation import enable_telemetry
 
 load_dotenv()
 
 
+def parse_tool_timeouts(value: str) -> Dict[str, float]:
+    """Parse per-tool timeouts such as ``bulk_insert=120,select_data=10``."""
+    timeouts = {}
+    for item in value.split(","):
+        if not item.strip():
+            continue
+        tool_name, separator, seconds = item.partition("=")
+        if not separator:
+            raise ValueError(f"Invalid MCP_TOOL_TIMEOUTS entry: {item!r}")
+        timeouts[tool_name.strip()] = float(seconds)
+    return timeouts
+
+
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     db_name = "./checkpointer.db"
@@ -25,16 +43,37 @@ async def lifespan(app: FastAPI):
 
             enable_telemetry()
 
+            mcp_pool = await stack.enter_async_context(
+                MCPSessionPool(
+                    get_mcp_connections(),
+                    size=int(os.getenv("MCP_POOL_SIZE", "2")),
+                    health_check_interval=float(
+                        os.getenv("MCP_HEALTH_CHECK_INTERVAL", "30")
+                    ),
+                )
+            )
+
             llm_service = LLMServiceImpl()
-            node_service = GraphNodeServiceImpl(llm_service)
-            graph_factory = GraphFactory(node_service, checkpointer, stack)
+            node_service = GraphNodeServiceImpl(
+                llm_service,
+                max_tool_concurrency=int(
+                    os.getenv("MCP_TOOL_CONCURRENCY", "4")
+                ),
+                tool_timeout=float(os.getenv("MCP_TOOL_TIMEOUT", "30")),
+                tool_timeouts=parse_tool_timeouts(
+                    os.getenv("MCP_TOOL_TIMEOUTS", "")
+                ),
+            )
+            graph_factory = GraphFactory(node_service, checkpointer, mcp_pool)
             chat_service = ChatServiceImpl(graph_factory)
             chat_api_adapter = ChatApiAdapter(chat_service)
-
-            app.state.agents = await build_agents({}, graph_factory)
+            mcp_api_adapter = McpApiAdapter(mcp_pool)
 
             app.include_router(chat_api_adapter.router)
-            sdk = CopilotKitRemoteEndpoint(agents=lambda _: app.state.agents)
+            app.include_router(mcp_api_adapter.router)
+            sdk = CopilotKitRemoteEndpoint(
+                agents=lambda context: build_agents(context, graph_factory)
+            )
             add_fastapi_endpoint(app, sdk, "/copilotkit")
             yield
 
@@ -1,11 +1,56 @@
+import asyncio
+import base64
+import csv
+import hashlib
+import io
+import json
+import os
+import queue
+import re
 import sqlite3
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from itertools import islice
 from pathlib import Path
+from typing import (
+    Any,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    Literal,
+    Optional,
+    Tuple,
+    Union,
+)
 
 from loguru import logger
-from mcp.server.fastmcp import FastMCP
+from mcp.server.fastmcp import Context, FastMCP
 
 current_dir = Path(__file__).parent
-db_path = current_dir.parent.parent / "database.db"
+db_path = Path(
+    os.getenv("DB_PATH", str(current_dir.parent.parent / "database.db"))
+)
+
+DB_READERS = int(os.getenv("DB_READERS", "4"))
+DB_CACHE_SIZE_KIB = int(os.getenv("DB_CACHE_SIZE_KIB", "65536"))
+DB_MMAP_SIZE = int(os.getenv("DB_MMAP_SIZE", str(256 * 1024 * 1024)))
+DB_BUSY_TIMEOUT_MS = int(os.getenv("DB_BUSY_TIMEOUT_MS", "5000"))
+DB_CACHED_STATEMENTS = int(os.getenv("DB_CACHED_STATEMENTS", "256"))
+
+BULK_INSERT_BATCH_SIZE = 1000
+
+SELECT_PAGE_SIZE = 100
+SELECT_MAX_PAGE_SIZE = 1000
+SELECT_MAX_PAGE_BYTES = 64 * 1024
+SELECT_MAX_STREAM_ROWS = 100_000
+SELECT_MAX_STREAM_BYTES = 8 * 1024 * 1024
+SELECT_MAX_OPEN_CURSORS = int(os.getenv("SELECT_MAX_OPEN_CURSORS", "2"))
+SELECT_CURSOR_TTL_SECONDS = float(os.getenv("SELECT_CURSOR_TTL_SECONDS", "60"))
 
 mcp = FastMCP("SQL Agent Server")
 
@@ -15,41 +60,196 @@ def dict_factory(cursor, row):
     return {key: value for key, value in zip(fields, row)}
 
 
+class SQLiteConnectionPool:
+    """
+    Persistent connections for the server process: a bounded pool of
+    read-only connections and a single writer guarded by a lock.
+
+    The database runs in WAL mode so readers never block on the writer, and
+    sqlite3's per-connection statement cache keeps prepared statements warm.
+    """
+
+    def __init__(self, path: Path, readers: int = DB_READERS):
+        self._path = path
+        self._max_readers = readers
+        self._readers: queue.LifoQueue[sqlite3.Connection] = queue.LifoQueue()
+        self._created_readers = 0
+        self._readers_lock = threading.Lock()
+        self._writer_lock = threading.Lock()
+        self._writer = self._connect(read_only=False)
+
+    def _connect(self, read_only: bool) -> sqlite3.Connection:
+        conn = sqlite3.connect(
+            str(self._path),
+            check_same_thread=False,
+            cached_statements=DB_CACHED_STATEMENTS,
+        )
+        conn.execute(f"PRAGMA busy_timeout = {DB_BUSY_TIMEOUT_MS};")
+        if not read_only:
+            conn.execute("PRAGMA journal_mode = WAL;")
+        conn.execute("PRAGMA synchronous = NORMAL;")
+        conn.execute(f"PRAGMA cache_size = -{DB_CACHE_SIZE_KIB};")
+        conn.execute(f"PRAGMA mmap_size = {DB_MMAP_SIZE};")
+        conn.execute("PRAGMA temp_store = MEMORY;")
+        if read_only:
+            conn.execute("PRAGMA query_only = ON;")
+            conn.row_factory = dict_factory
+        return conn
+
+    @contextmanager
+    def reader(self) -> Iterator[sqlite3.Connection]:
+        conn = self.checkout_reader()
+        try:
+            yield conn
+        finally:
+            self.release_reader(conn)
+
+    @contextmanager
+    def writer(self) -> Iterator[sqlite3.Connection]:
+        with self._writer_lock:
+            try:
+                yield self._writer
+                self._writer.commit()
+            except Exception:
+                self._writer.rollback()
+                raise
+
+    def checkout_reader(self) -> sqlite3.Connection:
+        """Borrow a reader outside ``reader()``; hand it back with
+        ``release_reader``."""
+        try:
+            return self._readers.get_nowait()
+        except queue.Empty:
+            pass
+        with self._readers_lock:
+            if self._created_readers < self._max_readers:
+                self._created_readers += 1
+                return self._connect(read_only=True)
+        return self._readers.get()
+
+    def release_reader(self, conn: sqlite3.Connection) -> None:
+        if conn.in_transaction:
+            conn.rollback()
+        self._readers.put(conn)
+
+
+class SchemaCatalog:
+    """
+    Table list and column info cached per table name.
+
+    Entries are dropped when ``create_table`` runs and whenever
+    ``PRAGMA schema_version`` moves, which also catches DDL issued by the
+    other server processes sharing the database file.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._schema_version: Optional[int] = None
+        self._tables: Optional[List[Dict[str, Any]]] = None
+        self._columns: Dict[str, List[Dict[str, Any]]] = {}
+        self._complete = False
+
+    def invalidate(self) -> None:
+        with self._lock:
+            self._reset(None)
+
+    def tables(self, conn: sqlite3.Connection) -> List[Dict[str, Any]]:
+        with self._lock:
+            self._sync(conn)
+            if self._tables is None:
+                self._tables = conn.execute(
+                    "SELECT name FROM sqlite_master WHERE type='table';"
+                ).fetchall()
+            return self._tables
+
+    def columns(
+        self, conn: sqlite3.Connection, table_name: str
+    ) -> List[Dict[str, Any]]:
+        with self._lock:
+            self._sync(conn)
+            if table_name not in self._columns:
+                columns = conn.execute(
+                    "SELECT * FROM pragma_table_info(?);", (table_name,)
+                ).fetchall()
+                if not columns:
+                    return columns
+                self._columns[table_name] = columns
+            return self._columns[table_name]
+
+    def describe_all(
+        self, conn: sqlite3.Connection
+    ) -> Dict[str, List[Dict[str, Any]]]:
+        with self._lock:
+            self._sync(conn)
+            if not self._complete:
+                rows = conn.execute(
+                    "SELECT m.name AS table_name, p.* FROM sqlite_master AS m"
+                    " JOIN pragma_table_info(m.name) AS p"
+                    " WHERE m.type = 'table' ORDER BY m.name, p.cid;"
+                ).fetchall()
+                columns: Dict[str, List[Dict[str, Any]]] = {}
+                for row in rows:
+                    columns.setdefault(row.pop("table_name"), []).append(row)
+                self._tables = [{"name": name} for name in columns]
+                self._columns = columns
+                self._complete = True
+            return {
+                table["name"]: self._columns[table["name"]]
+                for table in self._tables
+            }
+
+    def _sync(self, conn: sqlite3.Connection) -> None:
+        schema_version = conn.execute("PRAGMA schema_version;").fetchone()[
+            "schema_version"
+        ]
+        if schema_version != self._schema_version:
+            self._reset(schema_version)
+
+    def _reset(self, schema_version: Optional[int]) -> None:
+        self._schema_version = schema_version
+        self._tables = None
+        self._columns = {}
+        self._complete = False
+
+
+pool = SQLiteConnectionPool(db_path)
+schema_catalog = SchemaCatalog()
+
+
 @mcp.tool()
 def list_tables() -> str:
     """List all tables in the database."""
     logger.info("Listing all tables in the database.")
-    conn = sqlite3.connect(str(db_path))
-    conn.row_factory = dict_factory
 
     try:
-        cursor = conn.execute(
-            "SELECT name FROM sqlite_master WHERE type='table';"
-        )
-        tables = cursor.fetchall()
-        return tables
-        # return "\n".join(table[0] for table in tables)
+        with pool.reader() as conn:
+            return schema_catalog.tables(conn)
     except Exception as e:
         return f"Error: {str(e)}"
-    finally:
-        conn.close()
 
 
 @mcp.tool()
 def describe_table(table_name: str) -> str:
     """Describe a table in the database."""
     logger.info(f"Describing table {table_name}.")
-    conn = sqlite3.connect(str(db_path))
-    conn.row_factory = dict_factory
 
     try:
-        cursor = conn.execute(f"PRAGMA table_info({table_name});")
-        columns = cursor.fetchall()
-        return columns
+        with pool.reader() as conn:
+            return schema_catalog.columns(conn, table_name)
+    except Exception as e:
+        return f"Error: {str(e)}"
+
+
+@mcp.tool()
+def describe_all() -> str:
+    """Describe every table in the database in a single call."""
+    logger.info("Describing all tables in the database.")
+
+    try:
+        with pool.reader() as conn:
+            return schema_catalog.describe_all(conn)
     except Exception as e:
         return f"Error: {str(e)}"
-    finally:
-        conn.close()
 
 
 @mcp.tool()
@@ -58,16 +258,14 @@ def create_table(sql: str) -> str:
     if not sql.lower().startswith("create table"):
         raise ValueError("SQL statement must start with 'CREATE TABLE'")
     logger.info(f"Creating table with SQL: {sql}")
-    conn = sqlite3.connect(str(db_path))
 
     try:
-        conn.execute(sql)
-        conn.commit()
+        with pool.writer() as conn:
+            conn.execute(sql)
+        schema_catalog.invalidate()
         return "Table created successfully."
     except Exception as e:
         return f"Error: {str(e)}"
-    finally:
-        conn.close()
 
 
 @mcp.tool()
@@ -76,35 +274,415 @@ def insert_data(sql: str) -> str:
     if not sql.lower().startswith("insert into"):
         raise ValueError("SQL statement must start with 'INSERT INTO'")
     logger.info(f"Inserting data with SQL: {sql}")
-    conn = sqlite3.connect(str(db_path))
 
     try:
-        conn.execute(sql)
-        conn.commit()
+        with pool.writer() as conn:
+            conn.execute(sql)
         return "Data inserted successfully."
     except Exception as e:
         return f"Error: {str(e)}"
+
+
+IDENTIFIER_PATTERN = re.compile(r"^[A-Za-z_][A-Za-z0-9_]*$")
+
+
+def quote_identifier(name: str) -> str:
+    if not IDENTIFIER_PATTERN.match(name):
+        raise ValueError(f"Invalid identifier: {name!r}")
+    return f'"{name}"'
+
+
+def parse_csv_rows(
+    data: str, columns: List[str]
+) -> tuple[List[str], Iterator[List[Any]]]:
+    """Read CSV lazily; the header row names the columns in the payload."""
+    reader = csv.reader(io.StringIO(data))
+    header = next(reader, None)
+    if not header:
+        raise ValueError("payload has no rows")
+    columns = columns or header
+    missing = [column for column in columns if column not in header]
+    if missing:
+        raise ValueError(f"columns not in the CSV header: {missing}")
+    positions = [header.index(column) for column in columns]
+
+    def values(row: List[str]) -> List[Any]:
+        if len(row) < len(header):
+            raise ValueError(
+                f"CSV line {reader.line_num} has {len(row)} fields,"
+                f" expected {len(header)}"
+            )
+        return [row[position] or None for position in positions]
+
+    return columns, (values(row) for row in reader)
+
+
+def parse_jsonl_rows(
+    data: str, columns: List[str]
+) -> tuple[List[str], Iterator[List[Any]]]:
+    """Read JSON lines lazily; keys of the first object are the default
+    columns."""
+    records = (json.loads(line) for line in io.StringIO(data) if line.strip())
+    first = next(records, None)
+    if first is None:
+        raise ValueError("payload has no rows")
+    columns = columns or list(first)
+    rows = (
+        [record.get(column) for column in columns]
+        for record in (first, *records)
+    )
+    return columns, rows
+
+
+def batched(rows: Iterable[List[Any]], size: int) -> Iterator[List[Any]]:
+    iterator = iter(rows)
+    while batch := list(islice(iterator, size)):
+        yield batch
+
+
+@mcp.tool()
+def bulk_insert(
+    table: str,
+    columns: Optional[List[str]] = None,
+    rows: Optional[List[List[Any]]] = None,
+    data: Optional[str] = None,
+    data_format: Literal["csv", "jsonl"] = "csv",
+) -> str:
+    """
+    Insert many rows into a table in a single transaction.
+
+    Pass ``rows`` as value lists matching ``columns``, or ``data`` as a CSV
+    payload with a header row or as JSON lines. Nothing is written if any
+    row fails.
+    """
+    columns = columns or []
+    if rows is None and data is None:
+        raise ValueError("Either 'rows' or 'data' must be provided")
+
+    try:
+        if data is not None:
+            parse = (
+                parse_csv_rows if data_format == "csv" else parse_jsonl_rows
+            )
+            columns, rows = parse(data, columns)
+        if not columns:
+            raise ValueError("'columns' is required with 'rows'")
+
+        sql = (
+            f"INSERT INTO {quote_identifier(table)} "
+            f"({', '.join(quote_identifier(c) for c in columns)}) "
+            f"VALUES ({', '.join('?' for _ in columns)});"
+        )
+        logger.info(f"Bulk inserting into {table} with SQL: {sql}")
+
+        inserted = 0
+        with pool.writer() as conn:
+            for batch in batched(rows, BULK_INSERT_BATCH_SIZE):
+                conn.executemany(sql, batch)
+                inserted += len(batch)
+        return f"{inserted} rows inserted successfully."
+    except Exception as e:
+        return f"Error: {str(e)}"
+
+
+def _sql_fingerprint(sql: str) -> str:
+    return hashlib.sha256(sql.encode()).hexdigest()[:16]
+
+
+def encode_page_cursor(
+    sql: str, offset: int, cursor_id: Optional[str] = None
+) -> str:
+    token = json.dumps(
+        {"sql": _sql_fingerprint(sql), "offset": offset, "id": cursor_id}
+    )
+    return base64.urlsafe_b64encode(token.encode()).decode()
+
+
+def decode_page_cursor(
+    sql: str, cursor: Optional[str]
+) -> Tuple[int, Optional[str]]:
+    """Return the offset and the open cursor id carried by ``cursor``."""
+    if not cursor:
+        return 0, None
+    token = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+    if token["sql"] != _sql_fingerprint(sql):
+        raise ValueError("Cursor does not belong to this query")
+    return int(token["offset"]), token.get("id")
+
+
+def row_size(row: tuple) -> int:
+    return len(json.dumps(row, default=str))
+
+
+ORDER_BY_PATTERN = re.compile(r"\border\s+by\b", re.IGNORECASE)
+
+
+def has_top_level_order_by(sql: str) -> bool:
+    for match in ORDER_BY_PATTERN.finditer(sql):
+        prefix = sql[: match.start()]
+        if prefix.count("(") == prefix.count(")"):
+            return True
+    return False
+
+
+def ordered_query(conn: sqlite3.Connection, sql: str) -> str:
+    """
+    Give ``sql`` a deterministic row order so pages neither skip nor repeat
+    rows: the query's own ORDER BY if it has one, else every output column.
+    """
+    sql = sql.strip().rstrip(";")
+    if has_top_level_order_by(sql):
+        return sql
+    probe = conn.execute(f"SELECT * FROM ({sql}) LIMIT 0;")
+    positions = ", ".join(str(i) for i in range(1, len(probe.description) + 1))
+    probe.close()
+    return f"SELECT * FROM ({sql}) ORDER BY {positions}"
+
+
+def paginated_query(conn: sqlite3.Connection, sql: str) -> str:
+    return f"SELECT * FROM ({ordered_query(conn, sql)}) LIMIT -1 OFFSET ?;"
+
+
+@dataclass
+class PageCursor:
+    """An executing page query positioned at ``offset``."""
+
+    conn: sqlite3.Connection
+    cursor: sqlite3.Cursor
+    fingerprint: str
+    offset: int
+    # A row read ahead that belongs to the next page
+    pending: Optional[tuple] = None
+    last_used: float = field(default_factory=time.monotonic)
+
+    @property
+    def columns(self) -> List[str]:
+        return [column[0] for column in self.cursor.description]
+
+    def next_row(self) -> Optional[tuple]:
+        if self.pending is not None:
+            row, self.pending = self.pending, None
+            return row
+        return self.cursor.fetchone()
+
+
+def open_page_cursor(
+    conn: sqlite3.Connection, sql: str, offset: int
+) -> PageCursor:
+    cursor = conn.cursor()
+    cursor.row_factory = None
+    cursor.execute(paginated_query(conn, sql), (offset,))
+    return PageCursor(conn, cursor, _sql_fingerprint(sql), offset)
+
+
+class PageCursors:
+    """
+    Page queries kept open between ``select_data`` calls, so a continuation
+    reads on from where the last page stopped instead of re-running the
+    query up to its OFFSET.
+
+    Each one holds a pooled reader, so at most ``max_open`` are kept and
+    those idle for ``ttl`` seconds are closed. A continuation whose cursor
+    is gone re-runs the query from its offset in the same order.
+    """
+
+    def __init__(
+        self,
+        pool: SQLiteConnectionPool,
+        max_open: int = SELECT_MAX_OPEN_CURSORS,
+        ttl: float = SELECT_CURSOR_TTL_SECONDS,
+    ):
+        self._pool = pool
+        self._max_open = max_open
+        self._ttl = ttl
+        self._lock = threading.Lock()
+        self._open: OrderedDict[str, PageCursor] = OrderedDict()
+
+    def take(
+        self, cursor_id: Optional[str], sql: str, offset: int
+    ) -> Optional[PageCursor]:
+        with self._lock:
+            stale = self._expire()
+            page_cursor = (
+                self._open.pop(cursor_id, None) if cursor_id else None
+            )
+        if page_cursor is not None and (
+            page_cursor.fingerprint != _sql_fingerprint(sql)
+            or page_cursor.offset != offset
+        ):
+            stale.append(page_cursor)
+            page_cursor = None
+        for expired in stale:
+            self.close(expired)
+        return page_cursor
+
+    def keep(self, page_cursor: PageCursor) -> Optional[str]:
+        if self._max_open <= 0:
+            self.close(page_cursor)
+            return None
+        cursor_id = uuid.uuid4().hex
+        page_cursor.last_used = time.monotonic()
+        with self._lock:
+            self._open[cursor_id] = page_cursor
+            evicted = self._expire()
+            while len(self._open) > self._max_open:
+                evicted.append(self._open.popitem(last=False)[1])
+        for expired in evicted:
+            self.close(expired)
+        return cursor_id
+
+    def close(self, page_cursor: PageCursor) -> None:
+        page_cursor.cursor.close()
+        self._pool.release_reader(page_cursor.conn)
+
+    def _expire(self) -> List[PageCursor]:
+        deadline = time.monotonic() - self._ttl
+        expired = [
+            cursor_id
+            for cursor_id, page_cursor in self._open.items()
+            if page_cursor.last_used < deadline
+        ]
+        return [self._open.pop(cursor_id) for cursor_id in expired]
+
+
+page_cursors = PageCursors(pool)
+
+
+def fetch_page(page_cursor: PageCursor, page_size: int) -> Dict[str, Any]:
+    """
+    Read one page as ``columns`` plus row value lists, stopping early when
+    the page would exceed ``SELECT_MAX_PAGE_BYTES``. ``has_more`` tells
+    whether rows are left after it.
+    """
+    rows: List[tuple] = []
+    page_bytes = 0
+    truncated = False
+    while len(rows) < page_size:
+        row = page_cursor.next_row()
+        if row is None:
+            break
+        page_bytes += row_size(row)
+        if rows and page_bytes > SELECT_MAX_PAGE_BYTES:
+            page_cursor.pending = row
+            truncated = True
+            break
+        rows.append(row)
+    page_cursor.offset += len(rows)
+    if not truncated:
+        page_cursor.pending = page_cursor.next_row()
+
+    page = {
+        "columns": page_cursor.columns,
+        "rows": rows,
+        "has_more": page_cursor.pending is not None,
+    }
+    if truncated:
+        page["truncated_by_bytes"] = True
+    return page
+
+
+def read_page(
+    sql: str, cursor: Optional[str], page_size: int
+) -> Dict[str, Any]:
+    offset, cursor_id = decode_page_cursor(sql, cursor)
+    page_cursor = page_cursors.take(cursor_id, sql, offset)
+    if page_cursor is None:
+        conn = pool.checkout_reader()
+        try:
+            page_cursor = open_page_cursor(conn, sql, offset)
+        except Exception:
+            pool.release_reader(conn)
+            raise
+
+    try:
+        page = fetch_page(page_cursor, page_size)
+    except Exception:
+        page_cursors.close(page_cursor)
+        raise
+    if not page.pop("has_more"):
+        page_cursors.close(page_cursor)
+        page["next_cursor"] = None
+        return page
+    next_offset = page_cursor.offset
+    page["next_cursor"] = encode_page_cursor(
+        sql, next_offset, page_cursors.keep(page_cursor)
+    )
+    return page
+
+
+async def stream_rows(
+    sql: str, chunk_size: int, ctx: Context
+) -> Dict[str, Any]:
+    """
+    Send the result as ``fetchmany`` chunks through MCP log notifications,
+    reporting progress after each one, within the stream row/byte budget.
+    SQLite work runs in worker threads to keep the event loop free.
+    """
+    conn = await asyncio.to_thread(pool.checkout_reader)
+    cursor = conn.cursor()
+    cursor.row_factory = None
+    try:
+        await asyncio.to_thread(cursor.execute, sql)
+        columns = [column[0] for column in cursor.description]
+
+        row_count = 0
+        sent_bytes = 0
+        truncated = False
+        while rows := await asyncio.to_thread(cursor.fetchmany, chunk_size):
+            chunk = json.dumps(
+                {"columns": columns, "offset": row_count, "rows": rows},
+                default=str,
+            )
+            await ctx.info(chunk)
+            row_count += len(rows)
+            sent_bytes += len(chunk)
+            await ctx.report_progress(row_count)
+            if (
+                row_count >= SELECT_MAX_STREAM_ROWS
+                or sent_bytes >= SELECT_MAX_STREAM_BYTES
+            ):
+                next_row = await asyncio.to_thread(cursor.fetchone)
+                truncated = next_row is not None
+                break
     finally:
-        conn.close()
+        cursor.close()
+        pool.release_reader(conn)
+    return {
+        "columns": columns,
+        "row_count": row_count,
+        "streamed": True,
+        "truncated": truncated,
+    }
 
 
 @mcp.tool()
-def select_data(sql: str) -> str:
-    """Execute SQL queries safely."""
+async def select_data(
+    sql: str,
+    page_size: int = SELECT_PAGE_SIZE,
+    cursor: Optional[str] = None,
+    stream: bool = False,
+    ctx: Context = None,
+) -> Union[Dict[str, Any], str]:
+    """
+    Execute a SELECT query and return one page of results.
+
+    Results are columnar: ``columns`` once, then ``rows`` as value lists.
+    When ``next_cursor`` is set, pass it back as ``cursor`` to read the next
+    page. Pages follow the query's ORDER BY, or every column when it has
+    none. With ``stream`` enabled, rows are pushed as chunked log
+    notifications instead and only a summary is returned.
+    """
     if not sql.lower().startswith("select"):
         raise ValueError("SQL statement must start with 'SELECT'")
     logger.info(f"Selecting data with SQL: {sql}")
-    conn = sqlite3.connect(str(db_path))
-    conn.row_factory = dict_factory
+    page_size = max(1, min(page_size, SELECT_MAX_PAGE_SIZE))
 
     try:
-        cursor = conn.execute(sql)
-        rows = cursor.fetchall()
-        return rows
+        if stream and ctx is not None:
+            return await stream_rows(sql, page_size, ctx)
+        return await asyncio.to_thread(read_page, sql, cursor, page_size)
     except Exception as e:
         return f"Error: {str(e)}"
-    finally:
-        conn.close()
 
 
 if __name__ == "__main__":
@@ -0,0 +1,4 @@
+import os
+
+# Keep the MCP db_server module off the real database.db when imported
+os.environ.setdefault("DB_PATH", ":memory:")
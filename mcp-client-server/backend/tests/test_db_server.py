@@ -0,0 +1,154 @@
+import asyncio
+import sqlite3
+
+import pytest
+from src.mcp import db_server
+from src.mcp.db_server import PageCursors, SQLiteConnectionPool
+
+
+@pytest.fixture
+def pool(tmp_path, monkeypatch):
+    pool = SQLiteConnectionPool(tmp_path / "test.db", readers=2)
+    with pool.writer() as conn:
+        conn.execute("CREATE TABLE items (id INTEGER, name TEXT);")
+        conn.executemany(
+            "INSERT INTO items VALUES (?, ?);",
+            [(i, f"item {i}") for i in range(25, 0, -1)],
+        )
+    monkeypatch.setattr(db_server, "pool", pool)
+    monkeypatch.setattr(db_server, "page_cursors", PageCursors(pool))
+    return pool
+
+
+def read_all(sql: str, page_size: int) -> list:
+    rows, cursor = [], None
+    while True:
+        page = db_server.read_page(sql, cursor, page_size)
+        rows.extend(page["rows"])
+        cursor = page["next_cursor"]
+        if cursor is None:
+            return rows
+
+
+def test_pages_follow_every_column_without_order_by(pool):
+    rows = read_all("SELECT id, name FROM items", page_size=10)
+    assert [row[0] for row in rows] == list(range(1, 26))
+
+
+def test_pages_keep_the_query_order(pool):
+    rows = read_all("SELECT id FROM items ORDER BY id DESC;", page_size=7)
+    assert [row[0] for row in rows] == list(range(25, 0, -1))
+
+
+def test_order_by_in_a_subquery_is_not_top_level():
+    assert not db_server.has_top_level_order_by(
+        "SELECT id, row_number() OVER (ORDER BY id) FROM items"
+    )
+    assert db_server.has_top_level_order_by("SELECT id FROM t ORDER BY 1")
+
+
+def test_continuation_without_open_cursor_reruns_from_offset(pool):
+    sql = "SELECT id FROM items"
+    first = db_server.read_page(sql, None, 10)
+    # Drop the open cursor as if it had expired
+    db_server.page_cursors._ttl = -1
+    db_server.page_cursors.take(None, sql, 0)
+
+    second = db_server.read_page(sql, first["next_cursor"], 10)
+    assert [row[0] for row in second["rows"]] == list(range(11, 21))
+
+
+def test_open_cursors_are_capped_and_release_readers(pool, monkeypatch):
+    monkeypatch.setattr(
+        db_server, "page_cursors", PageCursors(pool, max_open=1)
+    )
+    first = db_server.read_page("SELECT id FROM items", None, 5)
+    db_server.read_page("SELECT name FROM items", None, 5)
+    assert len(db_server.page_cursors._open) == 1
+
+    # The evicted cursor's query still resumes at its offset
+    page = db_server.read_page("SELECT id FROM items", first["next_cursor"], 5)
+    assert [row[0] for row in page["rows"]] == [6, 7, 8, 9, 10]
+    with pool.reader() as conn:
+        assert conn.execute("SELECT 1 AS one;").fetchone() == {"one": 1}
+
+
+def test_byte_budget_carries_the_cut_row_to_the_next_page(pool, monkeypatch):
+    monkeypatch.setattr(db_server, "SELECT_MAX_PAGE_BYTES", 30)
+    page = db_server.read_page("SELECT id, name FROM items", None, 10)
+    assert page["truncated_by_bytes"]
+    assert len(page["rows"]) < 10
+
+    rows = read_all("SELECT id, name FROM items", page_size=10)
+    assert [row[0] for row in rows] == list(range(1, 26))
+
+
+def test_cursor_from_another_query_is_rejected(pool):
+    page = db_server.read_page("SELECT id FROM items", None, 5)
+    with pytest.raises(ValueError):
+        db_server.read_page("SELECT name FROM items", page["next_cursor"], 5)
+
+
+def test_select_data_reports_errors_as_text(pool):
+    result = asyncio.run(db_server.select_data("SELECT * FROM missing"))
+    assert result.startswith("Error:")
+
+
+def test_reader_connections_are_read_only(pool):
+    with pool.reader() as conn:
+        with pytest.raises(sqlite3.OperationalError):
+            conn.execute("DELETE FROM items;")
+
+
+class FakeContext:
+    def __init__(self):
+        self.chunks = []
+        self.progress = []
+
+    async def info(self, message: str) -> None:
+        self.chunks.append(message)
+
+    async def report_progress(self, progress: int) -> None:
+        self.progress.append(progress)
+
+
+def test_stream_rows_stops_at_the_row_budget(pool, monkeypatch):
+    monkeypatch.setattr(db_server, "SELECT_MAX_STREAM_ROWS", 10)
+    ctx = FakeContext()
+    summary = asyncio.run(
+        db_server.select_data(
+            "SELECT id FROM items", page_size=4, stream=True, ctx=ctx
+        )
+    )
+    assert summary["row_count"] == 12
+    assert summary["truncated"]
+    assert ctx.progress == [4, 8, 12]
+
+
+def test_bulk_insert_is_batched_in_one_transaction(pool, monkeypatch):
+    monkeypatch.setattr(db_server, "BULK_INSERT_BATCH_SIZE", 2)
+    data = "id,name\n100,a\n101,b\n102,c\n"
+    assert db_server.bulk_insert("items", data=data).startswith("3 rows")
+
+    bad = "id,name\n200,a\n201\n"
+    result = db_server.bulk_insert("items", data=bad)
+    assert result == "Error: CSV line 3 has 1 fields, expected 2"
+    with pool.reader() as conn:
+        count = conn.execute("SELECT count(*) AS n FROM items;").fetchone()
+    assert count == {"n": 28}
+
+
+@pytest.mark.parametrize(
+    "data, data_format",
+    [("", "csv"), ("\n\n", "jsonl")],
+)
+def test_bulk_insert_rejects_empty_payloads(pool, data, data_format):
+    result = db_server.bulk_insert("items", data=data, data_format=data_format)
+    assert result == "Error: payload has no rows"
+
+
+def test_bulk_insert_names_missing_csv_columns(pool):
+    result = db_server.bulk_insert(
+        "items", columns=["id", "price"], data="id,name\n1,a\n"
+    )
+    assert result == "Error: columns not in the CSV header: ['price']"
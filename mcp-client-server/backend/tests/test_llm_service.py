@@ -0,0 +1,29 @@
+from langchain_core.tools import StructuredTool
+from src.infrastructure.llm import service
+from src.infrastructure.llm.service import LLMServiceImpl
+
+
+def make_tool(name: str) -> StructuredTool:
+    return StructuredTool.from_function(
+        lambda query: query, name=name, description=f"{name} tool"
+    )
+
+
+def test_tool_fingerprints_are_capped(monkeypatch):
+    monkeypatch.setattr(service, "MAX_TOOL_FINGERPRINTS", 3)
+    llm_service = LLMServiceImpl()
+
+    for generation in range(5):
+        llm_service._hash_tools([make_tool(f"tool_{generation}")])
+
+    assert len(llm_service._tool_fingerprints) == 3
+
+
+def test_reused_id_does_not_return_a_stale_fingerprint():
+    llm_service = LLMServiceImpl()
+    tool = make_tool("select_data")
+    first = llm_service._fingerprint(tool)
+
+    # Simulate a different tool that landed on the same id()
+    llm_service._tool_fingerprints[id(tool)] = (make_tool("other"), "stale")
+    assert llm_service._fingerprint(tool) == first
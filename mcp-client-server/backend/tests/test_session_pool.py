@@ -0,0 +1,150 @@
+import asyncio
+import time
+
+import pytest
+from src.infrastructure.mcp.session_pool import MCPSessionPool
+
+
+class FakeRunner:
+    def __init__(self, session):
+        self._session = session
+
+    def done(self) -> bool:
+        return self._session.closed
+
+
+class FakeSession:
+    def __init__(self, server_name: str):
+        self.server_name = server_name
+        self.tools = {}
+        self.last_used = time.monotonic()
+        self.closed = False
+        self.alive = True
+        self.pings = 0
+        self.runner = FakeRunner(self)
+
+    async def ping(self, timeout: float) -> None:
+        self.pings += 1
+        if not self.alive:
+            raise ConnectionError("dead")
+
+    async def close(self) -> None:
+        self.closed = True
+
+
+class FakeServer:
+    """Stands in for ``MCPSessionPool._open``; ``up`` toggles outages."""
+
+    def __init__(self):
+        self.up = True
+        self.opened = []
+
+    async def open(self, server_name: str) -> FakeSession:
+        if not self.up:
+            raise ConnectionError("server down")
+        session = FakeSession(server_name)
+        self.opened.append(session)
+        return session
+
+
+def make_pool(server: FakeServer, **kwargs) -> MCPSessionPool:
+    pool = MCPSessionPool({"db": {}}, **kwargs)
+    pool._open = server.open
+    return pool
+
+
+def test_pool_recovers_after_failed_restart():
+    async def scenario():
+        server = FakeServer()
+        pool = make_pool(server, size=1, health_check_interval=0)
+        await pool.start()
+
+        server.opened[0].alive = False
+        server.up = False
+        for _ in range(3):
+            with pytest.raises(ConnectionError):
+                async with pool.acquire("db"):
+                    pass
+
+        metrics = pool.metrics()["db"]
+        assert metrics["in_use"] == 0
+        assert metrics["idle"] == 1
+
+        server.up = True
+        async with asyncio.timeout(1):
+            async with pool.acquire("db") as pooled:
+                assert pooled is server.opened[-1]
+                assert not pooled.closed
+        assert pool.metrics()["db"]["restarts"] == 1
+
+    asyncio.run(scenario())
+
+
+def test_cancelled_acquire_returns_the_slot():
+    async def scenario():
+        server = FakeServer()
+        pool = make_pool(server, size=1, health_check_interval=0)
+        await pool.start()
+
+        async def slow_ping(timeout: float) -> None:
+            await asyncio.sleep(10)
+
+        server.opened[0].ping = slow_ping
+        with pytest.raises(asyncio.TimeoutError):
+            async with asyncio.timeout(0.05):
+                async with pool.acquire("db"):
+                    pass
+
+        assert pool.metrics()["db"]["in_use"] == 0
+        assert pool.metrics()["db"]["idle"] == 1
+
+    asyncio.run(scenario())
+
+
+def test_recently_used_sessions_are_not_pinged():
+    async def scenario():
+        server = FakeServer()
+        pool = make_pool(server, size=1, health_check_interval=60)
+        await pool.start()
+
+        for _ in range(3):
+            async with pool.acquire("db"):
+                pass
+        assert server.opened[0].pings == 0
+
+    asyncio.run(scenario())
+
+
+def test_failed_start_closes_opened_sessions():
+    async def scenario():
+        server = FakeServer()
+        opens = 0
+
+        async def flaky_open(server_name: str) -> FakeSession:
+            nonlocal opens
+            opens += 1
+            if opens == 2:
+                raise ConnectionError("server down")
+            return await server.open(server_name)
+
+        pool = MCPSessionPool({"db": {}}, size=2)
+        pool._open = flaky_open
+        with pytest.raises(ConnectionError):
+            await pool.start()
+        assert [s.closed for s in server.opened] == [True]
+
+    asyncio.run(scenario())
+
+
+def test_close_reaches_checked_out_sessions():
+    async def scenario():
+        server = FakeServer()
+        pool = make_pool(server, size=2)
+        await pool.start()
+
+        async with pool.acquire("db") as pooled:
+            await pool.close()
+            assert pooled.closed
+        assert all(s.closed for s in server.opened)
+
+    asyncio.run(scenario())